@@ -0,0 +1,90 @@
+"""
+alerts.py  —  price-drop notifications for watched components.
+
+parsing.update_prices calls notify_price_drops() after each committed batch
+with the components whose price changed. Only their watchers are looked up
+(see db.take_price_alerts) and drops are grouped into one message per user.
+
+The parsing process does not send them itself: the messages are queued in
+the alert_outbox table, and the bot process polls it from a background
+thread (start()) and sends through its rate-limited outbound sender, so
+alerts share the bot's per-chat and global budget instead of competing with
+it. In sharded mode each worker sends the alerts of the users it owns.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable
+
+from telebot.apihelper import ApiTelegramException
+
+from config import logger, SHARDS, ALERT_POLL_INTERVAL
+from db import take_price_alerts, unwatch_components, queued_alerts, drop_alerts
+from sharding import shard_of
+
+
+def _format_alert(drops: list[tuple[str, int, int]]) -> str:
+    lines = ["📉 Price drop on your watched components:\n"]
+    for name, old, new in drops:
+        lines.append(f"• {name}: ${old} → ${new} (−${old - new})")
+    return "\n".join(lines)
+
+
+def _messages(alerts: list[tuple[int, int, int, int]], names: dict[int, str]) -> list[tuple[int, int, str]]:
+    """(shard, user_id, text): one message per user for their (user_id, component_id, old, new) drops."""
+    by_user: dict[int, list[tuple[str, int, int]]] = defaultdict(list)
+    for user_id, component_id, old, new in alerts:
+        by_user[user_id].append((names.get(component_id, f"#{component_id}"), old, new))
+    return [(shard_of(user_id, SHARDS) if SHARDS > 1 else 0, user_id, _format_alert(drops))
+            for user_id, drops in by_user.items()]
+
+
+def notify_price_drops(changed: Iterable[tuple[int, int]], names: dict[int, str]) -> int:
+    """
+    Queue one notification per user for the (component_id, new price) pairs
+    that dropped below what they last saw. Returns the number of users queued.
+    """
+    alerts = take_price_alerts(changed, lambda found: _messages(found, names))
+    users  = len({user_id for user_id, *_ in alerts})
+    if users:
+        logger.info("🔔 Price alerts queued for %d users", users)
+    return users
+
+
+def deliver(shard: int = 0, batch: int = 100) -> int:
+    """Send every queued alert of shard; returns the number handled."""
+    from outbound import outbound  # bot process only: parsing.py never builds a bot
+
+    handled = 0
+    while rows := queued_alerts(shard, batch):
+        for _, user_id, text in rows:
+            try:
+                outbound.send_message(user_id, text)  # plain text: names may contain * or _
+            except ApiTelegramException as e:
+                if e.error_code == 403:  # user blocked the bot → stop watching for them
+                    unwatch_components(user_id)
+                    logger.info("🔕 User %d blocked the bot, watches removed", user_id)
+                else:
+                    logger.warning("❌ Price alert to %d failed: %s", user_id, e)
+            except Exception as e:
+                logger.error("❌ Price alert to %d failed: %s", user_id, e)
+        drop_alerts(alert_id for alert_id, _, _ in rows)
+        handled += len(rows)
+    return handled
+
+
+def _loop(shard: int, interval: float) -> None:
+    while True:
+        try:
+            deliver(shard)
+        except Exception as e:
+            logger.error("❌ Price alert delivery failed: %s", e)
+        time.sleep(interval)
+
+
+def start(shard: int = 0, interval: float = ALERT_POLL_INTERVAL) -> None:
+    """Send queued alerts of shard from a daemon thread, polling every `interval` seconds."""
+    if interval <= 0:
+        return
+    threading.Thread(target=_loop, args=(shard, interval), name="price-alerts", daemon=True).start()
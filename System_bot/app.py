@@ -1,12 +1,20 @@
-from flask import Flask,render_template
-import json
+from flask import Flask,render_template,request,jsonify,Response,stream_with_context
+import hmac
 import sqlite3
 
+from serialization import decode_computers
+from db import DB_PATH, price_trend, popular_components, spend_by_tier, get_component
+from config import SHARDS, EXPORT_TOKEN
+from sharding import shard_of, shard_db_path, user_db_paths
+from utils import COMPONENT_CONFIG
+import export
+
 app = Flask(__name__)
 
 @app.route("/user/<int:id>")
 def info_user(id):
-  conn = sqlite3.connect('computers.db', check_same_thread=False)
+  path = (shard_db_path(shard_of(id, SHARDS)) if SHARDS > 1 else None) or DB_PATH
+  conn = sqlite3.connect(path, check_same_thread=False)
   cursor = conn.cursor()
 
   cursor.execute('SELECT computers_data FROM users WHERE user_id = ?',(id,))
@@ -16,7 +24,7 @@ def info_user(id):
   conn.close()
 
   if result:
-    info = json.loads(result[0])
+    info = decode_computers(result[0], parse_dates=False)
 
   else:
     return "❌ Error, no users with this id!"
@@ -25,5 +33,39 @@ def info_user(id):
   return render_template('stats.html', id_user=info, count=len(info)) 
 
 
+@app.route("/component/<int:id>/prices")
+def component_prices(id):
+  days = request.args.get("days", 90, type=int)
+  return jsonify(component_id=id, days=price_trend(id, days))
+
+
+@app.route("/stats")
+def stats():
+  limit = request.args.get("limit", 10, type=int)
+  paths = user_db_paths()
+  popular = {
+    comp_type: [{"id": cid, "name": (get_component(cid) or {}).get("name"), "builds": n}
+                for cid, n in popular_components(comp_type, limit, paths)]
+    for comp_type in COMPONENT_CONFIG
+  }
+  return jsonify(popular=popular, tiers=spend_by_tier(paths))
+
+
+@app.route("/export/builds.<fmt>")
+def export_builds(fmt):
+  # Every user's builds at once: only for callers holding EXPORT_TOKEN
+  if not EXPORT_TOKEN:
+    return jsonify(error="export is disabled, set EXPORT_TOKEN"), 404
+  given = request.headers.get("Authorization", "").encode("utf-8")
+  if not hmac.compare_digest(given, f"Bearer {EXPORT_TOKEN}".encode("utf-8")):
+    return jsonify(error="missing or wrong export token"), 401
+  if fmt not in export.FORMATS:
+    return jsonify(error=f"unknown format, use one of {', '.join(export.FORMATS)}"), 404
+  # Headers go out before the rows, so the next ?since= is the newest last_update in the data
+  builds = export.BuildExport(request.args.get("since"))
+  return Response(stream_with_context(export.stream(builds, fmt)), mimetype=export.MIMETYPES[fmt],
+                  headers={"Content-Disposition": f"attachment; filename=builds.{fmt}"})
+
+
 if __name__ == "__main__":
   app.run(debug=True)
\ No newline at end of file
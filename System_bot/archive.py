@@ -0,0 +1,103 @@
+"""
+archive.py  —  compressed archive of the product pages the price updater fetched.
+
+PAGE_ARCHIVE_PATH is its own SQLite file (the catalog database and its
+backups stay small) with two tables:
+
+  pages  url → content hash, fetch time and what was extracted from it
+  blobs  content hash → zlib-compressed HTML, shared by identical pages
+
+parsing.py looks every downloaded page up by URL: if its hash is the one
+archived and a price was extracted from it, extraction is skipped and the
+archived amount is reused. Pages are archived even when extraction fails,
+so that a fixed extractor can be re-run over them offline
+(python parsing.py --reextract) instead of scraping every store again.
+"""
+
+import hashlib
+import sqlite3
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from config import PAGE_ARCHIVE_PATH
+
+# (url, content hash, fetched_at, amount, currency, compressed body — None when that hash is archived already)
+PageRow = tuple[str, bytes, int, Optional[float], Optional[str], Optional[bytes]]
+
+
+def content_hash(html: str) -> bytes:
+    return hashlib.blake2b(html.encode("utf-8"), digest_size=16).digest()
+
+
+def compress(html: str) -> bytes:
+    return zlib.compress(html.encode("utf-8"), 6)
+
+
+def decompress(body: bytes) -> str:
+    return zlib.decompress(body).decode("utf-8")
+
+
+class PageArchive:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or PAGE_ARCHIVE_PATH
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    url        TEXT PRIMARY KEY,
+                    hash       BLOB NOT NULL,
+                    fetched_at INTEGER NOT NULL,
+                    amount     REAL,
+                    currency   TEXT
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash BLOB PRIMARY KEY,
+                    body BLOB NOT NULL
+                ) WITHOUT ROWID
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+
+    def known(self) -> dict[str, tuple[bytes, Optional[float], Optional[str]]]:
+        """url → (hash, amount, currency) of every archived page, loaded once per run."""
+        with self._connect() as conn:
+            return {url: (h, amount, currency)
+                    for url, h, amount, currency in conn.execute("SELECT url, hash, amount, currency FROM pages")}
+
+    def store(self, rows: Iterable[PageRow]) -> None:
+        """Archive pages (one transaction); a body is only written if its hash is new."""
+        rows = list(rows)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO blobs (hash, body) VALUES (?, ?)",
+                ((h, body) for _, h, _, _, _, body in rows if body is not None),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, hash, fetched_at, amount, currency) VALUES (?, ?, ?, ?, ?)",
+                (row[:5] for row in rows),
+            )
+
+    def set_extracted(self, rows: Iterable[tuple[Optional[float], Optional[str], str]]) -> None:
+        """Update (amount, currency) of archived pages by url, after a re-extraction."""
+        with self._connect() as conn:
+            conn.executemany("UPDATE pages SET amount = ?, currency = ? WHERE url = ?", rows)
+
+    def pages(self) -> Iterator[tuple[str, int, bytes]]:
+        """(url, fetched_at, compressed body) of every archived page."""
+        with self._connect() as conn:
+            yield from conn.execute(
+                "SELECT pages.url, pages.fetched_at, blobs.body FROM pages JOIN blobs USING (hash)"
+            )
+
+    def prune(self) -> int:
+        """Delete bodies no page points at any more. Returns how many."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM pages)").rowcount
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            pages, = conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+            blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM blobs").fetchone()
+        return {"pages": pages, "blobs": blobs, "bytes": stored}
@@ -0,0 +1,68 @@
+"""
+benchmarks/bench_build_memory.py  —  memory of N cached builds: dicts vs BuildRecord.
+
+Builds are filled from a small pool of realistic component names (as in a
+real user base, where many builds share the same popular parts).
+
+Run from System_bot/:  python -m benchmarks.bench_build_memory [N]   (default 1 000 000)
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+
+from models import BuildRecord  # noqa: E402
+from utils import COMPONENT_CONFIG, create_computer_dict, count_total_price  # noqa: E402
+
+POOL_PER_TYPE = 200
+
+
+def _pools(rng: random.Random) -> dict[str, list[tuple[str, int]]]:
+    return {
+        comp_type: [(f"{cfg['label']} model {i:04d}", rng.randint(40, 1500)) for i in range(POOL_PER_TYPE)]
+        for comp_type, cfg in COMPONENT_CONFIG.items()
+    }
+
+
+def _fill(computer, pools, rng: random.Random) -> None:
+    for comp_type, cfg in COMPONENT_CONFIG.items():
+        if rng.random() < 0.9:
+            name, price = rng.choice(pools[comp_type])
+            computer[cfg["key"]]       = name
+            computer[cfg["price_key"]] = price
+    count_total_price(computer)
+
+
+def measure(label: str, n: int, make) -> None:
+    rng   = random.Random(42)
+    pools = _pools(rng)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    builds = []
+    for i in range(n):
+        computer = make(i)
+        _fill(computer, pools, rng)
+        builds.append(computer)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {size / 2**20:9.1f} MiB  {size / n:7.0f} B/build  built in {elapsed:5.1f}s")
+    del builds
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{n:,} builds")
+    measure("dict", n, lambda i: create_computer_dict(i, f"My computer #{i}"))
+    measure("BuildRecord", n, lambda i: BuildRecord(i, f"My computer #{i}"))
+
+
+if __name__ == "__main__":
+    main()
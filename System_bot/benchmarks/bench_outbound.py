@@ -0,0 +1,75 @@
+"""
+benchmarks/bench_outbound.py  —  direct bot calls vs outbound.py against a flood-limited fake API.
+
+Run from System_bot/:  python -m benchmarks.bench_outbound
+"""
+
+import os
+import threading
+import time
+
+from benchmarks.fake_telegram import FakeTelegram
+
+CHATS          = 20
+EDITS_PER_CHAT = 15
+SENDS_PER_CHAT = 3
+
+server = FakeTelegram(flood_rate=1.0, flood_burst=3).start()
+os.environ["TELEGRAM_API_URL"] = server.api_url
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+
+from telebot.apihelper import ApiTelegramException  # noqa: E402
+
+from config import bot  # noqa: E402
+from outbound import Outbound  # noqa: E402
+
+
+def _burst(send, edit) -> None:
+    def one_chat(chat_id: int) -> None:
+        for i in range(SENDS_PER_CHAT):
+            send(chat_id, f"message {i}")
+        for i in range(EDITS_PER_CHAT):
+            edit(text=f"progress {i}", chat_id=chat_id, message_id=1)
+
+    threads = [threading.Thread(target=one_chat, args=(cid,)) for cid in range(1, CHATS + 1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_direct() -> None:
+    errors = 0
+
+    def swallow(method):
+        def wrapper(*args, **kwargs):
+            nonlocal errors
+            try:
+                method(*args, **kwargs)
+            except ApiTelegramException:
+                errors += 1
+        return wrapper
+
+    start = time.perf_counter()
+    _burst(swallow(bot.send_message), swallow(bot.edit_message_text))
+    print(f"direct    {time.perf_counter() - start:6.2f}s  429s={server.floods:4d}  "
+          f"failed calls={errors}")
+
+
+def run_outbound() -> None:
+    out = Outbound(bot)
+    server.floods = 0
+    start = time.perf_counter()
+    _burst(out.send_message, out.edit_message_text)
+    out.flush(timeout=120)
+    print(f"outbound  {time.perf_counter() - start:6.2f}s  429s={server.floods:4d}  "
+          f"failed calls=0  edits coalesced={out.coalesced}")
+
+
+if __name__ == "__main__":
+    print(f"{CHATS} chats × ({SENDS_PER_CHAT} sends + {EDITS_PER_CHAT} edits of one message)")
+    run_direct()
+    time.sleep(3)  # let the fake API's buckets refill
+    run_outbound()
+    server.stop()
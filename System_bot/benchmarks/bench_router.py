@@ -0,0 +1,66 @@
+"""
+benchmarks/bench_router.py  —  callback dispatch cost as the number of flows grows.
+
+Compares telebot-style linear filters (one lambda per handler, tried in
+order) with router.CallbackRouter. Half the synthetic flows are exact
+callback_data matches, half are prefixes; lookups are spread evenly over
+all of them, so the linear average is ~N/2 filters per callback.
+
+Run from System_bot/:  python -m benchmarks.bench_router
+"""
+
+import random
+import timeit
+from types import SimpleNamespace
+
+from router import CallbackRouter
+
+SIZES   = (10, 25, 50, 100, 250, 1000)
+LOOKUPS = 20_000
+
+
+def _noop(*_):
+    pass
+
+
+def build(n: int):
+    linear: list = []
+    router = CallbackRouter()
+    samples: list[str] = []
+
+    for i in range(n):
+        if i % 2:
+            value = f"flow_{i}_action"
+            linear.append((lambda call, v=value: call.data == v, _noop))
+            router.on(value)(_noop)
+            samples.append(value)
+        else:
+            prefix = f"p{i}_"
+            linear.append((lambda call, p=prefix: call.data.startswith(p), _noop))
+            router.on_prefix(prefix)(_noop)
+            samples.append(f"{prefix}{i * 7}:payload")
+
+    rng = random.Random(n)
+    calls = [SimpleNamespace(data=rng.choice(samples)) for _ in range(LOOKUPS)]
+    return linear, router, calls
+
+
+def linear_dispatch(linear, call) -> None:
+    for test, handler in linear:
+        if test(call):
+            handler(call)
+            return
+
+
+def main() -> None:
+    print(f"{'handlers':>8}  {'linear µs':>10}  {'router µs':>10}  {'speed-up':>8}")
+    for n in SIZES:
+        linear, router, calls = build(n)
+        t_linear = timeit.timeit(lambda: [linear_dispatch(linear, c) for c in calls], number=1)
+        t_router = timeit.timeit(lambda: [router.dispatch(c) for c in calls], number=1)
+        print(f"{n:>8}  {t_linear / LOOKUPS * 1e6:>10.2f}  {t_router / LOOKUPS * 1e6:>10.2f}  "
+              f"{t_linear / t_router:>7.1f}×")
+
+
+if __name__ == "__main__":
+    main()
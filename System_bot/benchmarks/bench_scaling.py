@@ -0,0 +1,131 @@
+"""
+benchmarks/bench_scaling.py  —  how import, search and user loading scale with data size.
+
+For each catalog size (benchmarks/datagen.py, fresh database per size):
+  • import_prices_from_csv of the whole catalog,
+  • load_catalog (the bot's startup index),
+  • search_component_price for realistic two-word queries (median / p95),
+  • load_user_from_db for a user base of size / 10 users with 3 builds each,
+then load_user_from_db against builds per user.
+
+Prints tables; with matplotlib installed it also saves benchmarks/results/scaling.png.
+
+Run from System_bot/:  python -m benchmarks.bench_scaling [sizes…]   (default 10000 100000)
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+
+import logging  # noqa: E402
+
+import db  # noqa: E402
+from benchmarks.datagen import catalog_rows, write_catalog_csv, write_users  # noqa: E402
+
+SIZES   = [int(n) for n in sys.argv[1:]] or [10_000, 100_000]
+QUERIES = 30
+LOADS   = 200
+BUILDS  = (1, 10, 100, 1000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def _fresh_db(workdir: str, name: str) -> None:
+    db.DB_PATH = db.CATALOG_DB_PATH = os.path.join(workdir, name)
+    db._cache.clear()
+    db.invalidate_catalog()
+    db.init_database()
+
+
+def _queries(size: int, rng: random.Random) -> list[str]:
+    names   = [row[1] for row in catalog_rows(min(size, 5000))]
+    queries = []
+    for name in rng.sample(names, QUERIES):
+        words = [w for w in name.split() if len(w) > 2 and not w.startswith("(")]
+        queries.append(" ".join(rng.sample(words, min(2, len(words)))))
+    return queries
+
+
+def run_size(size: int, workdir: str) -> dict:
+    rng = random.Random(size)
+    csv_path = os.path.join(workdir, f"catalog_{size}.csv")
+    write_catalog_csv(csv_path, size)
+    _fresh_db(workdir, f"scale_{size}.db")
+
+    result = {"size": size}
+    result["import_s"]  = _timed(db.import_prices_from_csv, csv_path)
+    result["catalog_s"] = _timed(db.load_catalog)
+
+    searches = sorted(_timed(db.search_component_price, q) for q in _queries(size, rng))
+    result["search_p50_ms"] = statistics.median(searches) * 1000
+    result["search_p95_ms"] = searches[int(0.95 * (len(searches) - 1))] * 1000
+
+    users = max(size // 10, LOADS)
+    write_users(db.DB_PATH, users, builds=3)
+    loads = sorted(_timed(db.load_user_from_db, rng.randint(1, users)) for _ in range(LOADS))
+    result["users"] = users
+    result["load_p50_ms"] = statistics.median(loads) * 1000
+    return result
+
+
+def run_builds(workdir: str) -> list[tuple[int, float]]:
+    _fresh_db(workdir, "builds.db")
+    db.import_prices_from_csv(os.path.join(workdir, f"catalog_{SIZES[0]}.csv"))
+    rows = []
+    for i, builds in enumerate(BUILDS):
+        write_users(db.DB_PATH, 1, builds=builds, first_user_id=i + 1)
+        loads = sorted(_timed(db.load_user_from_db, i + 1) for _ in range(20))
+        rows.append((builds, statistics.median(loads) * 1000))
+    return rows
+
+
+def _plot(results: list[dict]) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+    sizes = [r["size"] for r in results]
+    fig, axes = plt.subplots(1, 3, figsize=(13, 4))
+    for ax, key, title in zip(axes, ("import_s", "search_p50_ms", "load_p50_ms"),
+                              ("import (s)", "search p50 (ms)", "load user p50 (ms)")):
+        ax.plot(sizes, [r[key] for r in results], marker="o")
+        ax.set_xscale("log")
+        ax.set_xlabel("catalog components")
+        ax.set_title(title)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(os.path.join(RESULTS_DIR, "scaling.png"))
+    print(f"\nPlot saved to {os.path.join(RESULTS_DIR, 'scaling.png')}")
+
+
+if __name__ == "__main__":
+    logging.getLogger("computer_bot").setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="scaling-")
+
+    print(f"{'catalog':>9} {'import s':>9} {'rows/s':>9} {'index s':>8} "
+          f"{'search p50':>11} {'search p95':>11} {'users':>8} {'load p50':>9}")
+    results = []
+    for size in SIZES:
+        r = run_size(size, workdir)
+        results.append(r)
+        print(f"{size:>9} {r['import_s']:>9.2f} {size / r['import_s']:>9.0f} {r['catalog_s']:>8.2f} "
+              f"{r['search_p50_ms']:>9.1f}ms {r['search_p95_ms']:>9.1f}ms {r['users']:>8} {r['load_p50_ms']:>7.2f}ms")
+
+    print(f"\n{'builds/user':>11} {'load p50':>9}")
+    for builds, ms in run_builds(workdir):
+        print(f"{builds:>11} {ms:>7.2f}ms")
+
+    _plot(results)
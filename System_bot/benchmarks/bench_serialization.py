@@ -0,0 +1,65 @@
+"""
+benchmarks/bench_serialization.py  —  JSON vs sbin for users.computers_data.
+
+For users with 1…1000 builds, reports bytes per row and the time to
+  • encode (save_user_to_db),
+  • decode to BuildRecords (load_user_from_db, the bot),
+  • decode to dicts with ISO dates left as text (app.info_user).
+
+Run from System_bot/:  python -m benchmarks.bench_serialization
+"""
+
+import os
+import random
+import timeit
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+
+from models import BuildRecord  # noqa: E402
+from serialization import encode_computers, decode_computers, decode_records  # noqa: E402
+from utils import COMPONENT_CONFIG, create_computer_dict, count_total_price  # noqa: E402
+
+BUILDS = (1, 10, 100, 1000)
+
+
+def make_user(n_builds: int, rng: random.Random) -> list:
+    pools = {
+        t: [(f"{cfg['label']} {rng.choice(['Pro', 'Ultra', 'X', 'Gaming'])} {i * 100 + 50}", rng.randint(40, 1500))
+            for i in range(40)]
+        for t, cfg in COMPONENT_CONFIG.items()
+    }
+    builds = []
+    for i in range(1, n_builds + 1):
+        record = BuildRecord.from_dict(create_computer_dict(i, f"My computer #{i}"))
+        record.created_at = datetime(2025, 1, 1) + timedelta(seconds=rng.randint(0, 3 * 10**7))
+        for t, cfg in COMPONENT_CONFIG.items():
+            if rng.random() < 0.85:
+                record[cfg["key"]], record[cfg["price_key"]] = rng.choice(pools[t])
+        count_total_price(record)
+        builds.append(record)
+    return builds
+
+
+def _time(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def main() -> None:
+    rng = random.Random(7)
+    print(f"{'builds':>6} {'codec':>5} {'bytes':>9} {'encode µs':>11} {'→records µs':>12} {'→dicts µs':>11}")
+    for n in BUILDS:
+        user   = make_user(n, rng)
+        repeat = max(1, 2000 // n)
+        for fmt in ("json", "sbin"):
+            raw = encode_computers(user, fmt)
+            size = len(raw.encode() if isinstance(raw, str) else raw)
+            enc = _time(lambda: encode_computers(user, fmt), repeat)
+            rec = _time(lambda: decode_records(raw), repeat)
+            dct = _time(lambda: decode_computers(raw, parse_dates=False), repeat)
+            print(f"{n:>6} {fmt:>5} {size:>9,} {enc:>11.1f} {rec:>12.1f} {dct:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
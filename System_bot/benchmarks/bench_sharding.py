@@ -0,0 +1,85 @@
+"""
+benchmarks/bench_sharding.py  —  update throughput with 1, 2, 4… shard worker processes.
+
+Replays the same synthetic user sessions (benchmarks/flows.py) through
+sharding.ShardPool against a local fake Bot API, with a fresh database
+directory per run, and prints updates/sec per shard count.
+
+Run from System_bot/:  python -m benchmarks.bench_sharding [users] [shard counts…]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_telegram import FakeTelegram
+
+USERS        = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+SHARD_COUNTS = [int(n) for n in sys.argv[2:]] or [1, 2, 4]
+PER_TYPE     = 4000
+BATCH        = 100  # updates per getUpdates answer
+
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+# Measure the bot, not Telegram's limits or background jobs.
+os.environ.update({
+    "TG_GLOBAL_RATE": "1e9", "TG_CHAT_RATE": "1e9", "TG_CHAT_BURST": "1e9",
+    "WARMUP_USERS": "0", "REVALUE_INTERVAL": "0", "MAINTENANCE_INTERVAL": "0",
+})
+
+import logging  # noqa: E402
+
+import db  # noqa: E402
+from benchmarks.flows import build_flow, seed_catalog  # noqa: E402
+from sharding import ShardPool, shard_of  # noqa: E402
+
+
+def _updates(parts) -> list[dict]:
+    """All users' sessions interleaved step by step, as they would arrive."""
+    rng   = random.Random(7)
+    flows = [[u for _, u in build_flow(100_000 + i, parts, rng)] for i in range(USERS)]
+    ordered = []
+    for step in range(max(map(len, flows))):
+        ordered.extend(flow[step] for flow in flows if step < len(flow))
+    return ordered
+
+
+def run(shards: int) -> float:
+    workdir = tempfile.mkdtemp(prefix=f"shards{shards}-")
+    os.chdir(workdir)
+    db.init_database()
+    parts   = seed_catalog(db.CATALOG_DB_PATH, per_type=PER_TYPE)
+    updates = _updates(parts)
+
+    pool = ShardPool(shards, threaded=False).start()
+    # One /start per shard first, so process start-up is not part of the timing.
+    warm_users = {shard_of(uid, shards): uid for uid in range(1, 1000)}
+    pool.dispatch([build_flow(uid, parts, random.Random(uid))[0][1] for uid in warm_users.values()])
+    pool.join()
+
+    start = time.perf_counter()
+    for i in range(0, len(updates), BATCH):
+        pool.dispatch(updates[i:i + BATCH])
+    pool.join()
+    elapsed = time.perf_counter() - start
+
+    pool.stop()
+    return len(updates) / elapsed
+
+
+if __name__ == "__main__":
+    # Started here, not at import: spawned workers re-import this module and
+    # must talk to the parent's server (they inherit TELEGRAM_API_URL).
+    server = FakeTelegram().start()
+    os.environ["TELEGRAM_API_URL"] = server.api_url
+    logging.getLogger("computer_bot").setLevel(logging.WARNING)
+    print(f"{USERS} users, {PER_TYPE * 5} catalog components, fake Bot API")
+    print(f"{'shards':>6}  {'updates/s':>10}  {'speed-up':>8}")
+    baseline = None
+    for shards in SHARD_COUNTS:
+        rate = run(shards)
+        baseline = baseline or rate
+        print(f"{shards:>6}  {rate:>10.0f}  {rate / baseline:>7.2f}×")
+    server.stop()
@@ -0,0 +1,168 @@
+"""
+benchmarks/datagen.py  —  deterministic synthetic catalogs and user bases.
+
+Catalog rows look like components.csv (type;name;price;category;url) with
+plausible product names, tier-dependent prices and Amazon-style URLs. Every
+name ends in a part number derived from its index, so any size up to
+millions of rows has unique names without keeping a set in memory.
+
+User bases are written straight into the users table in the configured
+computers_data codec, with builds made of catalog components.
+
+Run from System_bot/:
+    python -m benchmarks.datagen catalog 100000 components_100k.csv
+    python -m benchmarks.datagen users computers.db 10000 --builds 5
+"""
+
+import argparse
+import csv
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterator
+
+TIERS = ("budget", "mid", "high", "flagship")
+_PRICE_RANGES = {  # comp_type → (low, high) USD per tier
+    "cpu":         ((60, 150),  (150, 300), (300, 450), (450, 700)),
+    "gpu":         ((150, 300), (300, 600), (600, 1000), (1000, 2000)),
+    "ram":         ((25, 60),   (60, 120),  (120, 220), (220, 400)),
+    "storage":     ((30, 70),   (70, 130),  (130, 250), (250, 500)),
+    "motherboard": ((70, 130),  (130, 220), (220, 350), (350, 700)),
+}
+
+
+def _cpu(rng: random.Random) -> tuple[str, int]:
+    if rng.random() < 0.5:
+        level = rng.choice((3, 5, 7, 9))
+        model = f"{rng.choice((12, 13, 14))}{rng.randrange(1, 10)}00{rng.choice(('', 'K', 'KF', 'F'))}"
+        return f"Intel Core i{level}-{model}", (level - 3) // 2
+    level = rng.choice((3, 5, 7, 9))
+    model = f"{rng.choice((5, 7, 9))}{rng.randrange(5, 10)}{rng.choice((0, 5))}0{rng.choice(('', 'X', 'X3D'))}"
+    return f"AMD Ryzen {level} {model}", (level - 3) // 2
+
+
+def _gpu(rng: random.Random) -> tuple[str, int]:
+    chip, memory, tier = rng.choice((
+        ("GeForce RTX 4060", "8GB", 0), ("GeForce RTX 4060 Ti", "16GB", 1), ("GeForce RTX 4070", "12GB", 1),
+        ("GeForce RTX 4070 SUPER", "12GB", 2), ("GeForce RTX 4070 Ti", "12GB", 2), ("GeForce RTX 4080", "16GB", 3),
+        ("GeForce RTX 4090", "24GB", 3), ("Radeon RX 7600", "8GB", 0), ("Radeon RX 7700 XT", "12GB", 1),
+        ("Radeon RX 7800 XT", "16GB", 2), ("Radeon RX 7900 XTX", "24GB", 3), ("Arc A750", "8GB", 0),
+        ("Arc A770", "16GB", 1),
+    ))
+    brand = rng.choice(("ASUS TUF Gaming", "ASUS ROG Strix", "MSI Gaming X Trio", "MSI Ventus 2X",
+                        "Gigabyte Eagle", "Gigabyte Aorus Master", "Zotac AMP", "Sapphire Pulse",
+                        "Sapphire Nitro+", "PowerColor Hellhound", "XFX Speedster", "Palit JetStream"))
+    return f"{brand} {chip} {memory}{rng.choice(('', ' OC'))}", tier
+
+
+def _ram(rng: random.Random) -> tuple[str, int]:
+    gen = rng.choice(("DDR4", "DDR5"))
+    size, tier = rng.choice((("16GB (2x8GB)", 0), ("32GB (2x16GB)", 1), ("64GB (2x32GB)", 2), ("128GB (4x32GB)", 3)))
+    speed = rng.choice((3200, 3600)) if gen == "DDR4" else rng.choice((5600, 6000, 6400, 7200))
+    brand = rng.choice(("Corsair Vengeance", "Kingston Fury Beast", "G.Skill Trident Z5",
+                        "G.Skill Ripjaws V", "TeamGroup T-Force Delta", "Crucial Pro"))
+    return f"{brand} {gen} {size} {speed}MHz CL{rng.choice((16, 18, 30, 32, 36))}", tier
+
+
+def _storage(rng: random.Random) -> tuple[str, int]:
+    model = rng.choice(("Samsung 990 PRO", "Samsung 980", "Samsung 870 EVO", "WD Black SN850X", "WD Blue SN580",
+                        "Crucial P5 Plus", "Crucial P3", "Kingston KC3000", "Seagate FireCuda 530"))
+    size, tier = rng.choice((("500GB", 0), ("1TB", 1), ("2TB", 2), ("4TB", 3)))
+    return f"{model} {size} {rng.choice(('NVMe M.2', 'SATA 2.5', 'NVMe PCIe 4.0'))}", tier
+
+
+def _motherboard(rng: random.Random) -> tuple[str, int]:
+    chipset, tier = rng.choice((("B650", 1), ("X670E", 3), ("A620", 0), ("B760", 1), ("Z790", 2), ("H610", 0)))
+    series = rng.choice(("MSI MAG", "MSI PRO", "ASUS ROG Strix", "ASUS TUF Gaming", "ASUS Prime",
+                         "Gigabyte Aorus Elite", "ASRock Steel Legend"))
+    return f"{series} {chipset}{rng.choice(('', '-A', '-E', '-F', ' TOMAHAWK'))} {rng.choice(('WIFI', 'ATX', 'mATX', 'DDR5'))}", tier
+
+
+_MAKERS = {"cpu": _cpu, "gpu": _gpu, "ram": _ram, "storage": _storage, "motherboard": _motherboard}
+_ASIN_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def catalog_rows(size: int, seed: int = 1) -> Iterator[tuple[str, str, int, str, str]]:
+    """(component_type, component_name, price, category, url) × size, deterministic for a seed."""
+    rng   = random.Random(seed)
+    types = list(_MAKERS)
+    for i in range(size):
+        comp_type  = types[i % len(types)]
+        base, tier = _MAKERS[comp_type](rng)
+        low, high  = _PRICE_RANGES[comp_type][tier]
+        asin = "B0" + "".join(rng.choice(_ASIN_ALPHABET) for _ in range(8))
+        slug = "-".join(base.replace("(", "").replace(")", "").split()[:5])
+        yield (comp_type, f"{base} ({comp_type[:2].upper()}{i:07X})", rng.randint(low, high),
+               TIERS[tier], f"https://www.amazon.pl/{slug}/dp/{asin}")
+
+
+def write_catalog_csv(path: str, size: int, seed: int = 1) -> None:
+    """Write a catalog in the components.csv layout (';'-separated, with a header row)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(("component_type", "component_name", "average_price_dollar", "category", "component_url"))
+        writer.writerows(catalog_rows(size, seed))
+
+
+def write_users(db_path: str, users: int, builds: int = 3, seed: int = 2,
+                first_user_id: int = 1, batch: int = 1000) -> None:
+    """
+    Insert `users` users with `builds` builds each into db_path's users table,
+    picking components from its components_price table.
+    """
+    from serialization import encode_computers
+    from utils import COMPONENT_CONFIG, create_computer_dict
+
+    rng  = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    pool = {t: conn.execute(
+        "SELECT component_name, average_price_dollar FROM components_price WHERE component_type = ? LIMIT 5000",
+        (t,),
+    ).fetchall() for t in COMPONENT_CONFIG}
+
+    epoch = datetime(2025, 1, 1)
+    rows  = []
+    for user_id in range(first_user_id, first_user_id + users):
+        computers = []
+        for computer_id in range(1, builds + 1):
+            computer = create_computer_dict(computer_id, f"Build {computer_id}")
+            computer["created_at"] = epoch + timedelta(seconds=rng.randrange(40_000_000))
+            total = 0
+            for comp_type, cfg in COMPONENT_CONFIG.items():
+                if pool[comp_type] and rng.random() < 0.9:
+                    name, price = rng.choice(pool[comp_type])
+                    computer[cfg["key"]], computer[cfg["price_key"]] = name, price
+                    total += price
+            computer["total_price"] = total
+            computers.append(computer)
+        rows.append((user_id, builds, encode_computers(computers)))
+        if len(rows) >= batch:
+            conn.executemany("INSERT OR REPLACE INTO users (user_id, current_computer, computers_data) VALUES (?, ?, ?)", rows)
+            rows.clear()
+    conn.executemany("INSERT OR REPLACE INTO users (user_id, current_computer, computers_data) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    import os
+    os.environ.setdefault("BOT_TOKEN", "123:fake")
+    os.environ.setdefault("GOOGLE_API_KEY", "fake")
+
+    parser = argparse.ArgumentParser(description="Generate synthetic catalogs and user bases.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cat = sub.add_parser("catalog", help="write a components.csv-style catalog")
+    cat.add_argument("size", type=int)
+    cat.add_argument("path")
+    cat.add_argument("--seed", type=int, default=1)
+    usr = sub.add_parser("users", help="add users to a database that already has a catalog")
+    usr.add_argument("db")
+    usr.add_argument("users", type=int)
+    usr.add_argument("--builds", type=int, default=3)
+    usr.add_argument("--seed", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == "catalog":
+        write_catalog_csv(args.path, args.size, args.seed)
+    else:
+        write_users(args.db, args.users, args.builds, args.seed)
@@ -0,0 +1,66 @@
+"""
+benchmarks/fake_ai.py  —  a stand-in for the google-genai client.
+
+Implements the two calls utils.py makes (models.generate_content and
+models.generate_content_stream) with a configurable time to first chunk and
+per-chunk delay, so AI flows can be load-tested without network or quota.
+
+    import config
+    config.client = FakeGenAI(first_chunk=0.3, per_chunk=0.05)
+"""
+
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+_ANALYSIS = (
+    "Compatibility: all parts fit the same platform and the power budget is sane.\n"
+    "Bottlenecks: none significant at 1440p; the GPU is the limiting part in games.\n"
+    "Upgrades: more RAM helps for content creation, a bigger SSD for large libraries.\n"
+    "Rating: 8/10.\n"
+)
+
+
+class _Models:
+    def __init__(self, owner: "FakeGenAI"):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: str, config=None):
+        owner = self._owner
+        owner._count()
+        time.sleep(owner.first_chunk + owner.per_chunk * owner.chunks)
+        if config and config.get("response_mime_type") == "application/json":
+            ids = re.findall(r"Build id (\d+)", contents)
+            text = json.dumps({
+                "builds":  [{"id": int(i), "analysis": _ANALYSIS} for i in ids],
+                "verdict": "The first build is the best value.",
+            })
+        else:
+            text = _ANALYSIS
+        return SimpleNamespace(text=text)
+
+    def generate_content_stream(self, model: str, contents: str, config=None):
+        owner = self._owner
+        owner._count()
+        size = -(-len(_ANALYSIS) // owner.chunks)
+        time.sleep(owner.first_chunk)
+        for i in range(0, len(_ANALYSIS), size):
+            if i:
+                time.sleep(owner.per_chunk)
+            yield SimpleNamespace(text=_ANALYSIS[i:i + size])
+
+
+class FakeGenAI:
+    def __init__(self, first_chunk: float = 0.0, per_chunk: float = 0.0, chunks: int = 8):
+        self.first_chunk = first_chunk
+        self.per_chunk   = per_chunk
+        self.chunks      = chunks
+        self.requests    = 0
+        self._lock       = threading.Lock()
+        self.models      = _Models(self)
+
+    def _count(self) -> None:
+        with self._lock:
+            self.requests += 1
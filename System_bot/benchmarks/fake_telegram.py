@@ -0,0 +1,134 @@
+"""
+benchmarks/fake_telegram.py  —  a local stand-in for the Telegram Bot API.
+
+Answers the handful of methods the bot uses, records every call, and can
+enforce a per-chat flood limit that answers 429 with `retry_after` the way
+the real API does.
+
+    server = FakeTelegram(flood_rate=1.0, flood_burst=3).start()
+    os.environ["TELEGRAM_API_URL"] = server.api_url   # before importing config
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeTelegram:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 flood_rate: float | None = None, flood_burst: float = 3.0, latency: float = 0.0):
+        self.flood_rate  = flood_rate
+        self.flood_burst = flood_burst
+        self.latency     = latency
+
+        self.calls: list[tuple[str, dict]] = []
+        self.floods = 0
+
+        self._lock       = threading.Lock()
+        self._message_id = 0
+        self._buckets: dict[str, tuple[float, float]] = {}  # chat_id → (tokens, stamp)
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def start(self) -> "FakeTelegram":
+        threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method: str) -> int:
+        with self._lock:
+            return sum(1 for m, _ in self.calls if m == method)
+
+    # ── API emulation ─────────────────────────────────────────────────────────
+
+    def _flooded(self, chat_id: str | None) -> bool:
+        if self.flood_rate is None or chat_id is None:
+            return False
+        now = time.monotonic()
+        tokens, stamp = self._buckets.get(chat_id, (self.flood_burst, now))
+        tokens = min(self.flood_burst, tokens + (now - stamp) * self.flood_rate)
+        if tokens < 1:
+            self._buckets[chat_id] = (tokens, now)
+            return True
+        self._buckets[chat_id] = (tokens - 1, now)
+        return False
+
+    def _message(self, params: dict, message_id: int | None = None) -> dict:
+        if message_id is None:
+            self._message_id += 1
+            message_id = self._message_id
+        return {
+            "message_id": message_id,
+            "date":       int(time.time()),
+            "chat":       {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "text":       params.get("text", ""),
+        }
+
+    def handle(self, method: str, params: dict) -> tuple[int, dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if method in ("sendMessage", "editMessageText") and self._flooded(params.get("chat_id")):
+                self.floods += 1
+                return 429, {
+                    "ok": False, "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                }
+            self.calls.append((method, params))
+
+            if method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+            elif method == "sendMessage":
+                result = self._message(params)
+            elif method == "editMessageText":
+                result = self._message(params, int(params.get("message_id", 0)))
+            elif method == "getUpdates":
+                result = []
+            else:
+                result = True
+        return 200, {"ok": True, "result": result}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body are written separately: avoid the 40 ms delayed-ACK stall
+
+            def _serve(self):
+                url    = urlparse(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode()
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body))
+
+                status, payload = fake.handle(url.path.rsplit("/", 1)[-1], params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,105 @@
+"""
+benchmarks/flows.py  —  synthetic Telegram updates over a datagen catalog.
+
+Updates are the raw dicts getUpdates returns, so they can be fed to
+bot.process_new_updates (after Update.de_json) or routed by sharding.py.
+
+    seed_catalog("computers.db", per_type=2000)
+    updates = build_flow(user_id=42, rng=random.Random(42))
+"""
+
+import itertools
+import random
+import sqlite3
+import time
+
+from benchmarks.datagen import catalog_rows
+from utils import COMPONENT_CONFIG, encode_selection
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1_000_000)
+
+# comp_type → callback_data of its "Add" button
+ADD_CALLBACKS = {"cpu": "add_cpu", "ram": "add_ram", "gpu": "add_gpu", "storage": "add_stor", "motherboard": "add_mb"}
+
+
+def seed_catalog(path: str, per_type: int = 2000, seed: int = 1) -> dict[str, list[tuple[int, str]]]:
+    """Fill components_price with per_type datagen parts per type; returns comp_type → [(id, name)]."""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO components_price "
+            "(component_type, component_name, average_price_dollar, category, component_url) "
+            "VALUES (?, ?, ?, ?, ?)",
+            catalog_rows(per_type * len(COMPONENT_CONFIG), seed),
+        )
+        conn.commit()
+        parts: dict[str, list[tuple[int, str]]] = {t: [] for t in COMPONENT_CONFIG}
+        for component_id, comp_type, name in conn.execute(
+                "SELECT id, component_type, component_name FROM components_price"):
+            if comp_type in parts:
+                parts[comp_type].append((component_id, name))
+    return parts
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {
+        "message_id": next(_message_ids),
+        "from":       _user(user_id),
+        "chat":       {"id": user_id, "type": "private"},
+        "date":       int(time.time()),
+        "text":       text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id":            str(next(_update_ids)),
+            "from":          _user(user_id),
+            "chat_instance": str(user_id),
+            "data":          data,
+            "message": {
+                "message_id": next(_message_ids),
+                "from":       {"id": 1, "is_bot": True, "first_name": "FakeBot"},
+                "chat":       {"id": user_id, "type": "private"},
+                "date":       int(time.time()),
+                "text":       "menu",
+            },
+        },
+    }
+
+
+def build_flow(user_id: int, parts: dict[str, list[tuple[int, str]]], rng: random.Random,
+               components: int = 2, ai_check: bool = False) -> list[tuple[str, dict]]:
+    """
+    One user's session as (step name, update) pairs: /start, tab navigation,
+    creating a build, then for `components` component types a search (text
+    input) and a selection callback, then viewing the build (and the AI check).
+    """
+    steps = [
+        ("start",       message_update(user_id, "/start")),
+        ("tab",         callback_update(user_id, "tab1")),
+        ("new_comp",    callback_update(user_id, "new_comp")),
+        ("name",        message_update(user_id, f"Rig {user_id}")),
+    ]
+    for comp_type in rng.sample(list(ADD_CALLBACKS), components):
+        component_id, name = rng.choice(parts[comp_type])
+        query = " ".join(name.split()[:2])
+        steps += [
+            ("add",    callback_update(user_id, ADD_CALLBACKS[comp_type])),
+            ("search", message_update(user_id, query)),
+            ("select", callback_update(user_id, encode_selection(comp_type, component_id))),
+        ]
+    steps.append(("view", callback_update(user_id, "view_components")))
+    if ai_check:
+        steps.append(("build_complete", callback_update(user_id, "build_complete")))
+        steps.append(("ai_check",       callback_update(user_id, "ai_check")))
+    return steps
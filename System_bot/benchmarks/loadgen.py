@@ -0,0 +1,223 @@
+"""
+benchmarks/loadgen.py  —  end-to-end load test of the bot's update handling.
+
+Replays synthetic user sessions (benchmarks/flows.py: /start, tabs, creating
+a build, component search + selection, view, build_complete and ai_check)
+through telebot's normal update pipeline, against the fake Bot API and a fake
+AI client, from `--concurrency` simulated clients at once. Reports p50/p95/p99
+handler latency per step and overall, plus updates/sec, and writes the result
+to benchmarks/results/ so runs can be compared:
+
+Run from System_bot/:
+    python -m benchmarks.loadgen --label before
+    python -m benchmarks.loadgen --label after --compare benchmarks/results/<before>.json
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.fake_ai import FakeGenAI
+from benchmarks.fake_telegram import FakeTelegram
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+server = FakeTelegram().start()
+os.environ["TELEGRAM_API_URL"] = server.api_url
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("GOOGLE_API_KEY", "fake")
+# The flows are what is measured: no Telegram limits, no background jobs.
+os.environ.update({
+    "TG_GLOBAL_RATE": "1e9", "TG_CHAT_RATE": "1e9", "TG_CHAT_BURST": "1e9",
+    "WARMUP_USERS": "0", "REVALUE_INTERVAL": "0", "MAINTENANCE_INTERVAL": "0",
+})
+_INVOKED_FROM = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="loadgen-"))  # fresh computers.db per run
+
+import logging  # noqa: E402
+
+from telebot import types  # noqa: E402
+
+import config  # noqa: E402
+import db  # noqa: E402
+import handlers  # noqa: E402,F401  registers the handlers
+import tracing  # noqa: E402
+from config import bot  # noqa: E402
+from outbound import outbound  # noqa: E402
+from benchmarks.flows import build_flow, seed_catalog  # noqa: E402
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Statistics
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _percentile(ordered: list[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean":  sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50":   _percentile(ordered, 50) * 1000,
+        "p95":   _percentile(ordered, 95) * 1000,
+        "p99":   _percentile(ordered, 99) * 1000,
+    }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Load generation
+# ══════════════════════════════════════════════════════════════════════════════
+
+def run(args) -> dict:
+    db.init_database()
+    parts = seed_catalog(db.CATALOG_DB_PATH, per_type=args.catalog)
+    db.load_catalog()
+    config.client = FakeGenAI(first_chunk=args.ai_first_chunk, per_chunk=args.ai_per_chunk)
+    bot.threaded = False  # handle each update on the calling thread so it can be timed
+    if args.trace:
+        tracing.install(os.path.join(_INVOKED_FROM, args.trace))
+
+    rng   = random.Random(args.seed)
+    flows: queue.Queue = queue.Queue()
+    total = 0
+    for i in range(args.users):
+        flow = build_flow(200_000 + i, parts, rng, components=args.components,
+                          ai_check=rng.random() < args.ai_share)
+        total += len(flow)
+        flows.put(flow)
+
+    samples: dict[str, list[float]] = {}
+    errors  = 0
+    lock    = threading.Lock()
+
+    def client() -> None:
+        nonlocal errors
+        while True:
+            try:
+                flow = flows.get_nowait()
+            except queue.Empty:
+                return
+            for step, update in flow:
+                started = time.perf_counter()
+                try:
+                    bot.process_new_updates([types.Update.de_json(update)])
+                except Exception:
+                    with lock:
+                        errors += 1
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples.setdefault(step, []).append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    outbound.flush(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "label":     args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit":    _git_commit(),
+        "params":    {k: v for k, v in vars(args).items() if k not in ("compare", "label")},
+        "elapsed":   elapsed,
+        "updates":   total,
+        "errors":    errors,
+        "updates_per_sec": total / elapsed,
+        "api_calls": len(server.calls),
+        "ai_requests": config.client.requests,
+        "overall":   summarize([s for values in samples.values() for s in values]),
+        "steps":     {step: summarize(values) for step, values in samples.items()},
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Reporting
+# ══════════════════════════════════════════════════════════════════════════════
+
+def print_report(result: dict) -> None:
+    print(f"{result['updates']} updates from {result['params']['users']} users "
+          f"({result['params']['concurrency']} concurrent) in {result['elapsed']:.2f}s — "
+          f"{result['updates_per_sec']:.0f} updates/s, {result['errors']} errors, "
+          f"{result['api_calls']} Bot API calls, {result['ai_requests']} AI requests")
+    print(f"{'step':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = sorted(result["steps"].items()) + [("ALL", result["overall"])]
+    for step, s in rows:
+        print(f"{step:<16} {s['count']:>6} {s['p50']:>8.2f} {s['p95']:>8.2f} {s['p99']:>8.2f}")
+
+
+def print_comparison(old: dict, new: dict) -> None:
+    def delta(a: float, b: float) -> str:
+        return f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+
+    print(f"\nvs {old['label'] or old['timestamp']} ({old.get('commit') or '?'}):")
+    print(f"  updates/s  {old['updates_per_sec']:>8.0f} → {new['updates_per_sec']:>8.0f}  "
+          f"{delta(old['updates_per_sec'], new['updates_per_sec'])}")
+    print(f"{'step':<16} {'p50 ms (old → new)':>26} {'p95 ms (old → new)':>26}")
+    steps = sorted(set(old["steps"]) & set(new["steps"])) + ["ALL"]
+    for step in steps:
+        a = old["overall"] if step == "ALL" else old["steps"][step]
+        b = new["overall"] if step == "ALL" else new["steps"][step]
+        print(f"{step:<16} {a['p50']:>8.2f} → {b['p50']:>8.2f} {delta(a['p50'], b['p50']):>6} "
+              f"{a['p95']:>8.2f} → {b['p95']:>8.2f} {delta(a['p95'], b['p95']):>6}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users",          type=int,   default=300)
+    parser.add_argument("--concurrency",    type=int,   default=8)
+    parser.add_argument("--components",     type=int,   default=2, help="components searched per session")
+    parser.add_argument("--ai-share",       type=float, default=0.25, help="share of sessions ending in ai_check")
+    parser.add_argument("--ai-first-chunk", type=float, default=0.2, help="fake AI time to first chunk, s")
+    parser.add_argument("--ai-per-chunk",   type=float, default=0.02, help="fake AI delay per chunk, s")
+    parser.add_argument("--catalog",        type=int,   default=4000, help="catalog components per type")
+    parser.add_argument("--seed",           type=int,   default=1)
+    parser.add_argument("--trace",          help="also write update traces to this file (see tracing.py)")
+    parser.add_argument("--label",          default="")
+    parser.add_argument("--compare",        help="earlier result JSON to compare against")
+    parser.add_argument("--no-save",        action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger("computer_bot").setLevel(logging.WARNING)
+    result = run(args)
+    print_report(result)
+
+    if args.compare:
+        with open(os.path.join(_INVOKED_FROM, args.compare), encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}{'-' + args.label if args.label else ''}.json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved to {path}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
 import logging
+import threading
+import requests
 from dotenv import load_dotenv
 import telebot
+from telebot import apihelper
 from google import genai
 
 load_dotenv("tokens.env")
@@ -17,9 +20,116 @@ logger = logging.getLogger("computer_bot")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 BOT_TOKEN      = os.getenv("BOT_TOKEN")
 
-# ── External rates (change here if PLN/USD rate changes) ───────────────────
+# Point the bot at another Bot API server (e.g. a local fake one for load tests).
+# Format: "http://127.0.0.1:8081/bot{0}/{1}"  ({0} = token, {1} = method).
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# ── External rates ─────────────────────────────────────────────────────────
+# Scraped prices are converted to USD with rates from CURRENCY_RATES_URL (NBP
+# table A, refreshed every CURRENCY_RATES_TTL seconds, see currency.py).
+# PLN_TO_USD_RATE is only used until the first successful download.
 PLN_TO_USD_RATE: float = 3.62
+CURRENCY_RATES_URL = os.getenv("CURRENCY_RATES_URL", "https://api.nbp.pl/api/exchangerates/tables/A/?format=json")
+CURRENCY_RATES_TTL = float(os.getenv("CURRENCY_RATES_TTL", str(24 * 3600)))
+
+# AI analyses kept in memory, by build fingerprint (see utils.py).
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "5000"))
+
+# ── Storage ────────────────────────────────────────────────────────────────
+# Codec for users.computers_data: "sbin" (compact binary) or "json" (legacy).
+# Either way, rows in the other format are still read (see serialization.py).
+USER_STATE_FORMAT = os.getenv("USER_STATE_FORMAT", "sbin")
+
+# Most recently active users loaded into the cache before polling (0 = off).
+WARMUP_USERS = int(os.getenv("WARMUP_USERS", "10000"))
+
+# Days of raw price_history kept; older samples are folded into daily rollups.
+PRICE_HISTORY_DAYS = int(os.getenv("PRICE_HISTORY_DAYS", "30"))
+
+# Background revaluation of saved builds after catalog price changes.
+REVALUE_INTERVAL = float(os.getenv("REVALUE_INTERVAL", "60"))  # seconds between polls (0 = off)
+REVALUE_BATCH    = int(os.getenv("REVALUE_BATCH", "200"))      # users rewritten per transaction
+
+# Seconds between polls of the price-alert outbox filled by parsing.py (see alerts.py; 0 = off).
+ALERT_POLL_INTERVAL = float(os.getenv("ALERT_POLL_INTERVAL", "10"))
+
+# Online backups and compaction (see maintenance.py).
+BACKUP_DIR           = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP          = int(os.getenv("BACKUP_KEEP", "7"))          # snapshots kept in BACKUP_DIR
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "24"))  # hours between runs (0 = off)
+
+# Display overrides for COMPONENT_CONFIG (emoji/label per component type, JSON),
+# applied at startup and on every hot reload (SIGHUP or /reload, see hotreload.py).
+COMPONENT_OVERRIDES_PATH = os.getenv("COMPONENT_OVERRIDES_PATH", "components.json")
+
+# Bucket width (USD) of the build-price histograms in the stats tables (see db.py).
+STATS_SPEND_BUCKET = int(os.getenv("STATS_SPEND_BUCKET", "250"))
+
+# Memory-mapped catalog snapshot shared by every process (see snapshot.py; "" = off).
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog.snap")
+
+# Bearer token required by the dashboard's bulk export, GET /export/builds.<fmt>
+# (see app.py; "" = HTTP export off, `python export.py` still works).
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
+
+# Last downloaded page per product URL, compressed (see archive.py; "" = off).
+PAGE_ARCHIVE_PATH = os.getenv("PAGE_ARCHIVE_PATH", "pages.db")
+
+# ── Sharding (see sharding.py) ─────────────────────────────────────────────
+# SHARDS > 1 runs one worker process per shard; users are routed by user_id.
+# Each shard keeps its users in SHARD_DB_TEMPLATE.format(index) ("" = share
+# the main database). Enabling sharding or changing SHARDS needs
+# `python sharding.py migrate` (bot stopped) to move the users; until then the
+# bot refuses to start.
+SHARDS            = int(os.getenv("SHARDS", "1"))
+SHARD_DB_TEMPLATE = os.getenv("SHARD_DB_TEMPLATE", "computers.shard{0}.db")
+
+# ── Tracing & profiling (see tracing.py) ───────────────────────────────────
+# Every update is timed span by span; a sampled share of them, plus every
+# update slower than TRACE_SLOW_MS, is appended to TRACE_FILE in Chrome trace
+# format (open it in ui.perfetto.dev or chrome://tracing). "" turns it off.
+TRACE_FILE      = os.getenv("TRACE_FILE", "traces/bot-trace.json")
+TRACE_SAMPLE    = float(os.getenv("TRACE_SAMPLE", "0.01"))     # share of updates kept
+TRACE_SLOW_MS   = float(os.getenv("TRACE_SLOW_MS", "1000"))    # slower updates are always kept
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))  # then rotated to .1
+
+# Telegram user ids allowed to run admin commands (/profile N), comma-separated.
+ADMIN_IDS   = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# ── Telegram limits ────────────────────────────────────────────────────────
+TELEGRAM_MAX_MESSAGE_LEN: int   = 4096
+STREAM_EDIT_INTERVAL:     float = 1.0   # seconds between progressive edits of one message
+
+# Flood limits used by outbound.py (Telegram: ~30 msg/s overall, ~1 msg/s per chat)
+TG_GLOBAL_RATE: float = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE:   float = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_CHAT_BURST:  float = float(os.getenv("TG_CHAT_BURST", "3"))
+TG_MAX_RETRIES: int   = 5
+TG_EDIT_WORKERS: int  = int(os.getenv("TG_EDIT_WORKERS", "4"))  # threads sending queued edits
+
+# ── Bot API transport ──────────────────────────────────────────────────────
+# One keep-alive session shared by every thread instead of telebot's default
+# per-thread session that is thrown away every 10 minutes.
+apihelper.SESSION_TIME_TO_LIVE = None
+apihelper.session = requests.Session()
+apihelper.session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+apihelper.session.mount("http://",  requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL
 
 # ── Singletons ─────────────────────────────────────────────────────────────
-bot    = telebot.TeleBot(BOT_TOKEN)
-client = genai.Client(api_key=GOOGLE_API_KEY)
+# `bot` and `client` are built on first access, so modules that only need
+# settings (the dashboard, parsing.py, maintenance.py) import without
+# BOT_TOKEN / GOOGLE_API_KEY.
+_singletons_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    if name not in ("bot", "client"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _singletons_lock:
+        if name not in globals():
+            globals()[name] = (telebot.TeleBot(BOT_TOKEN) if name == "bot"
+                               else genai.Client(api_key=GOOGLE_API_KEY))
+    return globals()[name]
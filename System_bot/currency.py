@@ -0,0 +1,56 @@
+"""
+currency.py  —  exchange rates for normalising scraped prices to USD.
+
+Rates (USD per unit of a currency) live in the catalog database's
+currency_rates table. load_rates() refreshes them from CURRENCY_RATES_URL
+when they are older than CURRENCY_RATES_TTL and returns a RateTable, so a
+price update run downloads rates at most once and converting a price is a
+dict lookup. Without network the stored rates are used as they are; with
+none stored, PLN_TO_USD_RATE.
+"""
+
+import logging
+import time
+from typing import Optional
+
+import requests
+
+from config import PLN_TO_USD_RATE, CURRENCY_RATES_URL, CURRENCY_RATES_TTL
+from db import currency_rates, save_currency_rates
+
+logger = logging.getLogger("parser")
+
+_FALLBACK = {"USD": 1.0, "PLN": 1 / PLN_TO_USD_RATE}
+
+
+class RateTable:
+    def __init__(self, rates: dict[str, float]):
+        self.rates = rates
+
+    def to_usd(self, amount: float, currency: str) -> Optional[int]:
+        """Whole dollars for amount in currency, or None for a currency without a rate."""
+        rate = self.rates.get(currency.upper())
+        return None if rate is None else round(amount * rate)
+
+
+def fetch_rates(url: str = CURRENCY_RATES_URL) -> dict[str, float]:
+    """USD per unit for every currency in NBP's table A (which quotes PLN per unit)."""
+    response = requests.get(url, timeout=15)
+    response.raise_for_status()
+    pln_per = {rate["code"]: float(rate["mid"]) for rate in response.json()[0]["rates"]}
+    pln_per["PLN"] = 1.0
+    usd = pln_per["USD"]
+    return {code: mid / usd for code, mid in pln_per.items()}
+
+
+def load_rates(max_age: float = CURRENCY_RATES_TTL) -> RateTable:
+    rates, fetched_at = currency_rates()
+    if time.time() - fetched_at > max_age:
+        try:
+            rates = fetch_rates()
+            save_currency_rates(rates)
+            logger.info("💱 Exchange rates refreshed (1 USD = %.2f PLN)", 1 / rates["PLN"])
+        except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+            logger.warning("⚠️ Could not refresh exchange rates, using %s: %s",
+                           "stored ones" if rates else "PLN_TO_USD_RATE", e)
+    return RateTable({**_FALLBACK, **rates})
@@ -5,27 +5,139 @@ All SQLite access lives here so the rest of the code never touches
 sqlite3 directly.
 """
 
-import json
 import sqlite3
 import csv
+import time
 import atexit
-from datetime import datetime
-from typing import Optional
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
 
-from config import logger
+from config import (
+    logger,
+    USER_STATE_FORMAT,
+    WARMUP_USERS,
+    PRICE_HISTORY_DAYS,
+    REVALUE_BATCH,
+    STATS_SPEND_BUCKET,
+    CATALOG_SNAPSHOT_PATH,
+)
+from serialization import encode_computers, decode_records, is_legacy
+from snapshot import CatalogLookup, CatalogSnapshot, write_snapshot
+from tracing import TracedConnection, span, traced
+from utils import COMPONENT_CONFIG
 
-DB_PATH = "computers.db"
+DB_PATH         = "computers.db"  # user state: users, build_components, meta
+CATALOG_DB_PATH = "computers.db"  # components, price history, watches (shared across shards)
 
 # ── In-memory cache: user_id → user_dict ───────────────────────────────────
 _cache: dict[int, dict] = {}
 
+# Users created in the cache but not yet written: their row is only inserted
+# on the first real change (auto_save), not when they merely open the bot.
+_unsaved: set[int] = set()
+
+# Users changed in the cache without being saved yet (a failed auto_save, or
+# a change that is not worth a write of its own, see mark_dirty). Only these
+# are written on exit: rewriting every warmed user would stamp last_update.
+_dirty: set[int] = set()
+
+# ── In-memory catalog index: by id and by name (lazy, see CatalogIndex) ────
+_catalog: Optional["CatalogIndex"] = None
+
+# ── Reverse-index rows last written per user: (component_id, computer_id) → price
+_indexed: dict[int, dict[tuple[int, int], int]] = {}
+
+# ── What each user's builds last added to the stats tables (see _stats_entries)
+_aggregated: dict[int, Counter] = {}
+# While a rebuild runs, _stats_cursor is the last user_id it has read and
+# deltas of users at or below it are kept in _stats_pending to be added to
+# the rebuilt totals. Saves run their transactions side by side (each holds
+# its users' locks, so one user's baselines move in order) under the shared
+# side of _saves; rebuild_stats() takes it exclusively while it reads a page
+# or swaps the totals in, so no save straddles either. _stats_lock only
+# guards the bookkeeping itself.
+_stats_lock = threading.Lock()
+_stats_cursor: Optional[int] = None
+_stats_pending: Counter = Counter()
+
+# ── Per-user locks (striped): held by handlers while they work on a user's
+#    cached data, by revaluation while it reprices it and by every save
+_user_locks = [threading.RLock() for _ in range(256)]
+
+
+class _SharedLock:
+    """Many holders in shared mode or one in exclusive mode; a waiting exclusive holder goes next."""
+
+    def __init__(self):
+        self._cond      = threading.Condition()
+        self._shared    = 0
+        self._exclusive = False
+        self._waiting   = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting  -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+_saves = _SharedLock()
+
+# ── Called with (user_id, computers) after each committed users write (see on_user_saved)
+_save_hooks: list[Callable[[int, list], None]] = []
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # Low-level helpers
 # ══════════════════════════════════════════════════════════════════════════════
 
-def _connect() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+_MISSING = object()
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    return sqlite3.connect(path or DB_PATH, check_same_thread=False, factory=TracedConnection)
+
+
+def _catalog_connect() -> sqlite3.Connection:
+    return sqlite3.connect(CATALOG_DB_PATH, check_same_thread=False, factory=TracedConnection)
+
+
+def get_meta(key: str, default: Optional[int] = None) -> Optional[int]:
+    with _connect() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key: str, value: int) -> None:
+    with _connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        conn.commit()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -33,6 +145,14 @@ def _connect() -> sqlite3.Connection:
 # ══════════════════════════════════════════════════════════════════════════════
 
 def init_database() -> None:
+    # Write-ahead log (persistent, set once per file): readers — the online
+    # backup in maintenance.py, the stats rebuild, the dashboard — read a
+    # snapshot instead of holding a shared lock that keeps bot saves out.
+    for connect in (_connect, _catalog_connect):
+        with connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+
+    # User state: one file per shard in sharded mode (see sharding.py)
     with _connect() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -42,6 +162,49 @@ def init_database() -> None:
                 last_update      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_last_update ON users (last_update)")
+        # Reverse index component → saved builds, with the price each build holds,
+        # so revaluation finds stale builds without decoding computers_data.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS build_components (
+                component_id INTEGER NOT NULL,
+                user_id      INTEGER NOT NULL,
+                computer_id  INTEGER NOT NULL,
+                price        INTEGER,
+                PRIMARY KEY (component_id, user_id, computer_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_build_components_user ON build_components (user_id)")
+        # Aggregates over every saved build, kept up to date by _write_users
+        # from old/new deltas so stats never decode computers_data: how many
+        # builds hold each component, and a histogram of build totals per tier.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats_picks (
+                component_type TEXT    NOT NULL,
+                component_id   INTEGER NOT NULL,
+                picks          INTEGER NOT NULL,
+                PRIMARY KEY (component_type, component_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stats_picks_top ON stats_picks (component_type, picks)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats_spend (
+                tier   TEXT    NOT NULL,
+                bucket INTEGER NOT NULL,  -- total price // STATS_SPEND_BUCKET
+                builds INTEGER NOT NULL,
+                spend  INTEGER NOT NULL,
+                PRIMARY KEY (tier, bucket)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value INTEGER
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+    # Catalog, price history and watches: shared by every shard
+    with _catalog_connect() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS components_price (
                 id                  INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -52,6 +215,93 @@ def init_database() -> None:
                 component_url       TEXT
             )
         ''')
+        # Bumped by every change to components_price other than a price update,
+        # so a catalog snapshot can tell it is out of date (see _open_snapshot)
+        conn.execute("CREATE TABLE IF NOT EXISTS catalog_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (0, 0)")
+        for name, event in (("insert", "INSERT"), ("delete", "DELETE"),
+                            ("update", "UPDATE OF component_type, component_name, category, component_url")):
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS components_price_{name} AFTER {event} ON components_price "
+                         "BEGIN UPDATE catalog_version SET version = version + 1; END")
+        # Append-only raw samples; the index covers (component, time range) → price
+        # so trend queries never touch the table itself.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_history (
+                component_id INTEGER NOT NULL,
+                ts           INTEGER NOT NULL,
+                price        INTEGER NOT NULL
+            )
+        ''')
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_price_history_component "
+            "ON price_history (component_id, ts, price)"
+        )
+        # One row per component per day (days since epoch) for samples older than
+        # PRICE_HISTORY_DAYS; sum + samples instead of avg so rollups can be merged.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_daily (
+                component_id INTEGER NOT NULL,
+                day          INTEGER NOT NULL,
+                min_price    INTEGER NOT NULL,
+                max_price    INTEGER NOT NULL,
+                sum_price    INTEGER NOT NULL,
+                samples      INTEGER NOT NULL,
+                PRIMARY KEY (component_id, day)
+            ) WITHOUT ROWID
+        ''')
+        # Price-drop subscriptions. The primary key doubles as the
+        # component → watchers index the alert evaluation seeks on.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_watches (
+                component_id INTEGER NOT NULL,
+                user_id      INTEGER NOT NULL,
+                last_price   INTEGER NOT NULL,
+                PRIMARY KEY (component_id, user_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_price_watches_user ON price_watches (user_id)")
+        # Price-drop messages queued by parsing.py, sent by the bot process
+        # (the worker owning the user in sharded mode, see alerts.py).
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS alert_outbox (
+                id      INTEGER PRIMARY KEY,
+                shard   INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                text    TEXT    NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alert_outbox_shard ON alert_outbox (shard, id)")
+        # Price update runs (parsing.py): one row per component per run, so an
+        # interrupted run resumes where it stopped. Items of a finished run are
+        # deleted; its counts stay in update_runs.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS update_runs (
+                id          INTEGER PRIMARY KEY,
+                started_at  INTEGER NOT NULL,
+                finished_at INTEGER,
+                done        INTEGER,
+                failed      INTEGER
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS update_items (
+                run_id       INTEGER NOT NULL,
+                component_id INTEGER NOT NULL,
+                state        TEXT    NOT NULL DEFAULT 'pending',  -- pending / done / failed
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                next_attempt INTEGER NOT NULL DEFAULT 0,          -- Unix time a retry waits for
+                error        TEXT,
+                PRIMARY KEY (run_id, component_id)
+            ) WITHOUT ROWID
+        ''')
+        # Exchange rates used to normalise scraped prices (see currency.py)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS currency_rates (
+                currency   TEXT PRIMARY KEY,
+                usd_rate   REAL NOT NULL,
+                fetched_at INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
         conn.commit()
     logger.info("✅ Database initialised")
 
@@ -63,7 +313,7 @@ def init_database() -> None:
 def import_prices_from_csv(path: str = "components.csv") -> None:
     logger.info("📂 Checking CSV for new items…")
     try:
-        with _connect() as conn, open(path, encoding="utf-8", errors="replace") as f:
+        with _catalog_connect() as conn, open(path, encoding="utf-8", errors="replace") as f:
             added = 0
             for row in csv.reader(f, delimiter=";"):
                 if not row or "component_type" in row[0]:
@@ -89,6 +339,8 @@ def import_prices_from_csv(path: str = "components.csv") -> None:
                 except Exception as e:
                     logger.warning("CSV row error: %s", e)
             conn.commit()
+        invalidate_catalog()
+        write_catalog_snapshot()
         logger.info("✅ CSV import done. Added: %d", added)
     except FileNotFoundError:
         logger.error("❌ '%s' not found", path)
@@ -100,19 +352,210 @@ def import_prices_from_csv(path: str = "components.csv") -> None:
 # Users
 # ══════════════════════════════════════════════════════════════════════════════
 
-def save_user_to_db(user_id: int, user_data: dict) -> bool:
+def _index_entries(computers: list) -> dict[tuple[int, int], int]:
+    """(component_id, computer_id) → price for the catalog components of a user's builds."""
+    entries = {}
+    for computer in computers:
+        for cfg in COMPONENT_CONFIG.values():
+            name = computer.get(cfg["key"])
+            component = get_component_by_name(name) if name else None
+            if component:
+                entries[(component["id"], computer["id"])] = computer.get(cfg["price_key"])
+    return entries
+
+
+def catalog_parts(computer) -> list[tuple[str, dict, int]]:
+    """(component type, catalog component, price in the build) of each catalog component of a build."""
+    parts = []
+    for comp_type, cfg in COMPONENT_CONFIG.items():
+        name = computer.get(cfg["key"])
+        component = get_component_by_name(name) if name else None
+        if component:
+            parts.append((comp_type, component, computer.get(cfg["price_key"]) or 0))
+    return parts
+
+
+def build_tier(parts: list[tuple[str, dict, int]]) -> str:
+    """Catalog category of a build's most expensive catalog component ("custom" when it has none)."""
+    top = max(parts, key=lambda part: part[2], default=None)
+    return (top and top[1]["category"]) or "custom"
+
+
+def _stats_entries(computers: list) -> Counter:
+    """
+    What a user's builds add to the stats tables:
+    ("pick", type, component_id) → builds holding it, and
+    ("builds" | "spend", tier, bucket) → build count / summed build price.
+    """
+    entries = Counter()
+    for computer in computers:
+        parts = catalog_parts(computer)
+        for comp_type, component, _ in parts:
+            entries["pick", comp_type, component["id"]] += 1
+        total = sum(computer.get(cfg["price_key"]) or 0
+                    for cfg in COMPONENT_CONFIG.values() if computer.get(cfg["key"]))
+        if total:
+            key = (build_tier(parts), total // STATS_SPEND_BUCKET)
+            entries[("builds", *key)] += 1
+            entries[("spend", *key)]  += total
+    return entries
+
+
+def _write_stats(conn: sqlite3.Connection, delta: Counter) -> None:
+    conn.executemany(
+        "INSERT INTO stats_picks (component_type, component_id, picks) VALUES (?, ?, ?) "
+        "ON CONFLICT (component_type, component_id) DO UPDATE SET picks = picks + excluded.picks",
+        ((comp_type, component_id, n) for (kind, comp_type, component_id), n in delta.items() if kind == "pick" and n),
+    )
+    conn.executemany(
+        "INSERT INTO stats_spend (tier, bucket, builds, spend) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (tier, bucket) DO UPDATE SET builds = builds + excluded.builds, spend = spend + excluded.spend",
+        ((tier, bucket, delta[("builds", tier, bucket)], delta[("spend", tier, bucket)])
+         for tier, bucket in {key[1:] for key, n in delta.items() if key[0] != "pick" and n}),
+    )
+
+
+def user_lock(user_id: int) -> threading.RLock:
+    """Lock serialising everything that reads or changes user_id's cached data."""
+    return _user_locks[user_id % len(_user_locks)]
+
+
+def user_locks(user_ids: Iterable[int]) -> ExitStack:
+    """Hold the locks of several users (each stripe once, in stripe order, so two holders never deadlock)."""
+    stack = ExitStack()
+    for stripe in sorted({user_id % len(_user_locks) for user_id in user_ids}):
+        stack.enter_context(_user_locks[stripe])
+    return stack
+
+
+def _write_users(conn: sqlite3.Connection, users: dict[int, dict], touch: bool = True) -> tuple:
+    """
+    Write users rows and bring their build_components and stats rows up to
+    date (delta only). touch=False keeps last_update (background rewrites).
+
+    Returns the users' new baselines; the caller hands them to
+    _keep_baselines() only once the transaction committed, so a failed
+    commit leaves them where the database still is.
+    """
+    # Baselines are only read here: a save that rolls back must not move them
+    aggregated = {}
+    for user_id in users:
+        if user_id in _aggregated:
+            aggregated[user_id] = _aggregated[user_id]
+        else:  # first write of a user in this process: its contribution is that of the stored row
+            row = conn.execute("SELECT computers_data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            aggregated[user_id] = _stats_entries(decode_records(row[0])) if row else Counter()
+
+    # Upsert rather than INSERT OR REPLACE: the row is updated in place instead
+    # of deleted and re-inserted, which churned table and index pages.
+    conn.executemany(
+        "INSERT INTO users (user_id, current_computer, computers_data) VALUES (?, ?, ?) "
+        "ON CONFLICT (user_id) DO UPDATE SET current_computer = excluded.current_computer, "
+        "computers_data = excluded.computers_data" + (", last_update = CURRENT_TIMESTAMP" if touch else ""),
+        ((uid, ud["current_computer"], encode_computers(ud["computers"])) for uid, ud in users.items()),
+    )
+    indexed = {}
+    for user_id, user_data in users.items():
+        entries  = _index_entries(user_data["computers"])
+        previous = _indexed.get(user_id)
+        if previous is None:  # first write in this process: replace whatever is stored
+            conn.execute("DELETE FROM build_components WHERE user_id = ?", (user_id,))
+            previous = {}
+        conn.executemany(
+            "DELETE FROM build_components WHERE component_id = ? AND user_id = ? AND computer_id = ?",
+            ((component_id, user_id, computer_id) for component_id, computer_id in previous.keys() - entries.keys()),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO build_components (component_id, user_id, computer_id, price) VALUES (?, ?, ?, ?)",
+            ((component_id, user_id, computer_id, price)
+             for (component_id, computer_id), price in entries.items()
+             if previous.get((component_id, computer_id), _MISSING) != price),
+        )
+        indexed[user_id] = entries
+
+    delta, pending = Counter(), Counter()
+    for user_id, user_data in users.items():
+        stats = _stats_entries(user_data["computers"])
+        user_delta = stats.copy()
+        user_delta.subtract(aggregated[user_id])
+        delta.update(user_delta)
+        if _stats_cursor is not None and user_id <= _stats_cursor:
+            pending.update(user_delta)
+        aggregated[user_id] = stats
+    _write_stats(conn, delta)
+    return indexed, aggregated, pending
+
+
+def _keep_baselines(baselines: tuple) -> None:
+    """Adopt what _write_users() returned, after its commit; caller holds the users' locks."""
+    indexed, aggregated, pending = baselines
+    _indexed.update(indexed)
+    _aggregated.update(aggregated)
+    if pending:
+        with _stats_lock:
+            _stats_pending.update(pending)
+
+
+def on_user_saved(fn: Callable[[int, list], None]) -> Callable[[int, list], None]:
+    """Decorator: call fn(user_id, computers) after every committed save of a user."""
+    _save_hooks.append(fn)
+    return fn
+
+
+def _saved(users: dict[int, dict]) -> None:
+    for user_id, user_data in users.items():
+        for hook in _save_hooks:
+            try:
+                hook(user_id, user_data["computers"])
+            except Exception as e:
+                logger.error("❌ Save hook %s failed for user %d: %s", hook.__name__, user_id, e)
+
+
+def save_users_to_db(users: dict[int, dict], touch: bool = True) -> bool:
+    """Save several users in one transaction (touch=False: leave last_update as it is)."""
     try:
-        with _connect() as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO users (user_id, current_computer, computers_data) "
-                "VALUES (?, ?, ?)",
-                (user_id, user_data["current_computer"], json.dumps(user_data["computers"], default=str)),
-            )
+        with user_locks(users), _saves.shared(), _connect() as conn:
+            baselines = _write_users(conn, users, touch)
+            conn.commit()
+            _keep_baselines(baselines)
+    except Exception as e:
+        logger.error("❌ Failed to save %d users: %s", len(users), e)
+        return False
+    _saved(users)  # outside the lock: index maintenance must not hold up other saves
+    return True
+
+
+def save_user_to_db(user_id: int, user_data: dict, touch: bool = True) -> bool:
+    """Save one user (touch=False: leave last_update as it is)."""
+    try:
+        with user_locks((user_id,)), _saves.shared(), _connect() as conn:
+            baselines = _write_users(conn, {user_id: user_data}, touch)
             conn.commit()
-        return True
+            _keep_baselines(baselines)
     except Exception as e:
         logger.error("❌ Failed to save user %d: %s", user_id, e)
         return False
+    _saved({user_id: user_data})
+    return True
+
+
+def iter_user_builds(page: int = 1000) -> Iterator[tuple[int, list]]:
+    """(user_id, computers) of every stored user, read in short keyset pages so saves keep going."""
+    cursor = -1
+    with _connect() as conn:
+        while True:
+            rows = conn.execute(
+                "SELECT user_id, computers_data FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (cursor, page),
+            ).fetchall()
+            if not rows:
+                return
+            cursor = rows[-1][0]
+            for user_id, raw in rows:
+                try:
+                    yield user_id, decode_records(raw)
+                except Exception as e:
+                    logger.error("❌ Failed to decode user %d: %s", user_id, e)
 
 
 def load_user_from_db(user_id: int) -> Optional[dict]:
@@ -126,14 +569,10 @@ def load_user_from_db(user_id: int) -> Optional[dict]:
         if row is None:
             return None
 
-        computers = []
-        if row[1]:
-            computers = json.loads(row[1])
-            for c in computers:
-                if isinstance(c.get("created_at"), str):
-                    c["created_at"] = datetime.fromisoformat(c["created_at"])
-
-        return {"current_computer": row[0], "computers": computers, "awaiting_input": None}
+        user = {"current_computer": row[0], "computers": decode_records(row[1]), "awaiting_input": None}
+        if is_legacy(row[1]) and USER_STATE_FORMAT != "json":
+            save_user_to_db(user_id, user, touch=False)  # migrate the JSON row to the configured codec; not activity
+        return user
     except Exception as e:
         logger.error("❌ Failed to load user %d: %s", user_id, e)
         return None
@@ -143,19 +582,138 @@ def load_user_from_db(user_id: int) -> Optional[dict]:
 # Components
 # ══════════════════════════════════════════════════════════════════════════════
 
+class CatalogIndex(NamedTuple):
+    by_id:    CatalogLookup  # dict[int, dict], or a view of the snapshot
+    by_name:  CatalogLookup  # by name: the same component dicts as by_id
+    snapshot: Optional[CatalogSnapshot] = None  # set when both are views of the mmap snapshot
+
+
+_CATALOG_COLUMNS = "id, component_type, component_name, average_price_dollar, category, component_url"
+
+
+def write_catalog_snapshot(path: Optional[str] = None) -> Optional[int]:
+    """Write components_price to the mmap snapshot (see snapshot.py). Returns its size, None when off."""
+    path = path or CATALOG_SNAPSHOT_PATH
+    if not path:
+        return None
+    with _catalog_connect() as conn:
+        # Version first: a change in between only makes the next open rewrite it again
+        version = _catalog_version(conn)
+        rows = conn.execute(f"SELECT {_CATALOG_COLUMNS} FROM components_price").fetchall()
+    count = write_snapshot(path, rows, version=version)
+    logger.info("🗜️ Catalog snapshot written: %d components → %s", count, path)
+    return count
+
+
+def _catalog_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT version FROM catalog_version").fetchone()[0]
+
+
+def _open_snapshot() -> Optional[CatalogSnapshot]:
+    """
+    The catalog snapshot, rewritten first if components were added, removed
+    or edited since it was written (catalog_version); current prices, however
+    they were changed, are applied on top (one pass over two columns).
+    """
+    with _catalog_connect() as conn:
+        version = _catalog_version(conn)
+    try:
+        snapshot = CatalogSnapshot(CATALOG_SNAPSHOT_PATH)
+        fresh = snapshot.meta.get("version") == version
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Catalog snapshot unusable (%s), writing a new one", e)
+        fresh = False
+    if not fresh:
+        write_catalog_snapshot()
+        snapshot = CatalogSnapshot(CATALOG_SNAPSHOT_PATH)
+
+    with _catalog_connect() as conn:
+        for component_id, price in conn.execute("SELECT id, average_price_dollar FROM components_price"):
+            snapshot.set_price(component_id, price)
+    return snapshot
+
+
+def build_catalog_index() -> CatalogIndex:
+    """A fresh catalog index from components_price (the live one is left alone)."""
+    if CATALOG_SNAPSHOT_PATH:
+        snapshot = _open_snapshot()
+        return CatalogIndex(snapshot.by_id, snapshot.by_name, snapshot)
+
+    with _catalog_connect() as conn:
+        rows = conn.execute(f"SELECT {_CATALOG_COLUMNS} FROM components_price").fetchall()
+
+    catalog = {
+        row[0]: {
+            "id":       row[0],
+            "type":     row[1],
+            "name":     row[2],
+            "price":    row[3],
+            "category": row[4],
+            "url":      row[5],
+        }
+        for row in rows
+    }
+    return CatalogIndex(catalog, {c["name"]: c for c in catalog.values()})
+
+
+def set_catalog(catalog: CatalogIndex) -> None:
+    """Make catalog the live index — one assignment, so a lookup sees the old index or the new one."""
+    global _catalog
+    _catalog = catalog
+    logger.info("📚 Catalog index loaded: %d components", len(catalog.by_id))
+
+
+def load_catalog() -> CatalogLookup:
+    """(Re)build the in-memory catalog index from components_price."""
+    catalog = build_catalog_index()
+    set_catalog(catalog)
+    return catalog.by_id
+
+
+def invalidate_catalog() -> None:
+    global _catalog
+    _catalog = None
+
+
+def _catalog_index() -> CatalogIndex:
+    catalog = _catalog
+    if catalog is None:
+        catalog = build_catalog_index()
+        set_catalog(catalog)
+    return catalog
+
+
+def get_component(component_id: int) -> Optional[dict]:
+    """O(1) lookup of a catalog component by id (loads the index on first use)."""
+    return _catalog_index().by_id.get(component_id)
+
+
+def refresh_catalog_prices(prices: dict[int, int]) -> None:
+    """Apply {component_id: price} to the loaded catalog without a full reload."""
+    catalog = _catalog
+    if catalog is None:
+        return
+    for component_id, price in prices.items():
+        if catalog.snapshot is not None:
+            catalog.snapshot.set_price(component_id, price)
+        elif component := catalog.by_id.get(component_id):
+            component["price"] = price
+
+
+def get_component_by_name(component_name: str) -> Optional[dict]:
+    return _catalog_index().by_name.get(component_name)
+
+
 def product_link(component_name: str) -> Optional[str]:
-    with _connect() as conn:
-        row = conn.execute(
-            "SELECT component_url FROM components_price WHERE component_name = ?",
-            (component_name,),
-        ).fetchone()
-    return row[0] if row and row[0] else None
+    component = get_component_by_name(component_name)
+    return component["url"] if component and component["url"] else None
 
 
 def search_component_price(search_query: str, component_type: Optional[str] = None) -> list[dict]:
     """
     Returns a list of component dicts sorted by relevance score (highest first).
-    Tries AND match first, falls back to OR if nothing found.
+    Tries AND match first, falls back to OR if nothing found. Served from
+    the catalog snapshot's trigram index when there is one.
     """
     from utils import score_relevance  # local import to avoid circular
 
@@ -163,35 +721,516 @@ def search_component_price(search_query: str, component_type: Optional[str] = No
     if not words:
         return []
 
-    def _run_query(operator: str) -> list:
-        placeholders = f" {operator} ".join(["component_name LIKE ?"] * len(words))
-        sql = f"SELECT * FROM components_price WHERE {placeholders}"
-        params = [f"%{w}%" for w in words]
-        with _connect() as conn:
-            return conn.execute(sql, params).fetchall()
-
-    rows = _run_query("AND")
-    if not rows:
-        rows = _run_query("OR")
+    snapshot = _catalog_index().snapshot
+    if snapshot is not None:
+        components = snapshot.search(words) or snapshot.search(words, match_all=False)
+        rows = [(c["id"], c["type"], c["name"], c["price"], c["category"]) for c in components]
+    else:
+        rows = _run_query(words, "AND") or _run_query(words, "OR")
 
     results = []
-    for row in rows:
-        results.append({
-            "id":       row[0],
-            "type":     row[1],
-            "name":     row[2],
-            "price":    row[3],
-            "category": row[4],
-            "score":    score_relevance(words, row[2]),
-        })
+    with span("score_relevance", rows=len(rows)):
+        for row in rows:
+            results.append({
+                "id":       row[0],
+                "type":     row[1],
+                "name":     row[2],
+                "price":    row[3],
+                "category": row[4],
+                "score":    score_relevance(words, row[2]),
+            })
+
+        return sorted(results, key=lambda x: x["score"], reverse=True)
+
+
+def _run_query(words: list[str], operator: str) -> list:
+    placeholders = f" {operator} ".join(["component_name LIKE ?"] * len(words))
+    sql = f"SELECT * FROM components_price WHERE {placeholders}"
+    params = [f"%{w}%" for w in words]
+    with _catalog_connect() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def components_with_urls() -> list[tuple[int, str, int, str]]:
+    """(id, name, price, url) of every catalog component that has a product page."""
+    with _catalog_connect() as conn:
+        return conn.execute(
+            "SELECT id, component_name, average_price_dollar, component_url "
+            "FROM components_price "
+            "WHERE component_url IS NOT NULL AND component_url != ''",
+        ).fetchall()
+
+
+# Pending items whose component was deleted or lost its URL can never be
+# fetched; they fail so the run can still finish.
+_FAIL_ORPHANED_ITEMS = (
+    "UPDATE update_items SET state = 'failed', error = 'no longer in the catalog' "
+    "WHERE run_id = ? AND state = 'pending' AND component_id NOT IN ("
+    "SELECT id FROM components_price WHERE component_url IS NOT NULL AND component_url != '')"
+)
+
+
+def open_update_run(component_ids: Iterable[int]) -> tuple[int, bool, dict[int, tuple[str, int, int]]]:
+    """
+    Resume the unfinished price update run, or start a new one over component_ids
+    (components added since a run started are added to it as pending, those
+    that left the catalog are marked failed).
+
+    Returns (run id, resumed?, {component_id: (state, attempts, next_attempt)}).
+    """
+    with _catalog_connect() as conn:
+        row = conn.execute("SELECT id FROM update_runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+        if row:
+            run_id = row[0]
+        else:
+            run_id = conn.execute("INSERT INTO update_runs (started_at) VALUES (?)", (int(time.time()),)).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO update_items (run_id, component_id) VALUES (?, ?)",
+            ((run_id, component_id) for component_id in component_ids),
+        )
+        conn.execute(_FAIL_ORPHANED_ITEMS, (run_id,))
+        states = {component_id: (state, attempts, next_attempt)
+                  for component_id, state, attempts, next_attempt in conn.execute(
+                      "SELECT component_id, state, attempts, next_attempt FROM update_items WHERE run_id = ?",
+                      (run_id,))}
+    return run_id, row is not None, states
+
+
+def finish_update_run(run_id: int) -> bool:
+    """
+    Close the run if no item is pending (items that left the catalog meanwhile
+    count as failed): keep its counts, drop its items. True if closed.
+    """
+    with _catalog_connect() as conn:
+        conn.execute(_FAIL_ORPHANED_ITEMS, (run_id,))
+        counts = dict(conn.execute(
+            "SELECT state, COUNT(*) FROM update_items WHERE run_id = ? GROUP BY state", (run_id,)
+        ).fetchall())
+        if counts.get("pending"):
+            return False
+        conn.execute(
+            "UPDATE update_runs SET finished_at = ?, done = ?, failed = ? WHERE id = ?",
+            (int(time.time()), counts.get("done", 0), counts.get("failed", 0), run_id),
+        )
+        conn.execute("DELETE FROM update_items WHERE run_id = ?", (run_id,))
+    return True
+
+
+def update_run_status() -> Optional[dict]:
+    """The latest price update run: id, started_at, finished_at and item counts by state."""
+    with _catalog_connect() as conn:
+        row = conn.execute(
+            "SELECT id, started_at, finished_at, done, failed FROM update_runs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        run_id, started_at, finished_at, done, failed = row
+        counts = {"pending": 0, "done": done or 0, "failed": failed or 0}
+        if finished_at is None:
+            counts.update(conn.execute(
+                "SELECT state, COUNT(*) FROM update_items WHERE run_id = ? GROUP BY state", (run_id,)
+            ).fetchall())
+    return {"id": run_id, "started_at": started_at, "finished_at": finished_at, **counts}
+
+
+def currency_rates() -> tuple[dict[str, float], int]:
+    """({currency: USD per unit}, Unix time of the oldest stored rate); ({}, 0) if none are stored."""
+    with _catalog_connect() as conn:
+        rows = conn.execute("SELECT currency, usd_rate, fetched_at FROM currency_rates").fetchall()
+    return {currency: rate for currency, rate, _ in rows}, min((ts for *_, ts in rows), default=0)
+
+
+def save_currency_rates(rates: dict[str, float], ts: Optional[int] = None) -> None:
+    ts = int(time.time()) if ts is None else ts
+    with _catalog_connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO currency_rates (currency, usd_rate, fetched_at) VALUES (?, ?, ?)",
+            [(currency, rate, ts) for currency, rate in rates.items()],
+        )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Price history
+# ══════════════════════════════════════════════════════════════════════════════
+
+_DAY = 86_400
+
+
+def record_prices(observed: Iterable[tuple], changed: Iterable[tuple[int, int]] = (),
+                  ts: Optional[int] = None, checkpoint: Iterable[tuple] = ()) -> None:
+    """
+    Write one batch of scraped prices in a single transaction:
+    every (component_id, price) in observed becomes a price_history sample,
+    and components in changed get their current price updated. A sample may
+    carry its own time as (component_id, price, ts); the rest are stamped ts.
+
+    checkpoint rows (state, attempts, next_attempt, error, run_id, component_id)
+    update the run's update_items in the same transaction, so a resumed run
+    never records a price twice.
+    """
+    ts = int(time.time()) if ts is None else ts
+    with _catalog_connect() as conn:
+        conn.executemany(
+            "INSERT INTO price_history (component_id, ts, price) VALUES (?, ?, ?)",
+            ((sample[0], sample[2] if len(sample) > 2 else ts, sample[1]) for sample in observed),
+        )
+        conn.executemany(
+            "UPDATE components_price SET average_price_dollar = ? WHERE id = ?",
+            ((price, component_id) for component_id, price in changed),
+        )
+        conn.executemany(
+            "UPDATE update_items SET state = ?, attempts = ?, next_attempt = ?, error = ? "
+            "WHERE run_id = ? AND component_id = ?",
+            checkpoint,
+        )
+        conn.commit()
+    invalidate_catalog()
+
+
+def downsample_price_history(keep_days: int = PRICE_HISTORY_DAYS) -> int:
+    """
+    Fold raw samples older than keep_days (whole days only) into price_daily
+    and delete them. Returns the number of raw samples removed.
+    """
+    cutoff = (int(time.time()) // _DAY - keep_days) * _DAY
+    with _catalog_connect() as conn:
+        conn.execute(
+            "INSERT INTO price_daily (component_id, day, min_price, max_price, sum_price, samples) "
+            "SELECT component_id, ts / ?, MIN(price), MAX(price), SUM(price), COUNT(*) "
+            "FROM price_history WHERE ts < ? GROUP BY component_id, ts / ? "
+            "ON CONFLICT (component_id, day) DO UPDATE SET "
+            "min_price = MIN(min_price, excluded.min_price), "
+            "max_price = MAX(max_price, excluded.max_price), "
+            "sum_price = sum_price + excluded.sum_price, "
+            "samples   = samples + excluded.samples",
+            (_DAY, cutoff, _DAY),
+        )
+        removed = conn.execute("DELETE FROM price_history WHERE ts < ?", (cutoff,)).rowcount
+        conn.commit()
+    if removed:
+        logger.info("🗜️ Price history downsampled: %d samples rolled up", removed)
+    return removed
+
+
+def price_trend(component_id: int, days: int = 90) -> list[dict]:
+    """Daily min/avg/max of one component over the last `days` days, oldest first."""
+    since = int(time.time()) // _DAY - days
+    with _catalog_connect() as conn:
+        rows = conn.execute(
+            "SELECT day, min_price, max_price, sum_price, samples FROM price_daily "
+            "WHERE component_id = ? AND day >= ? "
+            "UNION ALL "
+            "SELECT ts / ?, MIN(price), MAX(price), SUM(price), COUNT(*) FROM price_history "
+            "WHERE component_id = ? AND ts >= ? GROUP BY ts / ? "
+            "ORDER BY 1",
+            (component_id, since, _DAY, component_id, since * _DAY, _DAY),
+        ).fetchall()
+
+    epoch = date(1970, 1, 1)
+    return [
+        {
+            "day": (epoch + timedelta(days=day)).isoformat(),
+            "min": low,
+            "avg": round(total / samples, 2),
+            "max": high,
+        }
+        for day, low, high, total, samples in rows
+    ]
+
+
+def price_drops(prices: dict[int, int], days: int = 7) -> dict[int, int]:
+    """
+    For {component_id: current price}, return {component_id: highest price in
+    the last `days` days} for the components that are cheaper now.
+    One range scan per component on the covering index.
+    """
+    if not prices:
+        return {}
+    placeholders = ",".join("?" * len(prices))
+    with _catalog_connect() as conn:
+        rows = conn.execute(
+            f"SELECT component_id, MAX(price) FROM price_history "
+            f"WHERE component_id IN ({placeholders}) AND ts >= ? GROUP BY component_id",
+            (*prices, int(time.time()) - days * _DAY),
+        ).fetchall()
+    return {
+        component_id: peak
+        for component_id, peak in rows
+        if prices[component_id] is not None and peak > prices[component_id]
+    }
+
 
-    return sorted(results, key=lambda x: x["score"], reverse=True)
+# ══════════════════════════════════════════════════════════════════════════════
+# Price watches
+# ══════════════════════════════════════════════════════════════════════════════
+
+def watch_components(user_id: int, prices: dict[int, int]) -> None:
+    """Subscribe user_id to {component_id: price the user sees now}."""
+    with _catalog_connect() as conn:
+        conn.executemany(
+            "INSERT INTO price_watches (component_id, user_id, last_price) VALUES (?, ?, ?) "
+            "ON CONFLICT (component_id, user_id) DO UPDATE SET last_price = excluded.last_price",
+            ((component_id, user_id, price) for component_id, price in prices.items()),
+        )
+        conn.commit()
+
+
+def unwatch_components(user_id: int, component_ids: Optional[Iterable[int]] = None) -> None:
+    """Drop the given subscriptions of user_id, or all of them."""
+    with _catalog_connect() as conn:
+        if component_ids is None:
+            conn.execute("DELETE FROM price_watches WHERE user_id = ?", (user_id,))
+        else:
+            conn.executemany(
+                "DELETE FROM price_watches WHERE component_id = ? AND user_id = ?",
+                ((component_id, user_id) for component_id in component_ids),
+            )
+        conn.commit()
+
+
+def watched_components(user_id: int) -> set[int]:
+    with _catalog_connect() as conn:
+        rows = conn.execute("SELECT component_id FROM price_watches WHERE user_id = ?", (user_id,)).fetchall()
+    return {row[0] for row in rows}
+
+
+def take_price_alerts(changed: Iterable[tuple[int, int]],
+                      compose: Callable[[list[tuple[int, int, int, int]]], Iterable[tuple[int, int, str]]],
+                      ) -> list[tuple[int, int, int, int]]:
+    """
+    For (component_id, new price) pairs, find (user_id, component_id, old, new)
+    for every watcher whose last seen price is higher, and set every watcher's
+    last seen price to the new one, so each drop is reported once and a drop
+    after a rise is measured from the risen price.
+    Only the watchers of the given components are read (primary-key seek).
+
+    compose turns the drops into (shard, user_id, text) messages, which are
+    queued for the bot process in the same transaction: the watches are never
+    moved on without their alerts being queued. Returns the drops.
+    """
+    alerts = []
+    with _catalog_connect() as conn:
+        for component_id, price in changed:
+            rows = conn.execute(
+                "SELECT user_id, last_price FROM price_watches WHERE component_id = ? AND last_price > ?",
+                (component_id, price),
+            ).fetchall()
+            conn.execute(
+                "UPDATE price_watches SET last_price = ? WHERE component_id = ? AND last_price != ?",
+                (price, component_id, price),
+            )
+            alerts.extend((user_id, component_id, old, price) for user_id, old in rows)
+        if alerts:
+            conn.executemany("INSERT INTO alert_outbox (shard, user_id, text) VALUES (?, ?, ?)", compose(alerts))
+        conn.commit()
+    return alerts
+
+
+def queued_alerts(shard: int, limit: int = 100) -> list[tuple[int, int, str]]:
+    """Oldest queued (id, user_id, text) messages of shard."""
+    with _catalog_connect() as conn:
+        return conn.execute(
+            "SELECT id, user_id, text FROM alert_outbox WHERE shard = ? ORDER BY id LIMIT ?",
+            (shard, limit),
+        ).fetchall()
+
+
+def drop_alerts(alert_ids: Iterable[int]) -> None:
+    with _catalog_connect() as conn:
+        conn.executemany("DELETE FROM alert_outbox WHERE id = ?", ((alert_id,) for alert_id in alert_ids))
+        conn.commit()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Build revaluation
+# ══════════════════════════════════════════════════════════════════════════════
+
+def price_samples_since(watermark: int) -> tuple[dict[int, int], int]:
+    """Newest price per component among price_history rows after watermark, and the new watermark."""
+    latest: dict[int, int] = {}
+    with _catalog_connect() as conn:
+        for watermark, component_id, price in conn.execute(
+            "SELECT rowid, component_id, price FROM price_history WHERE rowid > ? ORDER BY rowid", (watermark,)
+        ):
+            latest[component_id] = price
+    return latest, watermark
+
+
+def price_history_watermark() -> int:
+    with _catalog_connect() as conn:
+        return conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM price_history").fetchone()[0]
+
+
+def stale_builds(prices: dict[int, int]) -> dict[int, set[int]]:
+    """user_id → computer ids whose stored price of a component differs from prices[component]."""
+    stale: dict[int, set[int]] = {}
+    with _connect() as conn:
+        for component_id, price in prices.items():
+            for user_id, computer_id in conn.execute(
+                "SELECT user_id, computer_id FROM build_components "
+                "WHERE component_id = ? AND price IS NOT ?",
+                (component_id, price),
+            ):
+                stale.setdefault(user_id, set()).add(computer_id)
+    return stale
+
+
+def rebuild_build_index(batch: int = REVALUE_BATCH) -> int:
+    """
+    One-off backfill of build_components from every stored user (for rows
+    saved before the index existed). Returns the number of users indexed.
+    """
+    indexed = 0
+    with _connect() as write:
+        write.execute("DELETE FROM build_components")
+        rows = []
+        # Keyset pages: an open read cursor would keep the commits below locked out
+        for user_id, computers in iter_user_builds(batch):
+            try:
+                entries = _index_entries(computers)
+            except Exception as e:
+                logger.error("❌ Failed to index user %d: %s", user_id, e)
+                continue
+            rows.extend((cid, user_id, pid, price) for (cid, pid), price in entries.items())
+            indexed += 1
+            if indexed % batch == 0:
+                write.executemany("INSERT OR REPLACE INTO build_components VALUES (?, ?, ?, ?)", rows)
+                write.commit()
+                rows.clear()
+        write.executemany("INSERT OR REPLACE INTO build_components VALUES (?, ?, ?, ?)", rows)
+        write.commit()
+    _indexed.clear()
+    logger.info("🗂️ Build index rebuilt: %d users", indexed)
+    return indexed
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Stats
+# ══════════════════════════════════════════════════════════════════════════════
+
+def popular_components(comp_type: str, limit: int = 10, paths: Optional[list[str]] = None) -> list[tuple[int, int]]:
+    """
+    (component_id, builds holding it) for the `limit` most picked components
+    of comp_type, summed over the users databases in paths (default DB_PATH).
+    """
+    if not paths or len(paths) == 1:
+        with _connect(paths and paths[0]) as conn:
+            return conn.execute(
+                "SELECT component_id, picks FROM stats_picks WHERE component_type = ? AND picks > 0 "
+                "ORDER BY picks DESC LIMIT ?",
+                (comp_type, limit),
+            ).fetchall()
+    picks = Counter()
+    for path in paths:
+        with _connect(path) as conn:
+            picks.update(dict(conn.execute(
+                "SELECT component_id, picks FROM stats_picks WHERE component_type = ?", (comp_type,)
+            )))
+    return [(cid, n) for cid, n in picks.most_common(limit) if n > 0]
+
+
+def spend_by_tier(paths: Optional[list[str]] = None) -> dict[str, dict]:
+    """
+    tier → {"builds": n, "average": mean build price,
+            "histogram": {bucket start in USD: builds}} over the users
+    databases in paths (default DB_PATH).
+    """
+    tiers: dict[str, dict] = {}
+    for path in paths or [DB_PATH]:
+        with _connect(path) as conn:
+            rows = conn.execute("SELECT tier, bucket, builds, spend FROM stats_spend WHERE builds > 0").fetchall()
+        for tier, bucket, builds, spend in rows:
+            entry = tiers.setdefault(tier, {"builds": 0, "spend": 0, "histogram": Counter()})
+            entry["builds"] += builds
+            entry["spend"]  += spend
+            entry["histogram"][bucket * STATS_SPEND_BUCKET] += builds
+    return {
+        tier: {"builds": e["builds"], "average": round(e["spend"] / e["builds"]), "histogram": dict(sorted(e["histogram"].items()))}
+        for tier, e in sorted(tiers.items(), key=lambda item: -item[1]["builds"])
+    }
+
+
+def rebuild_stats(page: int = 1000) -> int:
+    """
+    Recompute the stats tables from every stored user, reconciling whatever
+    drift the incremental updates picked up. Users are read in short pages
+    so saves keep going; saves of users already read are added on top.
+    Returns the number of users read.
+    """
+    global _stats_cursor, _stats_pending
+    totals = Counter()
+    users  = 0
+    with _stats_lock:
+        _stats_cursor, _stats_pending = -1, Counter()
+    try:
+        with _connect() as conn:
+            while True:
+                with _saves.exclusive(), _stats_lock:
+                    rows = conn.execute(
+                        "SELECT user_id, computers_data FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                        (_stats_cursor, page),
+                    ).fetchall()
+                    if not rows:  # from here on, users created meanwhile are pending too
+                        _stats_cursor = 1 << 63
+                        break
+                    _stats_cursor = rows[-1][0]
+                for user_id, raw in rows:
+                    try:
+                        totals.update(_stats_entries(decode_records(raw)))
+                    except Exception as e:
+                        logger.error("❌ Failed to aggregate user %d: %s", user_id, e)
+                users += len(rows)
+
+            with _saves.exclusive(), _stats_lock:
+                totals.update(_stats_pending)
+                conn.execute("DELETE FROM stats_picks")
+                conn.execute("DELETE FROM stats_spend")
+                _write_stats(conn, totals)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stats_rebuilt_at', ?)",
+                             (int(time.time()),))
+                conn.commit()
+                # Contributions remembered before the rebuild may be the drift itself
+                _aggregated.clear()
+    finally:
+        with _stats_lock:
+            _stats_cursor, _stats_pending = None, Counter()
+    logger.info("📊 Stats rebuilt: %d users", users)
+    return users
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # Cache helpers (used throughout the app)
 # ══════════════════════════════════════════════════════════════════════════════
 
+def warm_cache(limit: int = WARMUP_USERS) -> int:
+    """
+    Bulk-load the `limit` most recently active users into the cache with one
+    streaming query, so their first update after a restart is a cache hit.
+    Legacy JSON rows are not rewritten here (that would slow startup down);
+    they are migrated by their next save as usual.
+    """
+    loaded = 0
+    with _connect() as conn:
+        cursor = conn.execute(
+            "SELECT user_id, current_computer, computers_data FROM users "
+            "ORDER BY last_update DESC LIMIT ?",
+            (limit,),
+        )
+        for user_id, current_computer, raw in cursor:
+            if user_id in _cache:
+                continue
+            try:
+                computers = decode_records(raw)
+            except Exception as e:
+                logger.error("❌ Failed to warm user %d: %s", user_id, e)
+                continue
+            _cache[user_id] = {"current_computer": current_computer, "computers": computers, "awaiting_input": None}
+            loaded += 1
+    logger.info("🔥 Cache warmed: %d users", loaded)
+    return loaded
+
+
+@traced()
 def get_user_data(user_id: int) -> dict:
     if user_id not in _cache:
         db_data = load_user_from_db(user_id)
@@ -200,11 +1239,16 @@ def get_user_data(user_id: int) -> dict:
             logger.info("Loaded user %d from DB", user_id)
         else:
             _cache[user_id] = {"current_computer": None, "computers": [], "awaiting_input": None}
-            save_user_to_db(user_id, _cache[user_id])
+            _unsaved.add(user_id)
             logger.info("Created new user %d", user_id)
     return _cache[user_id]
 
 
+def cached_user_data(user_id: int) -> Optional[dict]:
+    """The cached user dict, or None — never loads from the DB."""
+    return _cache.get(user_id)
+
+
 def auto_save(user_id: int) -> None:
     """Persist user data and recalculate total price for current build."""
     from utils import count_total_price, get_current_computer  # avoid circular
@@ -215,16 +1259,27 @@ def auto_save(user_id: int) -> None:
             count_total_price(computer)
         ok = save_user_to_db(user_id, _cache[user_id])
         if ok:
+            _unsaved.discard(user_id)
+            _dirty.discard(user_id)
             logger.debug("💾 Auto-saved user %d", user_id)
         else:
+            _dirty.add(user_id)
             logger.warning("❌ Failed to auto-save user %d", user_id)
 
 
+def mark_dirty(user_id: int) -> None:
+    """Remember a change to a cached user that is saved with the next auto_save, or on exit."""
+    _dirty.add(user_id)
+
+
 def _save_all_on_exit() -> None:
-    logger.info("💾 Saving all users before exit…")
-    for uid, data in _cache.items():
-        save_user_to_db(uid, data)
-    logger.info("✅ All users saved")
+    logger.info("💾 Saving changed users before exit…")
+    saved = 0
+    for uid in list(_dirty):
+        data = _cache.get(uid)
+        if data is not None and uid not in _unsaved:
+            saved += save_user_to_db(uid, data)
+    logger.info("✅ %d users saved", saved)
 
 
 atexit.register(_save_all_on_exit)
@@ -0,0 +1,168 @@
+"""
+export.py  —  streaming bulk export of every saved build.
+
+One output row per build (not per user), in one of three formats:
+
+  csv      header line + one line per build
+  ndjson   one JSON object per build
+  columns  one JSON object per chunk of CHUNK_ROWS builds, holding a list per
+           column ({"rows": n, "columns": {"user_id": [...], ...}}) — the
+           column-chunk layout of Parquet without the dependency; each line
+           loads straight into a DataFrame
+
+Users are read in pages of PAGE_USERS with keyset pagination, each page its
+own short read, so memory stays constant and the bot's writes are never
+blocked behind a long-running export. `since` exports only users whose
+last_update is later (walking idx_users_last_update), and the export's
+watermark — the newest last_update it saw — is the `since` of the next
+incremental pull. With SHARDS > 1 every shard database is exported in turn.
+
+Run from System_bot/:
+    python export.py --format csv -o builds.csv
+    python export.py --format ndjson --since "2026-10-01 00:00:00" > new.ndjson
+HTTP: GET /export/builds.<format>?since=…  (app.py, with the header
+"Authorization: Bearer $EXPORT_TOKEN"; off while EXPORT_TOKEN is unset)
+"""
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+from typing import Iterator, Optional
+
+from serialization import decode_computers
+from sharding import user_db_paths
+from utils import COMPONENT_CONFIG
+
+FORMATS    = ("csv", "ndjson", "columns")
+MIMETYPES  = {"csv": "text/csv", "ndjson": "application/x-ndjson", "columns": "application/x-ndjson"}
+PAGE_USERS = 500     # users per read
+CHUNK_ROWS = 10_000  # builds per "columns" chunk
+
+COLUMNS = (
+    ["user_id", "computer_id", "name", "is_current", "created_at"]
+    + [k for cfg in COMPONENT_CONFIG.values() for k in (cfg["key"], cfg["price_key"])]
+    + ["total_price", "last_update"]
+)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Reading
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _user_pages(path: str, since: Optional[str]) -> Iterator[list[tuple]]:
+    """Pages of (user_id, current_computer, computers_data, last_update), each read in its own statement."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        if since is None:
+            sql, key = ("SELECT user_id, current_computer, computers_data, last_update FROM users "
+                        "WHERE user_id > ? ORDER BY user_id LIMIT ?"), (-1,)
+        else:
+            sql, key = ("SELECT user_id, current_computer, computers_data, last_update FROM users "
+                        "WHERE (last_update, user_id) > (?, ?) ORDER BY last_update, user_id LIMIT ?"), (since, -1)
+        while True:
+            rows = conn.execute(sql, (*key, PAGE_USERS)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1]
+            key  = (last[0],) if since is None else (last[3], last[0])
+    finally:
+        conn.close()
+
+
+class BuildExport:
+    """Iterates the builds of every exported database; `watermark` is the newest last_update seen."""
+
+    def __init__(self, since: Optional[str] = None, paths: Optional[list[str]] = None):
+        self.since     = since
+        self.paths     = paths or user_db_paths()
+        self.watermark = since
+        self.users     = 0
+        self.builds    = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        for path in self.paths:
+            for page in _user_pages(path, self.since):
+                for user_id, current, raw, last_update in page:
+                    self.users += 1
+                    if self.watermark is None or last_update > self.watermark:
+                        self.watermark = last_update
+                    for computer in decode_computers(raw, parse_dates=False):
+                        self.builds += 1
+                        row = {column: computer.get(column) for column in COLUMNS}
+                        row.update(user_id=user_id, computer_id=computer.get("id"),
+                                   is_current=computer.get("id") == current, last_update=last_update)
+                        yield row
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Formats
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _csv(rows: Iterator[dict], flush_every: int = 1000) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([row[c] for c in COLUMNS])
+        if i % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson(rows: Iterator[dict], flush_every: int = 1000) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(lines) >= flush_every:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _columns(rows: Iterator[dict]) -> Iterator[str]:
+    def chunk() -> str:
+        return json.dumps({"rows": len(columns["user_id"]), "columns": columns},
+                          ensure_ascii=False, default=str) + "\n"
+
+    columns: dict[str, list] = {c: [] for c in COLUMNS}
+    for row in rows:
+        for c in COLUMNS:
+            columns[c].append(row[c])
+        if len(columns["user_id"]) >= CHUNK_ROWS:
+            yield chunk()
+            columns = {c: [] for c in COLUMNS}
+    if columns["user_id"]:
+        yield chunk()
+
+
+def stream(export: BuildExport, fmt: str) -> Iterator[str]:
+    """Text chunks of the export in fmt ('csv', 'ndjson' or 'columns')."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (choose from {', '.join(FORMATS)})")
+    return {"csv": _csv, "ndjson": _ndjson, "columns": _columns}[fmt](iter(export))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every saved build.")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--since", help="only users changed after this last_update ('YYYY-MM-DD HH:MM:SS', UTC)")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    export = BuildExport(args.since)
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for text in stream(export, args.format):
+            out.write(text)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {export.builds} builds of {export.users} users; next --since {export.watermark!r}",
+          file=sys.stderr)
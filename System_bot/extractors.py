@@ -0,0 +1,157 @@
+"""
+extractors.py  —  per-store price extractors for the price updater.
+
+An extractor turns a product page into (amount, currency code), or None
+when the page has no price (captcha, out of stock, changed layout). Each is
+registered for one or more domains:
+
+    @extractor("example-shop.pl")
+    def _example_shop(html: str, url: str) -> Optional[Price]: ...
+
+extractor_for(url) returns the extractor of the longest registered domain
+that the URL's host ends with (so "amazon.pl" also covers "www.amazon.pl"),
+or extract_structured() — schema.org JSON-LD, microdata and OpenGraph price
+tags, which most shops emit — when no store-specific one is registered.
+"""
+
+import json
+import re
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+Price = tuple[float, str]  # (amount, ISO 4217 currency code)
+Extractor = Callable[[str, str], Optional[Price]]
+
+_EXTRACTORS: dict[str, Extractor] = {}
+
+
+def extractor(*domains: str):
+    """Decorator: use the function for pages on these domains (and their subdomains)."""
+    def register(fn: Extractor) -> Extractor:
+        for domain in domains:
+            if domain in _EXTRACTORS:
+                raise ValueError(f"an extractor for {domain!r} is already registered")
+            _EXTRACTORS[domain] = fn
+        return fn
+    return register
+
+
+def domain_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def extractor_for(url: str) -> Extractor:
+    host = domain_of(url)
+    while host:
+        fn = _EXTRACTORS.get(host)
+        if fn is not None:
+            return fn
+        _, _, host = host.partition(".")
+    return extract_structured
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Helpers
+# ══════════════════════════════════════════════════════════════════════════════
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    '1 299,99 zł' → 1299.99, '$1,299.99' → 1299.99, '1.299' → 1299.0.
+
+    The last ',' or '.' is the decimal separator only when one or two digits
+    follow it; otherwise separators are thousands groupings.
+    """
+    digits = re.sub(r"[^\d.,]", "", text)
+    if not digits:
+        return None
+    head, sep, tail = digits.rpartition(",") if digits.rfind(",") > digits.rfind(".") else digits.rpartition(".")
+    if sep and 1 <= len(tail) <= 2:
+        whole = re.sub(r"\D", "", head)
+        return float(f"{whole or 0}.{tail}")
+    return float(re.sub(r"\D", "", digits))
+
+
+def page_title(html: str) -> str:
+    """The <title> of a page, for log lines about pages without a price."""
+    match = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
+    return " ".join(match.group(1).split()) if match else "No title"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Structured data (fallback for every store)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _offer_price(node) -> Optional[Price]:
+    """First offers.price / priceCurrency pair anywhere in a JSON-LD document."""
+    if isinstance(node, list):
+        for child in node:
+            found = _offer_price(child)
+            if found:
+                return found
+    elif isinstance(node, dict):
+        price    = node.get("price", node.get("lowPrice"))
+        currency = node.get("priceCurrency")
+        if price is not None and currency:
+            amount = parse_amount(str(price))
+            if amount is not None:
+                return amount, str(currency).upper()
+        for key in ("offers", "@graph", "mainEntity", "priceSpecification"):
+            if key in node:
+                found = _offer_price(node[key])
+                if found:
+                    return found
+    return None
+
+
+def extract_structured(html: str, url: str) -> Optional[Price]:
+    soup = BeautifulSoup(html, "html.parser")
+
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            found = _offer_price(json.loads(script.string or ""))
+        except ValueError:
+            continue
+        if found:
+            return found
+
+    for amount_attrs, currency_attrs in (
+        ({"itemprop": "price"},                 {"itemprop": "priceCurrency"}),
+        ({"property": "product:price:amount"},  {"property": "product:price:currency"}),
+        ({"property": "og:price:amount"},       {"property": "og:price:currency"}),
+    ):
+        amount_el   = soup.find(attrs=amount_attrs)
+        currency_el = soup.find(attrs=currency_attrs)
+        if amount_el and currency_el:
+            amount   = parse_amount(amount_el.get("content") or amount_el.get_text())
+            currency = (currency_el.get("content") or currency_el.get_text()).strip().upper()
+            if amount is not None and currency:
+                return amount, currency
+    return None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Stores
+# ══════════════════════════════════════════════════════════════════════════════
+
+_AMAZON_CURRENCIES = {
+    "amazon.pl": "PLN", "amazon.de": "EUR", "amazon.fr": "EUR", "amazon.it": "EUR",
+    "amazon.es": "EUR", "amazon.nl": "EUR", "amazon.co.uk": "GBP", "amazon.se": "SEK",
+    "amazon.com": "USD",
+}
+
+
+@extractor(*_AMAZON_CURRENCIES)
+def _amazon(html: str, url: str) -> Optional[Price]:
+    soup  = BeautifulSoup(html, "html.parser")
+    whole = soup.select_one(".a-price-whole")
+    if not whole:
+        return None
+    fraction = whole.find_next_sibling(class_="a-price-fraction")
+    amount   = int(re.sub(r"\D", "", whole.get_text()) or 0)
+    if fraction:
+        amount += int(re.sub(r"\D", "", fraction.get_text()) or 0) / 100
+    domain = domain_of(url)
+    return float(amount), next((cur for d, cur in _AMAZON_CURRENCIES.items() if domain.endswith(d)), "USD")
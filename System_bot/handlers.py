@@ -8,31 +8,125 @@ Key improvements over the original:
   • All bugs fixed (found_links, key typos, computer_id, etc.).
 """
 
+import os
+import signal
+import threading
+import time
+from functools import lru_cache, wraps
+
 from telebot import types
 
-from config import bot, logger
-from db import get_user_data, auto_save, search_component_price, product_link
+from config import bot, logger, TELEGRAM_MAX_MESSAGE_LEN, STREAM_EDIT_INTERVAL, ADMIN_IDS, SHARDS
+from outbound import outbound
+from router import CallbackRouter
+from tracing import traced_update, profile
+from db import (
+    get_user_data,
+    user_lock,
+    auto_save,
+    mark_dirty,
+    search_component_price,
+    product_link,
+    get_component,
+    get_component_by_name,
+    price_drops,
+    watch_components,
+    unwatch_components,
+    watched_components,
+    popular_components,
+    spend_by_tier,
+)
+from hotreload import on_reload, reload_async
+from sharding import user_db_paths
+from similar import suggest_components
 from utils import (
-    COMPONENT_CONFIG,
-    STATE_TO_COMP,
     SELECT_CB_TO_COMP,
+    component_maps,
     get_current_computer,
     create_new_computer,
     is_build_complete,
     get_build_progress,
-    analyze_build_with_ai,
+    stream_build_analysis,
+    compare_builds_with_ai,
+    encode_selection,
+    decode_selection_id,
 )
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# Callback routing
+# ══════════════════════════════════════════════════════════════════════════════
+#
+# Every inline-button callback goes through one telebot handler; the router
+# finds the target by exact callback_data or by longest prefix (see router.py).
+#
+
+router = CallbackRouter()
+
+
+def _per_user(handler):
+    """
+    Run handler holding the sending user's lock (db.user_lock): telebot runs
+    handlers on several threads, and revaluation.py reprices cached builds
+    from its own.
+    """
+    @wraps(handler)
+    def wrapper(update, *args, **kwargs):
+        with user_lock(update.from_user.id):
+            return handler(update, *args, **kwargs)
+    return wrapper
+
+
+@bot.callback_query_handler(func=lambda call: True)
+@traced_update("callback")
+@_per_user
+def dispatch_callback(call):
+    if not router.dispatch(call):
+        logger.warning("Unrouted callback_data: %r", call.data)
+        bot.answer_callback_query(call.id)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # Shared markup builders
 # ══════════════════════════════════════════════════════════════════════════════
+#
+# Keyboards that depend only on COMPONENT_CONFIG (and their arguments) are built
+# once and cached as serialized JSON — telebot sends a str reply_markup as-is,
+# so the hot callback path neither allocates button objects nor re-serializes.
+# The main menu is cached as a template and only the user id is substituted.
+# A hot reload (hotreload.py) empties the caches.
+#
+
+_USER_ID_SLOT = "__user_id__"
+
+_MARKUP_CACHES = []
+
+
+def _markup_cache(fn):
+    cached = lru_cache(maxsize=None)(fn)
+    _MARKUP_CACHES.append(cached)
+    return cached
+
+
+@on_reload
+def _clear_markup_caches() -> None:
+    for cached in _MARKUP_CACHES:
+        cached.cache_clear()
+
 
 def _back_btn() -> types.InlineKeyboardButton:
     return types.InlineKeyboardButton("⬅️ Back to menu", callback_data="back_menu")
 
 
-def _main_menu_markup(user_id: int) -> types.InlineKeyboardMarkup:
+@_markup_cache
+def _back_only_markup() -> str:
+    markup = types.InlineKeyboardMarkup()
+    markup.row(_back_btn())
+    return markup.to_json()
+
+
+@_markup_cache
+def _main_menu_template() -> str:
     markup = types.InlineKeyboardMarkup()
     markup.row(types.InlineKeyboardButton("🖥️ Create new system",  callback_data="tab1"))
     markup.row(
@@ -41,25 +135,35 @@ def _main_menu_markup(user_id: int) -> types.InlineKeyboardMarkup:
     )
     markup.row(
         types.InlineKeyboardButton("📚 View tutorials",     callback_data="tab4"),
-        types.InlineKeyboardButton("📊 Web Dashboard",      url=f"http://127.0.0.1:5000/user/{user_id}"),
+        types.InlineKeyboardButton("📊 Web Dashboard",      url=f"http://127.0.0.1:5000/user/{_USER_ID_SLOT}"),
     )
-    return markup
+    return markup.to_json()
+
 
+def _main_menu_markup(user_id: int) -> str:
+    return _main_menu_template().replace(_USER_ID_SLOT, str(user_id))
 
-def _after_component_markup(is_change: bool, computer: dict) -> types.InlineKeyboardMarkup:
+
+def _after_component_markup(is_change: bool, computer: dict) -> str:
     """Buttons shown after a component is successfully added or changed."""
+    return _after_component_keyboard(is_change, is_build_complete(computer))
+
+
+@_markup_cache
+def _after_component_keyboard(is_change: bool, complete: bool) -> str:
     markup = types.InlineKeyboardMarkup()
-    if is_build_complete(computer):
+    if complete:
         markup.row(types.InlineKeyboardButton("🎉 Build Complete!", callback_data="build_complete"))
     if is_change:
         markup.row(types.InlineKeyboardButton("🔄 Change next component", callback_data="ch_component"))
     else:
         markup.row(types.InlineKeyboardButton("🔧 Add next component", callback_data="add_next_component"))
     markup.row(_back_btn())
-    return markup
+    return markup.to_json()
 
 
-def _component_menu_markup(prefix: str) -> types.InlineKeyboardMarkup:
+@_markup_cache
+def _component_menu_markup(prefix: str) -> str:
     """Generic component-choice keyboard (Add / Change / Delete menus share the same layout)."""
     labels = {
         "add_":    ("Add",    "add_cpu",    "add_ram",    "add_gpu",    "add_stor",    "add_mb"),
@@ -67,18 +171,34 @@ def _component_menu_markup(prefix: str) -> types.InlineKeyboardMarkup:
         "delete_": ("Delete", "delete_cpu", "delete_ram", "delete_gpu", "delete_stor", "delete_mam"),
     }
     verb, cb_cpu, cb_ram, cb_gpu, cb_stor, cb_mb = labels[prefix]
+    config = component_maps().config
+
+    def button(comp_type: str, callback_data: str) -> types.InlineKeyboardButton:
+        cfg = config[comp_type]
+        return types.InlineKeyboardButton(f"{cfg['emoji']} {verb} {cfg['label']}", callback_data=callback_data)
+
     markup = types.InlineKeyboardMarkup()
-    markup.row(types.InlineKeyboardButton(f"🔧 {verb} CPU",         callback_data=cb_cpu))
-    markup.row(
-        types.InlineKeyboardButton(f"💾 {verb} RAM",        callback_data=cb_ram),
-        types.InlineKeyboardButton(f"🖳 {verb} GPU",        callback_data=cb_gpu),
-    )
+    markup.row(button("cpu", cb_cpu))
+    markup.row(button("ram", cb_ram), button("gpu", cb_gpu))
+    markup.row(button("storage", cb_stor), button("motherboard", cb_mb))
+    markup.row(_back_btn())
+    return markup.to_json()
+
+
+@_markup_cache
+def _search_fallback_markup(comp_type: str) -> str:
+    """'Add next' / 'Enter manually' row shown under search results for comp_type."""
+    markup = types.InlineKeyboardMarkup()
+    _add_search_fallback_rows(markup, comp_type)
+    return markup.to_json()
+
+
+def _add_search_fallback_rows(markup: types.InlineKeyboardMarkup, comp_type: str) -> None:
     markup.row(
-        types.InlineKeyboardButton(f"📦 {verb} Storage",    callback_data=cb_stor),
-        types.InlineKeyboardButton(f"📁 {verb} Motherboard",callback_data=cb_mb),
+        types.InlineKeyboardButton("🔧 Add next component", callback_data="add_next_component"),
+        types.InlineKeyboardButton("💸 Enter manually",     callback_data=component_maps().config[comp_type]["manual_cb"]),
     )
     markup.row(_back_btn())
-    return markup
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -86,23 +206,109 @@ def _component_menu_markup(prefix: str) -> types.InlineKeyboardMarkup:
 # ══════════════════════════════════════════════════════════════════════════════
 
 @bot.message_handler(commands=["start"])
+@traced_update("message")
+@_per_user
 def start(message):
     user_id = message.from_user.id
-    get_user_data(user_id)  # ensures user exists in cache & DB
-    bot.send_message(
+    get_user_data(user_id)  # loads the user into the cache (row is written on first change)
+    outbound.send_message(
         message.chat.id,
         "✨ Welcome to the Computer Builder Bot! ✨",
         reply_markup=_main_menu_markup(user_id),
     )
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# /profile N  (admins only)
+# ══════════════════════════════════════════════════════════════════════════════
+
+PROFILE_MAX_SECONDS = 300
+
+
+@bot.message_handler(commands=["profile"], func=lambda message: message.from_user.id in ADMIN_IDS)
+def profile_command(message):
+    args = message.text.split()[1:]
+    try:
+        seconds = min(float(args[0]) if args else 30.0, PROFILE_MAX_SECONDS)
+    except ValueError:
+        outbound.send_message(message.chat.id, "Usage: /profile <seconds>")
+        return
+    outbound.send_message(message.chat.id, f"⏱ Sampling all threads for {seconds:g}s…")
+    # Sampled from its own thread, so this handler's worker is free to serve updates meanwhile.
+    threading.Thread(target=_run_profile, args=(message.chat.id, seconds), name="profiler", daemon=True).start()
+
+
+def _run_profile(chat_id: int, seconds: float) -> None:
+    result = profile(seconds)
+    if result is None:
+        outbound.send_message(chat_id, "❌ A profile is already running.")
+        return
+    top = "\n".join(f"{count:>6}  {frame}" for frame, count in result["top"])
+    outbound.send_message(
+        chat_id,
+        f"✅ {result['samples']} samples → {result['path']}\n"
+        f"Render with flamegraph.pl or speedscope.app.\n\nInnermost frames:\n{top}",
+    )
+    with open(result["path"], "rb") as f:
+        outbound.call(chat_id, bot.send_document, chat_id, f)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# /reload  (admins only)
+# ══════════════════════════════════════════════════════════════════════════════
+
+@bot.message_handler(commands=["reload"], func=lambda message: message.from_user.id in ADMIN_IDS)
+def reload_command(message):
+    chat_id = message.chat.id
+    if SHARDS > 1:
+        # The front forwards SIGHUP to every worker, this one included
+        os.kill(os.getppid(), signal.SIGHUP)
+        outbound.send_message(chat_id, f"🔄 Reload requested on all {SHARDS} shards.")
+        return
+
+    def done(result, error):
+        if error:
+            outbound.send_message(chat_id, f"❌ Reload failed, still on the previous version: {error}")
+        elif result is None:
+            outbound.send_message(chat_id, "❌ A reload is already running.")
+        else:
+            outbound.send_message(chat_id, f"✅ Reloaded {result['components']} components in {result['seconds']:.2f}s.")
+
+    reload_async(done)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# /stats
+# ══════════════════════════════════════════════════════════════════════════════
+
+@bot.message_handler(commands=["stats"])
+@traced_update("message")
+def stats_command(message):
+    # Read from the aggregate tables (db.py), so the cost does not grow with the user count
+    paths = user_db_paths()
+    lines = ["📊 Most popular components:"]
+    for comp_type, cfg in component_maps().config.items():
+        top = [
+            f"{component['name']} ({builds})"
+            for component_id, builds in popular_components(comp_type, 3, paths)
+            if (component := get_component(component_id))
+        ]
+        lines.append(f"{cfg['emoji']} {cfg['label']}: {', '.join(top) or '—'}")
+
+    tiers = spend_by_tier(paths)
+    if tiers:
+        lines.append("\n💰 Average build price by tier:")
+        lines.extend(f"• {tier}: ${t['average']} ({t['builds']} builds)" for tier, t in tiers.items())
+    outbound.send_message(message.chat.id, "\n".join(lines))
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # Back to menu
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "back_menu")
+@router.on("back_menu")
 def back_menu(call):
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="✨ Welcome to the Telegram bot where you can create and test your system ✨",
@@ -115,17 +321,17 @@ def back_menu(call):
 # Tabs
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("tab"))
-def handle_tabs(call):
-    tab = call.data.replace("tab", "")
-    markup = types.InlineKeyboardMarkup()
+_TAB_TEXTS = {
+    "1": "🖥️ Create new system\n\nWhat do you want to do first:",
+    "2": "👾 View all systems\n\nChoose the system:",
+    "3": "🔄 Upgrade system\n\nChoose the system:",
+    "4": "📚 View tutorials\n\nChoose the tutorial:",
+}
 
-    texts = {
-        "1": "🖥️ Create new system\n\nWhat do you want to do first:",
-        "2": "👾 View all systems\n\nChoose the system:",
-        "3": "🔄 Upgrade system\n\nChoose the system:",
-        "4": "📚 View tutorials\n\nChoose the tutorial:",
-    }
+
+@_markup_cache
+def _tab_markup(tab: str) -> str:
+    markup = types.InlineKeyboardMarkup()
 
     if tab == "1":
         markup.row(
@@ -157,11 +363,16 @@ def handle_tabs(call):
     else:
         markup.add(_back_btn())
 
-    bot.edit_message_text(
+    return markup.to_json()
+
+
+@router.on_prefix("tab")
+def handle_tabs(call, tab: str):
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        text=texts.get(tab, "Unknown tab"),
-        reply_markup=markup,
+        text=_TAB_TEXTS.get(tab, "Unknown tab"),
+        reply_markup=_tab_markup(tab if tab in _TAB_TEXTS else ""),
     )
     bot.answer_callback_query(call.id)
 
@@ -170,16 +381,16 @@ def handle_tabs(call):
 # Computer creation
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "new_comp")
+@router.on("new_comp")
 def create_new_comp(call):
     ud = get_user_data(call.from_user.id)
     ud["awaiting_input"] = "computer_name"
-    bot.send_message(call.message.chat.id, "💻 Enter a name for your computer:")
+    outbound.send_message(call.message.chat.id, "💻 Enter a name for your computer:")
 
 
-@bot.callback_query_handler(func=lambda call: call.data == "new_components")
+@router.on("new_components")
 def show_components_menu(call):
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="👽 Choose what you want to add:",
@@ -199,17 +410,17 @@ _ADD_CB_TO_COMP = {
     "add_mb":   "motherboard",
 }
 
-@bot.callback_query_handler(func=lambda call: call.data in _ADD_CB_TO_COMP or call.data == "add_next_component")
+@router.on(*_ADD_CB_TO_COMP, "add_next_component")
 def choose_option_to_add(call):
     user_id = call.from_user.id
     ud = get_user_data(user_id)
 
     if not get_current_computer(user_id):
-        bot.send_message(call.message.chat.id, "❌ You don't have any computers yet!")
+        outbound.send_message(call.message.chat.id, "❌ You don't have any computers yet!")
         return
 
     if call.data == "add_next_component":
-        bot.send_message(
+        outbound.send_message(
             call.message.chat.id,
             "Choose what you want to add:",
             reply_markup=_component_menu_markup("add_"),
@@ -217,19 +428,44 @@ def choose_option_to_add(call):
         return
 
     comp_type = _ADD_CB_TO_COMP[call.data]
-    cfg = COMPONENT_CONFIG[comp_type]
+    cfg = component_maps().config[comp_type]
     ud["awaiting_input"] = comp_type
     bot.delete_message(call.message.chat.id, call.message.message_id)
-    bot.send_message(call.message.chat.id, f"{cfg['emoji']} Enter {cfg['label']} model:")
+    text, markup = f"{cfg['emoji']} Enter {cfg['label']} model:", None
+    hint, suggestions = _suggestions(get_current_computer(user_id), comp_type)
+    if suggestions:
+        markup = types.InlineKeyboardMarkup()
+        for comp in suggestions:
+            markup.add(types.InlineKeyboardButton(
+                f"{cfg['emoji']} {comp['name']} — ${comp['price']}",
+                callback_data=encode_selection(comp_type, comp["id"]),
+            ))
+        text += f"\n\n💡 {hint}:"
+    outbound.send_message(call.message.chat.id, text, reply_markup=markup)
+
+
+def _suggestions(computer, comp_type: str, limit: int = 3) -> tuple[str, list[dict]]:
+    """
+    Components to offer for comp_type: what the builds most like this one use
+    (see similar.py), or the most picked ones overall for a build with no
+    catalog component yet.
+    """
+    ranked = suggest_components(computer, limit).get(comp_type)
+    hint   = "Builds like yours often use"
+    if not ranked:
+        ranked = popular_components(comp_type, limit, user_db_paths())
+        hint   = "Popular picks"
+    found = [get_component(component_id) for component_id, _ in ranked]
+    return hint, [comp for comp in found if comp]
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # Change component triggers
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "ch_component")
+@router.on("ch_component")
 def change_component(call):
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="🧐 Choose component to change:",
@@ -244,18 +480,18 @@ _CHANGE_CB_TO_STATE = {
     "change_mam":  ("change_mam",  "motherboard"),
 }
 
-@bot.callback_query_handler(func=lambda call: call.data in _CHANGE_CB_TO_STATE)
+@router.on(*_CHANGE_CB_TO_STATE)
 def change_option(call):
     user_id = call.from_user.id
     ud = get_user_data(user_id)
     computer = get_current_computer(user_id)
 
     state, comp_type = _CHANGE_CB_TO_STATE[call.data]
-    cfg = COMPONENT_CONFIG[comp_type]
+    cfg = component_maps().config[comp_type]
 
     ud["awaiting_input"] = state
     current = computer.get(cfg["key"]) or "Not set"
-    bot.send_message(
+    outbound.send_message(
         call.message.chat.id,
         f"{cfg['emoji']} Change {cfg['label']}\nCurrent: {current}\n\nEnter new {cfg['label']} model:",
     )
@@ -265,9 +501,9 @@ def change_option(call):
 # Delete component  (unified — was 5 separate handlers)
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "del_component")
+@router.on("del_component")
 def show_delete_menu(call):
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="🗑️ Choose component to delete:",
@@ -282,52 +518,61 @@ _DELETE_CB_MAP = {
     "delete_mam":  "motherboard",
 }
 
-@bot.callback_query_handler(func=lambda call: call.data in _DELETE_CB_MAP)
+@router.on(*_DELETE_CB_MAP)
 def delete_option(call):
     user_id = call.from_user.id
     computer = get_current_computer(user_id)
 
     comp_type = _DELETE_CB_MAP[call.data]
-    cfg = COMPONENT_CONFIG[comp_type]
+    cfg = component_maps().config[comp_type]
 
     computer[cfg["key"]]       = None
     computer[cfg["price_key"]] = None
     auto_save(user_id)
 
-    markup = types.InlineKeyboardMarkup()
-    markup.row(types.InlineKeyboardButton("🗑️ Delete next component", callback_data="del_component"))
-    markup.row(_back_btn())
-
-    bot.send_message(
+    outbound.send_message(
         call.message.chat.id,
         f"💔 {cfg['emoji']} {cfg['label']} deleted\n\nComponent removed from {computer['name']}",
-        reply_markup=markup,
+        reply_markup=_delete_next_markup(),
     )
 
 
+@_markup_cache
+def _delete_next_markup() -> str:
+    markup = types.InlineKeyboardMarkup()
+    markup.row(types.InlineKeyboardButton("🗑️ Delete next component", callback_data="del_component"))
+    markup.row(_back_btn())
+    return markup.to_json()
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # Select component from search results  (unified — was 5 separate handlers)
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data.split(":")[0] in SELECT_CB_TO_COMP)
-def show_buttons_with_components(call):
+@router.on_prefix(*SELECT_CB_TO_COMP)
+def show_buttons_with_components(call, encoded_id: str):
     user_id = call.from_user.id
     computer = get_current_computer(user_id)
 
-    parts = call.data.split(":")
-    cb_prefix      = parts[0]
-    component_name = parts[2]
-    component_price = int(parts[3])
+    maps = component_maps()
+    comp_type = maps.select_cb_to_comp[call.data[:len(call.data) - len(encoded_id)]]
+    cfg = maps.config[comp_type]
+
+    component_id = decode_selection_id(encoded_id)
+    component    = get_component(component_id) if component_id is not None else None
+    if component is None or component["type"] != comp_type:
+        bot.answer_callback_query(call.id, "❌ This option is no longer available, please search again.")
+        return
 
-    comp_type = SELECT_CB_TO_COMP[cb_prefix]
-    cfg = COMPONENT_CONFIG[comp_type]
+    component_name  = component["name"]
+    component_price = component["price"]
 
     computer[cfg["key"]]       = component_name
     computer[cfg["price_key"]] = component_price
     auto_save(user_id)
 
     progress = get_build_progress(computer)
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=f"✅ {cfg['label']} selected: '{component_name}' — ${component_price}\n{progress}",
@@ -339,12 +584,11 @@ def show_buttons_with_components(call):
 # Manual price entry
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("enter_price_"))
-def manually_price_enter(call):
+@router.on_prefix("enter_price_")
+def manually_price_enter(call, comp_type: str):
     ud = get_user_data(call.from_user.id)
-    comp_type = call.data.replace("enter_price_", "")
     ud["awaiting_input"] = f"manual_name_{comp_type}"
-    bot.send_message(call.message.chat.id, f"✍️ Enter name of: {comp_type.upper()}:")
+    outbound.send_message(call.message.chat.id, f"✍️ Enter name of: {comp_type.upper()}:")
     bot.answer_callback_query(call.id)
 
 
@@ -352,31 +596,28 @@ def manually_price_enter(call):
 # View components
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "view_components")
+@router.on("view_components")
 def view_components(call):
     computer = get_current_computer(call.from_user.id)
     if not computer:
-        bot.send_message(call.message.chat.id, "❌ No computer found!")
+        outbound.send_message(call.message.chat.id, "❌ No computer found!")
         return
 
     created = computer["created_at"]
     date_str = created.strftime("%d.%m.%Y") if hasattr(created, "strftime") else str(created)
 
     lines = [f"🖥️ **Computer Components:**\n", f"📅 Created: {date_str}\n\n**Components:**"]
-    for cfg in COMPONENT_CONFIG.values():
+    for cfg in component_maps().config.values():
         val = computer.get(cfg["key"]) or "❌ Not set"
         lines.append(f"{cfg['emoji']} **{cfg['label']}:** {val}")
     total = computer.get("total_price") or "❌ Not calculated"
     lines.append(f"💰 **Total price: {total}$**")
 
-    markup = types.InlineKeyboardMarkup()
-    markup.row(_back_btn())
-
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="\n".join(lines),
-        reply_markup=markup,
+        reply_markup=_back_only_markup(),
         parse_mode="Markdown",
     )
 
@@ -385,28 +626,29 @@ def view_components(call):
 # Choose / switch computer
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "choose_comp")
+@router.on("choose_comp")
 def choose_comp(call):
     user_id = call.from_user.id
     ud = get_user_data(user_id)
     computers = ud["computers"]
-    markup = types.InlineKeyboardMarkup()
 
     if not computers:
-        markup.row(_back_btn())
-        bot.edit_message_text(
+        outbound.edit_message_text(
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             text="❌ You need to create your first computer",
-            reply_markup=markup,
+            reply_markup=_back_only_markup(),
         )
         return
 
+    markup = types.InlineKeyboardMarkup()
     for c in computers:
         markup.add(types.InlineKeyboardButton(f"💻 {c['name']}", callback_data=f"comp_{c['id']}"))
+    if len(computers) > 1:
+        markup.add(types.InlineKeyboardButton("⚖️ Compare my builds", callback_data="cmp_menu"))
     markup.add(_back_btn())
 
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="👾 Choose your computer:",
@@ -414,13 +656,23 @@ def choose_comp(call):
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("comp_"))
-def option_with_computers(call):
+@router.on_prefix("comp_")
+def option_with_computers(call, computer_id: str):
     user_id = call.from_user.id
     ud = get_user_data(user_id)
-    computer_id = int(call.data.replace("comp_", ""))
-    ud["current_computer"] = computer_id
+    ud["current_computer"] = int(computer_id)
+    mark_dirty(user_id)
+
+    outbound.edit_message_text(
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        text="🦾 Choose an option:",
+        reply_markup=_computer_options_markup(),
+    )
 
+
+@_markup_cache
+def _computer_options_markup() -> str:
     markup = types.InlineKeyboardMarkup()
     markup.row(
         types.InlineKeyboardButton("🤖 AI Check",          callback_data="ai_check"),
@@ -431,65 +683,96 @@ def option_with_computers(call):
         types.InlineKeyboardButton("🗑️ Delete component",   callback_data="del_component"),
         types.InlineKeyboardButton("🆙 Change component",   callback_data="ch_component"),
     )
+    markup.row(types.InlineKeyboardButton("🔔 Watch prices",  callback_data="watch_build"))
     markup.row(_back_btn())
+    return markup.to_json()
 
-    bot.edit_message_text(
-        chat_id=call.message.chat.id,
-        message_id=call.message.message_id,
-        text="🦾 Choose an option:",
-        reply_markup=markup,
-    )
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Price watches
+# ══════════════════════════════════════════════════════════════════════════════
+
+@router.on("watch_build")
+def watch_build(call):
+    """Toggle price-drop alerts for every catalog component of the current build."""
+    user_id  = call.from_user.id
+    computer = get_current_computer(user_id)
+
+    prices = {}
+    for cfg in component_maps().config.values():
+        component = get_component_by_name(computer.get(cfg["key"]) or "") if computer else None
+        if component and component["price"] is not None:
+            prices[component["id"]] = component["price"]
+
+    if not prices:
+        bot.answer_callback_query(call.id, "❌ No catalog components in this build to watch.")
+        return
+
+    if prices.keys() <= watched_components(user_id):
+        unwatch_components(user_id, prices)
+        bot.answer_callback_query(call.id, "🔕 Stopped watching prices for this build.")
+    else:
+        watch_components(user_id, prices)
+        bot.answer_callback_query(
+            call.id,
+            f"🔔 Watching {len(prices)} components — you'll get a message when any gets cheaper.",
+            show_alert=True,
+        )
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # Build complete
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "build_complete")
+@router.on("build_complete")
 def build_complete(call):
     computer = get_current_computer(call.from_user.id)
 
-    markup = types.InlineKeyboardMarkup()
-    markup.row(
-        types.InlineKeyboardButton("👀 View Components",      callback_data="view_components"),
-        types.InlineKeyboardButton("🔄 Upgrade system",       callback_data="ch_component"),
-    )
-    markup.row(
-        types.InlineKeyboardButton("🛒 Buy products",          callback_data="buy_component"),
-        types.InlineKeyboardButton("🖥️ Create New",            callback_data="new_comp"),
-        types.InlineKeyboardButton("🤖 AI Check",              callback_data="ai_check"),
-    )
-    markup.row(_back_btn())
-
     lines = [
         f"🎉 Build Complete! 🎉\n",
         f"🖥️ {computer['name']} is ready!\n",
         "All components:",
     ]
-    for cfg in COMPONENT_CONFIG.values():
+    for cfg in component_maps().config.values():
         lines.append(f"{cfg['emoji']} {computer.get(cfg['key']) or 'Not set'}")
     lines.append(f"💰 ${computer.get('total_price') or 0}\n")
     lines.append("Your dream computer is assembled!")
 
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text="\n".join(lines),
-        reply_markup=markup,
+        reply_markup=_build_complete_markup(),
+    )
+
+
+@_markup_cache
+def _build_complete_markup() -> str:
+    markup = types.InlineKeyboardMarkup()
+    markup.row(
+        types.InlineKeyboardButton("👀 View Components",      callback_data="view_components"),
+        types.InlineKeyboardButton("🔄 Upgrade system",       callback_data="ch_component"),
+    )
+    markup.row(
+        types.InlineKeyboardButton("🛒 Buy products",          callback_data="buy_component"),
+        types.InlineKeyboardButton("🖥️ Create New",            callback_data="new_comp"),
+        types.InlineKeyboardButton("🤖 AI Check",              callback_data="ai_check"),
     )
+    markup.row(_back_btn())
+    return markup.to_json()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # Buy products
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "buy_component")
+@router.on("buy_component")
 def buy_component(call):
     computer = get_current_computer(call.from_user.id)
     markup = types.InlineKeyboardMarkup()
     found_links = False  # FIX: was used before assignment → UnboundLocalError
 
-    for cfg in COMPONENT_CONFIG.values():
+    for cfg in component_maps().config.values():
         name = computer.get(cfg["key"])
         if name:
             link = product_link(name)
@@ -505,7 +788,7 @@ def buy_component(call):
         "😕 **No links found.**\nWe couldn't find shop links for these components in our database."
     )
 
-    bot.edit_message_text(
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         text=msg,
@@ -518,32 +801,168 @@ def buy_component(call):
 # AI check
 # ══════════════════════════════════════════════════════════════════════════════
 
-@bot.callback_query_handler(func=lambda call: call.data == "ai_check")
+_STREAM_CURSOR = " ▌"
+
+
+def _split_for_telegram(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LEN) -> tuple[str, str]:
+    """Split text into (fits in one message, rest), preferring a line break as the cut point."""
+    if len(text) <= limit:
+        return text, ""
+    cut = text.rfind("\n", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:].lstrip("\n")
+
+
+def _stream_reply(chat_id: int, message_id: int, header: str, chunks, markup) -> None:
+    """
+    Progressively edit an existing message while chunks arrive.
+
+    Edits are throttled to one per STREAM_EDIT_INTERVAL; when the text outgrows
+    one Telegram message the current one is finalised and a new one is continued.
+    The reply markup is attached to the last message only.
+    """
+    outbound.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=header + "⏳ Thinking…",
+        parse_mode="Markdown",
+    )
+
+    text      = header
+    shown     = ""
+    last_edit = 0.0  # show the first chunk as soon as it arrives
+
+    for chunk in chunks:
+        text += chunk
+        while len(text) > TELEGRAM_MAX_MESSAGE_LEN - len(_STREAM_CURSOR):
+            head, text = _split_for_telegram(text, TELEGRAM_MAX_MESSAGE_LEN - len(_STREAM_CURSOR))
+            outbound.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=head,
+                parse_mode="Markdown",
+            )
+            message_id = outbound.send_message(chat_id, "…").message_id
+            shown      = ""
+
+        if text != shown and time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+            outbound.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text + _STREAM_CURSOR,
+                parse_mode="Markdown",
+            )
+            shown     = text
+            last_edit = time.monotonic()
+
+    outbound.edit_message_text(
+        chat_id=chat_id,
+        message_id=message_id,
+        text=text,
+        reply_markup=markup,
+        parse_mode="Markdown",
+        final=True,
+    )
+
+
+@router.on("ai_check")
 def ai_check(call):
     computer = get_current_computer(call.from_user.id)
-    response = analyze_build_with_ai(computer)
+    bot.answer_callback_query(call.id)
 
+    lines = [f"🖥️ **{computer['name']}**\n", "Components:"]
+    for cfg in component_maps().config.values():
+        lines.append(f"{cfg['emoji']} {computer.get(cfg['key']) or 'Not set'}")
+    lines.append(f"💰 ${computer.get('total_price') or 0}\n")
+    lines.append("**What AI thinks about your build:**\n")
+
+    _stream_reply(
+        call.message.chat.id,
+        call.message.message_id,
+        "\n".join(lines) + "\n",
+        stream_build_analysis(computer),
+        _ai_check_markup(),
+    )
+
+
+@_markup_cache
+def _ai_check_markup() -> str:
     markup = types.InlineKeyboardMarkup()
     markup.row(
         types.InlineKeyboardButton("🔄 Upgrade system", callback_data="ch_component"),
         types.InlineKeyboardButton("🖥️ Create New",     callback_data="new_comp"),
     )
     markup.row(_back_btn())
+    return markup.to_json()
 
-    lines = [f"🖥️ **{computer['name']}**\n", "Components:"]
-    for cfg in COMPONENT_CONFIG.values():
-        lines.append(f"{cfg['emoji']} {computer.get(cfg['key']) or 'Not set'}")
-    lines.append(f"💰 ${computer.get('total_price') or 0}\n")
-    lines.append("**What AI thinks about your build:**\n")
-    lines.append(response)
 
-    bot.edit_message_text(
+# ══════════════════════════════════════════════════════════════════════════════
+# Compare builds  (one batched AI call for all selected builds)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _compare_menu_markup(ud: dict) -> types.InlineKeyboardMarkup:
+    selected = ud.get("compare_selection") or set()
+    markup = types.InlineKeyboardMarkup()
+    for c in ud["computers"]:
+        mark = "✅" if c["id"] in selected else "⬜"
+        markup.add(types.InlineKeyboardButton(f"{mark} {c['name']}", callback_data=f"cmp_t{c['id']}"))
+    markup.row(types.InlineKeyboardButton("⚖️ Compare selected", callback_data="cmp_run"))
+    markup.row(_back_btn())
+    return markup
+
+
+@router.on("cmp_menu")
+def compare_menu(call):
+    ud = get_user_data(call.from_user.id)
+    ud["compare_selection"] = {c["id"] for c in ud["computers"]}
+    _show_compare_menu(call, ud)
+
+
+@router.on_prefix("cmp_t")
+def compare_toggle(call, computer_id: str):
+    ud = get_user_data(call.from_user.id)
+    ud.setdefault("compare_selection", set()).symmetric_difference_update({int(computer_id)})
+    _show_compare_menu(call, ud)
+
+
+def _show_compare_menu(call, ud: dict) -> None:
+    outbound.edit_message_text(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        text="\n".join(lines),
-        reply_markup=markup,
-        parse_mode="Markdown",
+        text="⚖️ Choose the builds to compare:",
+        reply_markup=_compare_menu_markup(ud),
     )
+    bot.answer_callback_query(call.id)
+
+
+@router.on("cmp_run")
+def compare_run(call):
+    ud = get_user_data(call.from_user.id)
+    selected  = ud.get("compare_selection") or set()
+    computers = [c for c in ud["computers"] if c["id"] in selected]
+
+    if len(computers) < 2:
+        bot.answer_callback_query(call.id, "Select at least two builds to compare")
+        return
+    bot.answer_callback_query(call.id)
+
+    _stream_reply(
+        call.message.chat.id,
+        call.message.message_id,
+        f"⚖️ Comparing {len(computers)} builds\n\n",
+        _comparison_chunks(computers),
+        _back_only_markup(),
+    )
+
+
+def _comparison_chunks(computers: list[dict]):
+    analyses, verdict = compare_builds_with_ai(computers)
+    for c in computers:
+        yield f"🖥️ {c['name']} — ${c.get('total_price') or 0}\n"
+        yield analyses.get(c["id"], "No analysis returned for this build.") + "\n\n"
+    if verdict:
+        yield f"🏆 Verdict:\n{verdict}"
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -551,10 +970,13 @@ def ai_check(call):
 # ══════════════════════════════════════════════════════════════════════════════
 
 @bot.message_handler(func=lambda message: True)
+@traced_update("message")
+@_per_user
 def handle_text_input(message):
     user_id = message.from_user.id
     ud = get_user_data(user_id)
     state = ud.get("awaiting_input")
+    state_to_comp = component_maps().state_to_comp
 
     if state == "computer_name":
         _handle_computer_name(message, user_id, ud)
@@ -565,9 +987,9 @@ def handle_text_input(message):
     elif state and state.startswith("manual_price_"):
         _handle_manual_price(message, user_id, ud, state)
 
-    elif state in STATE_TO_COMP:
+    elif state in state_to_comp:
         is_change = state.startswith("change_")
-        _handle_component_input(message, user_id, ud, STATE_TO_COMP[state], is_change)
+        _handle_component_input(message, user_id, ud, state_to_comp[state], is_change)
 
 
 # ── Sub-handlers ──────────────────────────────────────────────────────────────
@@ -577,35 +999,41 @@ def _handle_computer_name(message, user_id: int, ud: dict) -> None:
     create_new_computer(user_id, name)
     ud["awaiting_input"] = None
 
-    markup = types.InlineKeyboardMarkup()
-    markup.row(types.InlineKeyboardButton("🔧 Add components", callback_data="new_components"))
-    markup.row(_back_btn())
-
-    bot.send_message(
+    outbound.send_message(
         message.chat.id,
         f"✅ Computer '{name}' created! Now add components.",
-        reply_markup=markup,
+        reply_markup=_computer_created_markup(),
     )
 
 
+@_markup_cache
+def _computer_created_markup() -> str:
+    markup = types.InlineKeyboardMarkup()
+    markup.row(types.InlineKeyboardButton("🔧 Add components", callback_data="new_components"))
+    markup.row(_back_btn())
+    return markup.to_json()
+
+
 def _handle_manual_name(message, user_id: int, ud: dict, state: str) -> None:
     comp_type = state.split("_", 2)[-1]  # 'manual_name_cpu' → 'cpu'
     ud["temp_manual_name"] = message.text
     ud["awaiting_input"]   = f"manual_price_{comp_type}"
-    bot.send_message(message.chat.id, f"💰 Now enter the price for '{message.text}' (in $):")
+    outbound.send_message(message.chat.id, f"💰 Now enter the price for '{message.text}' (in $):")
 
 
 def _handle_manual_price(message, user_id: int, ud: dict, state: str) -> None:
     comp_type = state.split("_", 2)[-1]
     try:
         price = int(message.text.strip())
+        if not 0 <= price < 10 ** 9:
+            raise ValueError(price)
     except ValueError:
-        bot.send_message(message.chat.id, "❌ Please enter a valid number (e.g., 250).")
+        outbound.send_message(message.chat.id, "❌ Please enter a valid number (e.g., 250).")
         return
 
     comp_name = ud.pop("temp_manual_name", "Unknown")
     computer  = get_current_computer(user_id)
-    cfg       = COMPONENT_CONFIG.get(comp_type, {})
+    cfg       = component_maps().config.get(comp_type, {})
 
     if cfg:
         computer[cfg["key"]]       = comp_name
@@ -615,7 +1043,7 @@ def _handle_manual_price(message, user_id: int, ud: dict, state: str) -> None:
 
     progress = get_build_progress(computer)
     markup = _after_component_markup(is_change=False, computer=computer)
-    bot.send_message(
+    outbound.send_message(
         message.chat.id,
         f"✅ Manual entry: '{comp_name}' — ${price} saved!\n{progress}",
         reply_markup=markup,
@@ -627,37 +1055,30 @@ def _handle_component_input(message, user_id: int, ud: dict, comp_type: str, is_
     Single function handling both 'add' and 'change' flows for all 5 component types.
     Replaces 10 near-identical elif blocks from the original file.
     """
-    cfg       = COMPONENT_CONFIG[comp_type]
+    cfg       = component_maps().config[comp_type]
     query     = message.text
     similar   = search_component_price(query, comp_type)
 
     if not similar:
-        markup = types.InlineKeyboardMarkup()
-        markup.row(
-            types.InlineKeyboardButton("🔧 Add next component", callback_data="add_next_component"),
-            types.InlineKeyboardButton("💸 Enter manually",     callback_data=cfg["manual_cb"]),
-        )
-        markup.row(_back_btn())
-        bot.send_message(
+        outbound.send_message(
             message.chat.id,
             "❌ No price found for this component. You can enter the price manually.",
-            reply_markup=markup,
+            reply_markup=_search_fallback_markup(comp_type),
         )
         return
 
     if len(similar) > 1:
         markup = types.InlineKeyboardMarkup()
-        for comp in similar[:4]:
+        shown  = similar[:4]
+        drops  = price_drops({comp["id"]: comp["price"] for comp in shown})
+        for comp in shown:
+            dropped = f" 📉 was ${drops[comp['id']]}" if comp["id"] in drops else ""
             markup.add(types.InlineKeyboardButton(
-                f"{cfg['emoji']} {comp['name']} — ${comp['price']}",
-                callback_data=f"{cfg['select_cb']}:{comp['id']}:{comp['name']}:{comp['price']}",
+                f"{cfg['emoji']} {comp['name']} — ${comp['price']}{dropped}",
+                callback_data=encode_selection(comp_type, comp["id"]),
             ))
-        markup.row(
-            types.InlineKeyboardButton("🔧 Add next component", callback_data="add_next_component"),
-            types.InlineKeyboardButton("💸 Enter manually",     callback_data=cfg["manual_cb"]),
-        )
-        markup.row(_back_btn())
-        bot.send_message(message.chat.id, "🔍 Found several options. Choose one:", reply_markup=markup)
+        _add_search_fallback_rows(markup, comp_type)
+        outbound.send_message(message.chat.id, "🔍 Found several options. Choose one:", reply_markup=markup)
         return
 
     # Exactly one result
@@ -673,7 +1094,7 @@ def _handle_component_input(message, user_id: int, ud: dict, comp_type: str, is_
 
     progress = get_build_progress(computer)
     action   = "changed" if is_change else "added"
-    bot.send_message(
+    outbound.send_message(
         message.chat.id,
         f"✅ {cfg['label']} {action}: '{comp_name}' — ${comp_price}\n{progress}",
         reply_markup=_after_component_markup(is_change=is_change, computer=computer),
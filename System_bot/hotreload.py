@@ -0,0 +1,77 @@
+"""
+hotreload.py  —  swap in a fresh catalog index and component maps without a restart.
+
+Triggered by SIGHUP (kill -HUP <pid>; in sharded mode the front forwards it
+to every worker) or by the /reload admin command. The new catalog index
+(db.build_catalog_index) and component maps (utils.load_component_maps with
+COMPONENT_OVERRIDES_PATH) are built in a background thread while updates
+are still served from the old ones; then each is made live with one
+reference assignment. An update already running keeps what it has read,
+and the user cache and every other warm state stay as they are.
+
+Functions registered with @on_reload (handlers.py clears its cached
+keyboards) run after the swap.
+"""
+
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+import db
+import utils
+from config import logger, COMPONENT_OVERRIDES_PATH
+
+_hooks: list[Callable[[], None]] = []
+_lock = threading.Lock()
+
+
+def on_reload(fn: Callable[[], None]) -> Callable[[], None]:
+    """Decorator: call fn after every successful reload."""
+    _hooks.append(fn)
+    return fn
+
+
+def reload() -> Optional[dict]:
+    """
+    Rebuild and swap in the catalog index and component maps. Returns
+    {"components": n, "overrides": path, "seconds": s}, or None when a reload
+    is already running. A bad overrides file raises ValueError before
+    anything is swapped.
+    """
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.monotonic()
+        maps    = utils.load_component_maps(COMPONENT_OVERRIDES_PATH)
+        catalog = db.build_catalog_index()
+        db.set_catalog(catalog)
+        utils.set_component_maps(maps)
+        for hook in _hooks:
+            hook()
+        seconds = time.monotonic() - started
+    finally:
+        _lock.release()
+    logger.info("🔄 Hot reload done: %d components in %.2fs", len(catalog.by_id), seconds)
+    return {"components": len(catalog.by_id), "overrides": COMPONENT_OVERRIDES_PATH, "seconds": seconds}
+
+
+def reload_async(done: Optional[Callable[[Optional[dict], Optional[Exception]], None]] = None) -> None:
+    """Run reload() in a background thread; done(result, error) is called when it finishes."""
+    def run() -> None:
+        try:
+            result, error = reload(), None
+        except Exception as e:
+            result, error = None, e
+            logger.error("❌ Hot reload failed, still serving the previous version: %s", e)
+        if done:
+            done(result, error)
+
+    threading.Thread(target=run, name="hot-reload", daemon=True).start()
+
+
+def install() -> None:
+    """Apply COMPONENT_OVERRIDES_PATH now and reload on SIGHUP. Call from the main thread."""
+    utils.set_component_maps(utils.load_component_maps(COMPONENT_OVERRIDES_PATH))
+    if hasattr(signal, "SIGHUP"):  # not on Windows
+        signal.signal(signal.SIGHUP, lambda *_: reload_async())
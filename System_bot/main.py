@@ -4,10 +4,17 @@ main.py  —  entry point.
 Run:  python main.py
 """
 
-import config          # sets up logging, bot, client
+import config          # sets up logging (bot and client are built on first use)
+import alerts
 import handlers        # registers all @bot handlers  # noqa: F401
-from db import init_database
-from config import bot, logger, GOOGLE_API_KEY, BOT_TOKEN
+import hotreload
+import revaluation
+import maintenance
+import sharding
+import similar
+import tracing
+from db import init_database, warm_cache, load_catalog
+from config import bot, logger, GOOGLE_API_KEY, BOT_TOKEN, WARMUP_USERS, SHARDS
 
 
 def main() -> None:
@@ -16,11 +23,36 @@ def main() -> None:
     logger.info("✅ Bot Token:      %s", "yes" if BOT_TOKEN      else "NO — check tokens.env")
 
     init_database()
+    # Users must already sit in the files of the configured shard layout.
+    sharding.check_layout()
 
     # Uncomment once to seed the database from components.csv:
     # from db import import_prices_from_csv
     # import_prices_from_csv()
 
+    if SHARDS > 1:
+        # Workers load their own catalog index and users (see sharding.py).
+        sharding.run(SHARDS)
+        return
+
+    # Pay for the cold start here, not inside the first handlers after a deploy.
+    load_catalog()
+    if WARMUP_USERS:
+        warm_cache(WARMUP_USERS)
+    # Display overrides now; SIGHUP or /reload rebuilds catalog + maps in the background.
+    hotreload.install()
+    # "Builds like yours" suggestions: index saved builds in the background.
+    similar.start()
+
+    # Per-update spans → TRACE_FILE (sampled + every slow update; see tracing.py).
+    tracing.install()
+    # Reprice saved builds whenever parsing.py records new catalog prices.
+    revaluation.start()
+    # Price-drop alerts queued by parsing.py.
+    alerts.start()
+    # Daily online backup + incremental vacuum / ANALYZE.
+    maintenance.start()
+
     logger.info("🖥️ Computer Builder Bot is running…")
     bot.infinity_polling()
 
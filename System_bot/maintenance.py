@@ -0,0 +1,256 @@
+"""
+maintenance.py  —  online backup and compaction of computers.db.
+
+Run standalone:
+    python maintenance.py backup [destination]   # online snapshot
+    python maintenance.py vacuum                 # incremental vacuum + ANALYZE (converts once)
+    python maintenance.py report                 # fragmentation report only
+    python maintenance.py stats                  # rebuild the stats tables
+
+The bot also runs run_maintenance() on a schedule (MAINTENANCE_INTERVAL),
+followed by a full rebuild of the incrementally kept stats tables.
+
+  • Backups copy every page in one step of SQLite's backup API. A stepwise
+    copy is no good here: any write by another connection restarts it from
+    the first page, so under steady saves it might never finish. The
+    databases run in WAL mode (db.init_database), so the single step reads
+    a snapshot and bot saves carry on while it copies.
+  • The database has to be switched to auto_vacuum=INCREMENTAL once, with a
+    full VACUUM that locks out every writer while it runs — so this is done
+    only by `python maintenance.py vacuum` (with the bot stopped), never by
+    the scheduled job. Afterwards free pages are returned to the OS in small
+    incremental_vacuum steps, each its own short write transaction.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from config import (
+    logger,
+    BACKUP_DIR,
+    BACKUP_KEEP,
+    MAINTENANCE_INTERVAL,
+)
+import db
+from db import DB_PATH
+
+_AUTO_VACUUM_INCREMENTAL = 2
+_VACUUM_STEP_PAGES = 256
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    return sqlite3.connect(path or DB_PATH, check_same_thread=False, timeout=30)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Backup
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _stem(path: Optional[str]) -> str:
+    return os.path.splitext(os.path.basename(path or DB_PATH))[0]
+
+
+def backup(destination: Optional[str] = None, path: Optional[str] = None) -> str:
+    """
+    Copy the live database at path (default DB_PATH) to destination (default:
+    a timestamped file in BACKUP_DIR) in one backup step. Returns the path of
+    the snapshot.
+    """
+    if destination is None:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        destination = os.path.join(BACKUP_DIR, f"{_stem(path)}-{datetime.now():%Y%m%d-%H%M%S}.db")
+
+    started = time.monotonic()
+    src = _connect(path)
+    dst = sqlite3.connect(destination)
+    try:
+        src.backup(dst, pages=-1)
+    finally:
+        dst.close()
+        src.close()
+
+    logger.info("📦 Backup written to %s (%.1f KiB, %.2fs)",
+                destination, os.path.getsize(destination) / 1024, time.monotonic() - started)
+    _prune_backups(_stem(path))
+    return destination
+
+
+def _prune_backups(stem: str, keep: int = BACKUP_KEEP) -> None:
+    """Keep only the newest `keep` automatic snapshots of one database in BACKUP_DIR."""
+    if not os.path.isdir(BACKUP_DIR):
+        return
+    snapshots = sorted(
+        f for f in os.listdir(BACKUP_DIR)
+        if f.startswith(f"{stem}-") and f.endswith(".db") and f[len(stem) + 1:len(stem) + 2].isdigit()
+    )
+    for name in snapshots[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(BACKUP_DIR, name))
+        logger.info("🗑️ Old backup removed: %s", name)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Fragmentation report
+# ══════════════════════════════════════════════════════════════════════════════
+
+def fragmentation_report(conn: sqlite3.Connection) -> dict:
+    """
+    Page statistics of the database: size, free pages and, per table/index,
+    pages used and the share of pages not stored in b-tree order (needs the
+    dbstat virtual table; the per-table part is skipped without it).
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages     = conn.execute("PRAGMA page_count").fetchone()[0]
+    free      = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    report = {
+        "page_size":   page_size,
+        "pages":       pages,
+        "free_pages":  free,
+        "size_bytes":  pages * page_size,
+        "free_bytes":  free * page_size,
+        "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+        "objects":     {},
+    }
+
+    try:
+        rows = conn.execute("SELECT name, pageno, unused FROM dbstat ORDER BY name, path").fetchall()
+    except sqlite3.OperationalError:
+        return report
+
+    objects = report["objects"]
+    prev_name, prev_page = None, None
+    for name, pageno, unused in rows:
+        stats = objects.setdefault(name, {"pages": 0, "unused_bytes": 0, "out_of_order": 0})
+        stats["pages"]        += 1
+        stats["unused_bytes"] += unused
+        if name == prev_name and pageno != prev_page + 1:
+            stats["out_of_order"] += 1
+        prev_name, prev_page = name, pageno
+
+    for stats in objects.values():
+        stats["fragmentation"] = round(stats["out_of_order"] / stats["pages"], 3) if stats["pages"] > 1 else 0.0
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"Database: {report['size_bytes'] / 1024:.1f} KiB, {report['pages']} pages of {report['page_size']} B",
+        f"Free:     {report['free_pages']} pages ({report['free_bytes'] / 1024:.1f} KiB)",
+    ]
+    if report["objects"]:
+        lines.append(f"{'object':<36} {'pages':>8} {'unused KiB':>11} {'fragmented':>11}")
+        for name, stats in sorted(report["objects"].items(), key=lambda kv: -kv[1]["pages"]):
+            lines.append(
+                f"{name:<36} {stats['pages']:>8} {stats['unused_bytes'] / 1024:>11.1f} "
+                f"{stats['fragmentation']:>10.1%}"
+            )
+    return "\n".join(lines)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Compaction
+# ══════════════════════════════════════════════════════════════════════════════
+
+def compact(step_pages: int = _VACUUM_STEP_PAGES, path: Optional[str] = None, convert: bool = False) -> dict:
+    """
+    Reclaim free pages of the database at path (incremental vacuum in short
+    steps) and refresh planner statistics. A database not yet in
+    auto_vacuum=INCREMENTAL mode is only converted (full VACUUM) with convert.
+    Returns {"before": report, "after": report, "reclaimed_bytes": n}.
+    """
+    conn = _connect(path)
+    conn.isolation_level = None  # PRAGMAs / VACUUM must run outside a transaction
+    try:
+        before = fragmentation_report(conn)
+
+        if before["auto_vacuum"] != _AUTO_VACUUM_INCREMENTAL:
+            if convert:
+                logger.info("🔧 Switching to auto_vacuum=INCREMENTAL (one-time full VACUUM)…")
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            else:
+                logger.warning("⚠️ %s is not in auto_vacuum=INCREMENTAL mode, free pages are kept; "
+                               "stop the bot and run `python maintenance.py vacuum` once", path or DB_PATH)
+        else:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                conn.execute(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+                time.sleep(0)  # between steps, other connections may write
+
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        after = fragmentation_report(conn)
+    finally:
+        conn.close()
+
+    reclaimed = before["size_bytes"] - after["size_bytes"]
+    logger.info("🧹 Maintenance done: %.1f KiB reclaimed, %d free pages left",
+                reclaimed / 1024, after["free_pages"])
+    return {"before": before, "after": after, "reclaimed_bytes": reclaimed}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Scheduled job
+# ══════════════════════════════════════════════════════════════════════════════
+
+def run_maintenance(paths: Optional[list[str]] = None) -> dict:
+    """Snapshot first, then compact — the scheduled job. Returns the compact() result per path."""
+    results = {}
+    for path in paths or [DB_PATH]:
+        backup(path=path)
+        results[path] = compact(path=path)
+    return results
+
+
+def _loop(interval: float, paths: Optional[list[str]], stats: bool) -> None:
+    if stats and db.get_meta("stats_rebuilt_at") is None:
+        try:
+            db.rebuild_stats()  # first start with the stats tables: fill them now
+        except Exception as e:
+            logger.error("❌ Stats rebuild failed: %s", e)
+    while True:
+        time.sleep(interval)
+        try:
+            run_maintenance(paths)
+            if stats:
+                db.rebuild_stats()
+        except Exception as e:
+            logger.error("❌ Maintenance failed: %s", e)
+
+
+def start(interval_hours: float = MAINTENANCE_INTERVAL, paths: Optional[list[str]] = None,
+          stats: bool = True) -> None:
+    """
+    Run run_maintenance(paths) every interval_hours in a daemon thread (0 = off),
+    followed by a full db.rebuild_stats() of this process's users when stats.
+    """
+    if interval_hours <= 0:
+        return
+    threading.Thread(target=_loop, args=(interval_hours * 3600, paths, stats), name="maintenance", daemon=True).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+
+    if command == "backup":
+        backup(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == "vacuum":
+        result = compact(convert=True)
+        print(format_report(result["before"]))
+        print()
+        print(format_report(result["after"]))
+        print(f"\nReclaimed: {result['reclaimed_bytes'] / 1024:.1f} KiB")
+    elif command == "report":
+        with _connect() as conn:
+            print(format_report(fragmentation_report(conn)))
+    elif command == "stats":
+        db.load_catalog()
+        db.rebuild_stats()
+    else:
+        sys.exit(f"unknown command {command!r} (use backup, vacuum, report or stats)")
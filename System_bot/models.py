@@ -0,0 +1,228 @@
+"""
+models.py  —  compact in-memory representation of a build.
+
+A build used to be a 14-key dict per computer. BuildRecord keeps the same
+data in a __slots__ object plus one int64 array:
+
+  • component names are interned once process-wide and stored as small ids,
+    so a popular GPU name exists in memory once, not once per build (the
+    table is capped at _MAX_INTERNED names; past that, new names — typically
+    free-typed manual entries — are kept on their own record);
+  • prices live next to the name ids in the same array;
+  • the price sum and the number of filled slots are maintained on every
+    assignment, so total / completeness / progress are O(1).
+
+BuildRecord behaves like the old dict for the keys handlers use
+(computer["cpu"], computer.get("gpu_price"), computer["name"] = …), and
+to_dict() / from_dict() convert losslessly to and from the stored JSON shape.
+"""
+
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from utils import COMPONENT_CONFIG
+
+_NONE  = -(2 ** 63)  # "not set" marker inside the int64 array
+_LOCAL = _NONE + 1   # name kept in the record's own _local dict (not interned)
+
+# ── Process-wide name interning: name ↔ small int id ──────────────────────
+_MAX_INTERNED = 500_000
+_name_ids: dict[str, int] = {}
+_names:    list[str]      = []
+_intern_lock = threading.Lock()
+
+
+def _intern(name: str) -> Optional[int]:
+    """Id of name in the process-wide table, or None once the table is full and name is new."""
+    name_id = _name_ids.get(name)
+    if name_id is None:
+        with _intern_lock:
+            name_id = _name_ids.get(name)
+            if name_id is None:
+                if len(_names) >= _MAX_INTERNED:
+                    return None
+                _names.append(name)
+                name_id = _name_ids[name] = len(_names) - 1
+    return name_id
+
+
+# ── Field layout, derived from COMPONENT_CONFIG ───────────────────────────
+# Slot i of a record holds component i: name id at 2*i, price at 2*i + 1.
+_COMPONENT_KEYS: tuple[str, ...] = tuple(cfg["key"] for cfg in COMPONENT_CONFIG.values())
+_FIELDS: dict[str, int] = {}
+for _i, _cfg in enumerate(COMPONENT_CONFIG.values()):
+    _FIELDS[_cfg["key"]]       = 2 * _i
+    _FIELDS[_cfg["price_key"]] = 2 * _i + 1
+
+_BASE_KEYS = ("id", "name", "created_at", "total_price")
+_DICT_KEYS = ("id", "name") + tuple(
+    k for cfg in COMPONENT_CONFIG.values() for k in (cfg["key"], cfg["price_key"])
+) + ("total_price", "created_at")
+
+
+class BuildRecord:
+    __slots__ = ("id", "name", "created_at", "total_price", "_data", "_local", "_sum", "_filled", "extra")
+
+    def __init__(self, computer_id: int, name: str, created_at: Any = None):
+        self.id          = computer_id
+        self.name        = name
+        self.created_at  = created_at if created_at is not None else datetime.now()
+        self.total_price = None
+        self._data       = array("q", [_NONE]) * (2 * len(_COMPONENT_KEYS))
+        self._local: Optional[dict[int, str]] = None  # position → name not in the intern table
+        self._sum        = 0
+        self._filled     = 0
+        self.extra: Optional[dict] = None  # unknown keys, kept so round-trips are lossless
+
+    # ── Incrementally maintained aggregates ───────────────────────────────────
+
+    @property
+    def price_sum(self) -> int:
+        """Sum of all set component prices (what count_total_price stores)."""
+        return self._sum
+
+    @property
+    def filled(self) -> int:
+        """Number of component slots with a non-empty name."""
+        return self._filled
+
+    def is_complete(self) -> bool:
+        return self._filled == len(_COMPONENT_KEYS)
+
+    def _name_at(self, pos: int) -> Optional[str]:
+        value = self._data[pos]
+        if value == _NONE:
+            return None
+        return self._local[pos] if value == _LOCAL else _names[value]
+
+    def components(self) -> list[tuple[Optional[str], Optional[int]]]:
+        """(name, price) per component slot, in COMPONENT_CONFIG order."""
+        data = self._data
+        return [
+            (self._name_at(i), None if data[i + 1] == _NONE else data[i + 1])
+            for i in range(0, len(data), 2)
+        ]
+
+    def component_name_ids(self) -> Iterator[int]:
+        """Interned ids of the set component names (cheap keys for indexes; names not interned are skipped)."""
+        data = self._data
+        return (data[i] for i in range(0, len(data), 2) if data[i] not in (_NONE, _LOCAL))
+
+    # ── dict-compatible access ────────────────────────────────────────────────
+
+    def __getitem__(self, key: str) -> Any:
+        pos = _FIELDS.get(key)
+        if pos is not None:
+            if pos % 2 == 0:
+                return self._name_at(pos)
+            value = self._data[pos]
+            return None if value == _NONE else value
+        if key in _BASE_KEYS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        pos = _FIELDS.get(key)
+        if pos is None:
+            if key in _BASE_KEYS:
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+            return
+
+        old = self._data[pos]
+        if pos % 2:  # price
+            new = _NONE if value is None else int(value)
+            if old != _NONE:
+                self._sum -= old
+            if new != _NONE:
+                self._sum += new
+        else:        # name
+            self._filled += bool(value) - bool(self._name_at(pos))
+            if old == _LOCAL:
+                del self._local[pos]
+            new = _NONE if value is None else _intern(value)
+            if new is None:
+                new = _LOCAL
+                if self._local is None:
+                    self._local = {}
+                self._local[pos] = value
+        self._data[pos] = new
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in _FIELDS or key in _BASE_KEYS or bool(self.extra and key in self.extra)
+
+    def keys(self) -> list[str]:
+        return list(_DICT_KEYS) + list(self.extra or ())
+
+    def __repr__(self) -> str:
+        return f"BuildRecord(id={self.id!r}, name={self.name!r}, filled={self._filled})"
+
+    # ── Conversion to / from the stored JSON shape ────────────────────────────
+
+    def to_dict(self) -> dict:
+        d = {key: self[key] for key in _DICT_KEYS}
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    @classmethod
+    def from_components(cls, computer_id: int, name: str, created_at: Any, total_price: Optional[int],
+                        components: list[tuple[Optional[str], Optional[int]]],
+                        extra: Optional[dict] = None) -> "BuildRecord":
+        """Build a record from (name, price) pairs in COMPONENT_CONFIG order, bypassing __setitem__."""
+        record = cls.__new__(cls)
+        record.id          = computer_id
+        record.name        = name
+        record.created_at  = created_at
+        record.total_price = total_price
+        record.extra       = extra or None
+
+        data   = array("q")
+        local  = None
+        total  = 0
+        filled = 0
+        for comp_name, price in components:
+            name_id = _NONE if comp_name is None else _intern(comp_name)
+            if name_id is None:
+                name_id = _LOCAL
+                local = local or {}
+                local[len(data)] = comp_name
+            data.append(name_id)
+            data.append(_NONE if price is None else price)
+            if comp_name:
+                filled += 1
+            if price is not None:
+                total += price
+        record._data   = data
+        record._local  = local
+        record._sum    = total
+        record._filled = filled
+        return record
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BuildRecord":
+        created_at = d.get("created_at")
+        if isinstance(created_at, str):
+            try:
+                created_at = datetime.fromisoformat(created_at)
+            except ValueError:
+                pass
+        record = cls(d.get("id"), d.get("name"))
+        record.created_at = created_at
+        for key, value in d.items():
+            if key not in ("id", "name", "created_at"):
+                record[key] = value
+        return record
@@ -0,0 +1,265 @@
+"""
+outbound.py  —  rate-limited dispatch of outgoing Telegram API calls.
+
+Handlers send through the module-level `outbound` instead of calling
+bot.send_message / bot.edit_message_text directly:
+
+  • a token bucket per chat plus one global bucket keep us under Telegram's
+    flood limits instead of discovering them through 429s;
+  • a 429 answer is retried after the `retry_after` the API asks for;
+  • edits are queued per (chat_id, message_id) and coalesced — if a newer
+    edit of the same message arrives before the old one was sent, only the
+    newest text goes out; a heap keyed by when each chat can next be served
+    picks the edit to send, and TG_EDIT_WORKERS threads send them, so one
+    slow round trip does not hold up the other chats. An edit answered with
+    429 goes back on the heap for after its retry_after instead of keeping
+    a worker asleep.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from tracing import span
+
+from config import (
+    bot,
+    logger,
+    TG_GLOBAL_RATE,
+    TG_CHAT_RATE,
+    TG_CHAT_BURST,
+    TG_MAX_RETRIES,
+    TG_EDIT_WORKERS,
+)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Token bucket
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TokenBucket:
+    """Classic token bucket. reserve() takes one token and says how long to wait for it."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate     = rate
+        self.capacity = capacity
+        self._tokens  = capacity
+        self._stamp   = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp  = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available, without taking it."""
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def idle(self) -> bool:
+        """True when the bucket has refilled completely (safe to forget)."""
+        return self._tokens + (time.monotonic() - self._stamp) * self.rate >= self.capacity
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Dispatcher
+# ══════════════════════════════════════════════════════════════════════════════
+
+class Outbound:
+    def __init__(
+        self,
+        telebot_instance,
+        global_rate: float = TG_GLOBAL_RATE,
+        chat_rate:   float = TG_CHAT_RATE,
+        chat_burst:  float = TG_CHAT_BURST,
+        max_retries: int   = TG_MAX_RETRIES,
+        edit_workers: int  = TG_EDIT_WORKERS,
+    ):
+        self.bot         = telebot_instance
+        self.chat_rate   = chat_rate
+        self.chat_burst  = chat_burst
+        self.max_retries = max_retries
+        self.edit_workers = max(1, edit_workers)
+
+        self._lock   = threading.Lock()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+
+        # (chat_id, message_id) → kwargs of the newest edit not yet sent, and
+        # one (ready at, seq, key) heap entry per pending key that is not
+        # being sent right now (a key in flight is re-queued when it returns,
+        # so edits of one message never overtake each other)
+        self._edits: dict[tuple[int, int], dict] = {}
+        self._ready: list[tuple[float, int, tuple[int, int]]] = []
+        self._seq = itertools.count()
+        self._edits_ready = threading.Condition(self._lock)
+        self._workers: list[threading.Thread] = []
+        self._in_flight: set[tuple[int, int]] = set()
+
+        self.coalesced = 0  # edits dropped because a newer one superseded them
+
+    # ── Rate limiting ─────────────────────────────────────────────────────────
+
+    def set_global_rate(self, rate: float) -> None:
+        """Change the bot-wide limit (a shard worker gets its share of TG_GLOBAL_RATE)."""
+        with self._lock:
+            self._global = TokenBucket(rate, max(rate, 1.0))
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        """Per-chat bucket; caller holds self._lock."""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10_000:
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.idle()}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _acquire(self, chat_id: int) -> None:
+        with self._lock:
+            wait = max(self._bucket(chat_id).reserve(), self._global.reserve())
+        if wait > 0:
+            with span("outbound.rate_limit_wait", chat_id=chat_id):
+                time.sleep(wait)
+
+    def call(self, chat_id: int, method, /, *args, **kwargs):
+        """Run one bot API method for chat_id under the rate limits, honouring 429 retry_after."""
+        for attempt in range(1, self.max_retries + 1):
+            self._acquire(chat_id)
+            try:
+                return method(*args, **kwargs)
+            except ApiTelegramException as e:
+                if e.error_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = _retry_after(e)
+                logger.warning("⏳ Flood limit on chat %s, retrying in %ss", chat_id, retry_after)
+                time.sleep(retry_after)
+
+    # ── Public API (mirrors telebot) ──────────────────────────────────────────
+
+    def send_message(self, chat_id: int, text: str, **kwargs):
+        return self.call(chat_id, self.bot.send_message, chat_id, text, **kwargs)
+
+    def edit_message_text(self, text: str, chat_id: int, message_id: int, final: bool = False, **kwargs) -> None:
+        """
+        Queue an edit; a later edit of the same message replaces this one if
+        still pending. A final edit (the last one of a streamed reply) that
+        Telegram rejects is retried once without parse_mode, so the message
+        never stays half-done.
+        """
+        key = (chat_id, message_id)
+        with self._edits_ready:
+            if key in self._edits:
+                self.coalesced += 1
+            elif key not in self._in_flight:
+                self._queue(key)
+            self._edits[key] = dict(kwargs, text=text, chat_id=chat_id, message_id=message_id, final=final)
+            self._edits_ready.notify()
+            if not self._workers:
+                self._workers = [
+                    threading.Thread(target=self._edit_loop, name=f"outbound-edits-{i}", daemon=True)
+                    for i in range(self.edit_workers)
+                ]
+                for worker in self._workers:
+                    worker.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every queued edit has been sent (used at shutdown and in benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._edits and not self._in_flight:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def _queue(self, key: tuple[int, int], delay: float = 0.0) -> None:
+        """Put key on the heap for when its chat can be served; caller holds self._lock."""
+        ready = time.monotonic() + max(delay, self._bucket(key[0]).wait_time())
+        heapq.heappush(self._ready, (ready, next(self._seq), key))
+
+    def _next_edit(self) -> dict:
+        """
+        Pop the pending edit whose chat can be served soonest, so one throttled
+        chat never holds up edits for everybody else. Caller holds self._lock.
+        """
+        while True:
+            while not self._ready:
+                self._edits_ready.wait()
+            ready, _, key = self._ready[0]
+            now = time.monotonic()
+            if ready > now:
+                self._edits_ready.wait(timeout=ready - now)
+                continue
+            chat_wait = self._bucket(key[0]).wait_time()
+            if chat_wait > 0:  # the chat spent tokens since the key was queued
+                heapq.heapreplace(self._ready, (now + chat_wait, next(self._seq), key))
+                continue
+            wait = self._global.wait_time()
+            if wait <= 0:
+                heapq.heappop(self._ready)
+                self._in_flight.add(key)
+                return self._edits.pop(key)
+            self._edits_ready.wait(timeout=wait)
+
+    def _edit_loop(self) -> None:
+        while True:
+            with self._edits_ready:
+                kwargs = self._next_edit()
+            key, retry_after = (kwargs["chat_id"], kwargs["message_id"]), 0.0
+            try:
+                retry_after = self._send_edit(kwargs)
+            except Exception as e:
+                logger.error("❌ Edit of message %d failed: %s", kwargs["message_id"], e)
+            finally:
+                with self._edits_ready:
+                    self._in_flight.discard(key)
+                    if retry_after and key not in self._edits:  # a newer edit would supersede it
+                        self._edits[key] = kwargs
+                    if key in self._edits:
+                        self._queue(key, retry_after)
+                        self._edits_ready.notify()
+
+    def _send_edit(self, kwargs: dict) -> float:
+        """
+        Send one edit. On a 429 returns the retry_after to re-queue it with
+        (kwargs then carry the attempt count); 0 when done or given up.
+        """
+        attempt = kwargs.pop("attempt", 1)
+        final   = kwargs.pop("final")
+        try:
+            self._acquire(kwargs["chat_id"])
+            self.bot.edit_message_text(**kwargs)
+            return 0.0
+        except ApiTelegramException as e:
+            if e.error_code == 429 and attempt < self.max_retries:
+                logger.warning("⏳ Flood limit on chat %s, edit re-queued for %ss", kwargs["chat_id"], _retry_after(e))
+                kwargs.update(attempt=attempt + 1, final=final)
+                return float(_retry_after(e))
+            if "message is not modified" in str(e):
+                return 0.0
+            if final and kwargs.get("parse_mode"):
+                logger.warning("⚠️ Final edit of message %d rejected (%s), resending as plain text",
+                               kwargs["message_id"], e)
+                kwargs.pop("parse_mode")
+                try:
+                    self.call(kwargs["chat_id"], self.bot.edit_message_text, **kwargs)
+                    return 0.0
+                except ApiTelegramException as e2:
+                    e = e2
+            logger.warning("⚠️ Edit of message %d failed: %s", kwargs["message_id"], e)
+            return 0.0
+
+
+def _retry_after(e: ApiTelegramException) -> float:
+    return (e.result_json.get("parameters") or {}).get("retry_after", 1)
+
+
+outbound = Outbound(bot)
@@ -1,25 +1,69 @@
 """
-parsing.py  —  Amazon price updater.
+parsing.py  —  catalog price updater.
 
 Run standalone:  python parsing.py
+
+Every component with a product URL goes through four stages, connected by
+bounded queues so downloads, HTML parsing and database writes overlap:
+
+  fetch      FETCHERS threads download pages. DomainScheduler hands out
+             items so that no store sees more than PER_DOMAIN requests at
+             once or two requests less than SLEEP_RANGE apart, while other
+             stores are fetched in the meantime;
+  extract    pages identical to the archived copy (archive.py) reuse the
+             amount extracted last time; others are compressed for the
+             archive and the store's extractor (extractors.py) finds
+             amount + currency;
+  normalize  converts to whole USD with the run's exchange rates (currency.py);
+  write      the calling thread records prices and archives pages,
+             WRITE_BATCH items per transaction, and queues price-drop
+             alerts. An unchanged page whose price is still the catalog
+             price is not written at all.
+
+Runs are checkpointed per component in the catalog database (db.open_update_run):
+a killed run resumes with the components it had not finished, every
+component is fetched once per run, and downloads that fail are retried up
+to MAX_RETRIES times with exponential backoff — across restarts too.
+
+  python parsing.py --status      progress of the current (or last) run
+  python parsing.py --reextract   re-runs the extractors over the archived
+                                  pages on every CPU, without the network.
 """
 
-import re
-import time
+import argparse
+import heapq
+import itertools
+import queue
 import random
-import sqlite3
+import signal
+import sys
+import threading
+import time
 import logging
-from typing import Optional
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
 
 import requests
-from bs4 import BeautifulSoup
 
-from config import PLN_TO_USD_RATE
+from db import (
+    init_database,
+    components_with_urls,
+    record_prices,
+    downsample_price_history,
+    write_catalog_snapshot,
+    open_update_run,
+    finish_update_run,
+    update_run_status,
+)
+from alerts import notify_price_drops
+from archive import PageArchive, compress, content_hash, decompress
+from config import PAGE_ARCHIVE_PATH
+from currency import RateTable, load_rates
+from extractors import Price, domain_of, extractor_for, page_title
 
 logger = logging.getLogger("parser")
 
-DB_PATH = "computers.db"
-
 HEADERS = {
     "User-Agent":                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                                  "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -37,88 +81,429 @@ HEADERS = {
 }
 
 # Retry settings
-MAX_RETRIES  = 3
-RETRY_DELAY  = 5   # seconds between retries
-SLEEP_RANGE  = (10, 15)  # seconds between items
+MAX_RETRIES  = 5
+RETRY_DELAY  = 30  # seconds before the first retry of a failed download; doubles per attempt
+SLEEP_RANGE  = (10, 15)  # seconds between two requests to the same store
+
+# Pipeline sizing
+FETCHERS     = 8   # concurrent downloads over all stores
+PER_DOMAIN   = 1   # concurrent downloads per store
+EXTRACTORS   = 2   # HTML parsing threads
+QUEUE_SIZE   = 32  # items buffered between two stages
+
+# Prices and run checkpoints are written in batches: one transaction per
+# WRITE_BATCH finished items, or CHECKPOINT_EVERY seconds if that comes first
+WRITE_BATCH      = 20
+CHECKPOINT_EVERY = 5
+PROGRESS_EVERY   = 60  # seconds between progress lines
+
+_DONE = object()  # end-of-stream marker between stages
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Fetch
+# ══════════════════════════════════════════════════════════════════════════════
+
+class DomainScheduler:
+    """
+    Work list of the fetch stage. take() returns the next item whose store has
+    a free slot and whose politeness delay has passed, waiting if none has;
+    None once every item is finished. Items with a "not_before" time (a
+    retry backing off) wait aside until then without holding up their store.
+    """
 
+    def __init__(self, items: list[dict], per_domain: Optional[int] = None,
+                 delay: Optional[tuple[float, float]] = None):
+        self.per_domain = per_domain or PER_DOMAIN
+        self.delay      = delay or SLEEP_RANGE
+        self._pending: dict[str, deque] = {}
+        self._waiting: list[tuple[float, int, dict]] = []  # heap of (not_before, seq, item)
+        self._seq = itertools.count()
+        for item in items:
+            self._add(item)
+        self._active:  Counter = Counter()
+        self._next_at: dict[str, float] = {}
+        self._left = len(items)
+        self._cond = threading.Condition()
 
-def get_amazon_price(url: str, retries: int = MAX_RETRIES) -> Optional[int]:
+    def _add(self, item: dict) -> None:
+        if item.get("not_before", 0.0) > time.monotonic():
+            heapq.heappush(self._waiting, (item["not_before"], next(self._seq), item))
+        else:
+            self._pending.setdefault(item["domain"], deque()).append(item)
+
+    def take(self) -> Optional[dict]:
+        with self._cond:
+            while self._left:
+                now = time.monotonic()
+                while self._waiting and self._waiting[0][0] <= now:
+                    item = heapq.heappop(self._waiting)[2]
+                    self._pending.setdefault(item["domain"], deque()).append(item)
+                wake = self._waiting[0][0] if self._waiting else None
+                for domain, items in self._pending.items():
+                    if not items or self._active[domain] >= self.per_domain:
+                        continue
+                    at = self._next_at.get(domain, 0.0)
+                    if at <= now:
+                        self._active[domain] += 1
+                        self._next_at[domain] = now + random.uniform(*self.delay)
+                        return items.popleft()
+                    wake = at if wake is None else min(wake, at)
+                self._cond.wait(None if wake is None else wake - now)
+            return None
+
+    def done(self, item: dict, retry: bool = False) -> None:
+        """Release the item's store slot; retry puts it back (after item["not_before"])."""
+        with self._cond:
+            self._active[item["domain"]] -= 1
+            if retry:
+                self._add(item)
+            else:
+                self._left -= 1
+            self._cond.notify_all()
+
+
+def fetch(session: requests.Session, item: dict) -> None:
+    """Download item["url"] into item["html"]; sets item["error"] instead on failure."""
+    item["attempt"] = item.get("attempt", 0) + 1
+    try:
+        response = session.get(item["url"], headers=HEADERS, timeout=15)
+        if response.status_code == 200:
+            item["html"] = response.text
+            item.pop("error", None)
+        else:
+            item["error"] = f"HTTP {response.status_code}"
+    except requests.RequestException as e:
+        item["error"] = f"network error: {e}"
+
+
+def backoff(attempt: int) -> float:
+    """Seconds to wait before retrying after the attempt-th failed download."""
+    return RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def _fetch_loop(scheduler: DomainScheduler, outbox: queue.Queue) -> None:
+    session = requests.Session()
+    while (item := scheduler.take()) is not None:
+        fetch(session, item)
+        if "error" in item and item["attempt"] < MAX_RETRIES:
+            delay = backoff(item["attempt"])
+            logger.warning("  %s: %s (attempt %d/%d, retry in %ds)",
+                           item["name"], item["error"], item["attempt"], MAX_RETRIES, delay)
+            item["not_before"] = time.monotonic() + delay
+            # Tell the write stage, so the attempt and its backoff survive a restart.
+            outbox.put({"retry": True, "id": item["id"], "attempt": item["attempt"],
+                        "next_attempt": int(time.time() + delay), "error": item["error"]})
+            scheduler.done(item, retry=True)
+            continue
+        scheduler.done(item)
+        outbox.put(item)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Extract / normalize
+# ══════════════════════════════════════════════════════════════════════════════
+
+def extract(item: dict) -> dict:
     """
-    Fetch a product price from Amazon.
-    Returns price in USD (converts PLN if the URL is amazon.pl).
-    Returns None on failure.
+    item["html"] → item["amount"], item["currency"] (or item["error"]).
+
+    With the archive on (item has "archived": (hash, amount, currency) or
+    None), also sets item["hash"] and either item["unchanged"] or the
+    compressed item["body"] to archive.
     """
-    for attempt in range(1, retries + 1):
-        try:
-            response = requests.get(url, headers=HEADERS, timeout=15)
+    html = item.pop("html", None)
+    if html is None:
+        return item
+    if "archived" in item:
+        item["hash"] = content_hash(html)
+        archived = item["archived"]
+        if archived and archived[0] == item["hash"] and archived[1] is not None:
+            item["unchanged"] = True
+            item["amount"], item["currency"] = archived[1], archived[2]
+            return item
+        item["body"] = compress(html)
+    found = extractor_for(item["url"])(html, item["url"])
+    if found is None:
+        item["error"] = f"price element not found (page title: '{page_title(html)}')"
+    else:
+        item["amount"], item["currency"] = found
+    return item
+
 
-            if response.status_code != 200:
-                logger.warning("  HTTP %d (attempt %d/%d)", response.status_code, attempt, retries)
-                time.sleep(RETRY_DELAY)
-                continue
+def normalize(rates: RateTable, item: dict) -> dict:
+    """item["amount"] in item["currency"] → item["new_price"] in whole USD."""
+    if "amount" in item:
+        item["new_price"] = rates.to_usd(item["amount"], item["currency"])
+        if item["new_price"] is None:
+            item["error"] = f"no exchange rate for {item['currency']}"
+    return item
 
-            soup  = BeautifulSoup(response.text, "html.parser")
-            price_el = soup.select_one(".a-price-whole")
 
-            if not price_el:
-                title = soup.title.text.strip() if soup.title else "No title"
-                logger.warning("  ⚠️ Price element not found. Page title: '%s'", title)
-                return None
+class _Stage:
+    """`workers` threads applying fn to items from inbox and passing the results to outbox."""
 
-            raw_price = re.sub(r"\D", "", price_el.get_text())
-            price     = int(raw_price)
+    def __init__(self, name: str, fn: Callable[[dict], dict], workers: int, outbox: queue.Queue):
+        self.inbox   = queue.Queue(maxsize=QUEUE_SIZE)
+        self.outbox  = outbox
+        self.fn      = fn
+        self.threads = [threading.Thread(target=self._loop, name=f"{name}-{i}", daemon=True) for i in range(workers)]
 
-            # Convert PLN → USD if needed
-            if "amazon.pl" in url:
-                price = round(price / PLN_TO_USD_RATE)
+    def start(self) -> "_Stage":
+        for thread in self.threads:
+            thread.start()
+        return self
 
-            return price
+    def _loop(self) -> None:
+        while (item := self.inbox.get()) is not _DONE:
+            try:
+                self.outbox.put(self.fn(item))
+            except Exception as e:  # one odd page must not stop the run
+                item["error"] = f"{type(e).__name__}: {e}"
+                self.outbox.put(item)
 
-        except requests.RequestException as e:
-            logger.warning("  Network error (attempt %d/%d): %s", attempt, retries, e)
-            time.sleep(RETRY_DELAY)
+    def close(self) -> None:
+        """Let the workers drain the inbox, then wait for them."""
+        for _ in self.threads:
+            self.inbox.put(_DONE)
+        for thread in self.threads:
+            thread.join()
 
-    logger.error("  ❌ Failed after %d attempts: %s", retries, url)
-    return None
 
+def _pipeline(items: list[dict], rates: RateTable) -> queue.Queue:
+    """Start fetch → extract → normalize; returns the queue the write stage reads (ends with _DONE)."""
+    results    = queue.Queue(maxsize=QUEUE_SIZE)
+    normalizer = _Stage("normalize", lambda item: normalize(rates, item), 1, results).start()
+    extracting = _Stage("extract", extract, EXTRACTORS, normalizer.inbox).start()
+    scheduler  = DomainScheduler(items)
+    fetchers   = [threading.Thread(target=_fetch_loop, args=(scheduler, extracting.inbox), name=f"fetch-{i}",
+                                   daemon=True) for i in range(min(FETCHERS, len(items)))]
+    for thread in fetchers:
+        thread.start()
+
+    def close() -> None:
+        for thread in fetchers:
+            thread.join()
+        extracting.close()
+        normalizer.close()
+        results.put(_DONE)
+
+    threading.Thread(target=close, name="pipeline-close", daemon=True).start()
+    return results
+
+
+def get_price(url: str) -> Optional[int]:
+    """One product page's price in USD, through the same stages (None on failure)."""
+    item = {"url": url, "domain": domain_of(url), "name": url}
+    session = requests.Session()
+    while True:
+        fetch(session, item)
+        if "error" not in item or item["attempt"] >= MAX_RETRIES:
+            break
+        time.sleep(backoff(item["attempt"]))
+    item = normalize(load_rates(), extract(item))
+    return item.get("new_price") if "error" not in item else None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Write
+# ══════════════════════════════════════════════════════════════════════════════
 
 def update_prices() -> None:
     logger.info("🚀 Starting price update…")
 
-    with sqlite3.connect(DB_PATH) as conn:
-        rows = conn.execute(
-            "SELECT component_name, average_price_dollar, component_url "
-            "FROM components_price "
-            "WHERE component_url IS NOT NULL AND component_url != ''",
-        ).fetchall()
-
-    updated = 0
-    failed  = 0
-
-    for name, old_price, url in rows:
-        logger.info("Checking: %s", name)
-        new_price = get_amazon_price(url)
-
-        if new_price is None:
-            logger.warning("  ⚠️ Could not fetch price for %s", name)
-            failed += 1
-        elif new_price == old_price:
-            logger.info("  Price unchanged ($%d)", old_price)
-        else:
-            logger.info("  💰 New price: $%d → $%d", old_price, new_price)
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute(
-                    "UPDATE components_price SET average_price_dollar = ? WHERE component_name = ?",
-                    (new_price, name),
-                )
-                conn.commit()
-            updated += 1
+    archive = PageArchive() if PAGE_ARCHIVE_PATH else None
+    known   = archive.known() if archive else {}
+    rows    = components_with_urls()
+    run_id, resumed, states = open_update_run(component_id for component_id, *_ in rows)
+
+    items = []
+    now, mono = time.time(), time.monotonic()
+    for component_id, name, price, url in rows:
+        state, attempts, next_attempt = states[component_id]
+        if state != "pending":
+            continue
+        item = {"id": component_id, "name": name, "price": price, "url": url, "domain": domain_of(url),
+                "attempt": attempts, "not_before": mono + max(0.0, next_attempt - now)}
+        if archive:
+            item["archived"] = known.get(url)
+        items.append(item)
+    finished_before = len(rows) - len(items)
+    logger.info("%s run %d: %d components left on %d stores (%d already finished)",
+                "Resuming" if resumed else "Starting", run_id, len(items),
+                len({item["domain"] for item in items}), finished_before)
+
+    updated   = 0
+    failed    = 0
+    unchanged = 0
+    finished  = 0
+    names     = {component_id: name for component_id, name, _, _ in rows}
+
+    observed:   list[tuple[int, int]] = []  # every fetched price → price_history
+    changed:    list[tuple[int, int]] = []  # only the ones that differ → components_price
+    pages:      list[tuple] = []            # downloaded pages → archive
+    checkpoint: list[tuple] = []            # item states → update_items
+
+    started = last_flush = last_progress = time.monotonic()
+
+    def flush() -> None:
+        nonlocal last_flush
+        if pages:  # before the checkpoint: a finished item's page is always archived
+            archive.store(pages)
+            pages.clear()
+        if observed or checkpoint:
+            record_prices(observed, changed, checkpoint=checkpoint)
+            if changed:
+                notify_price_drops(changed, names)
+            observed.clear()
+            changed.clear()
+            checkpoint.clear()
+        last_flush = time.monotonic()
+
+    def progress() -> None:
+        elapsed = time.monotonic() - started
+        rate    = finished / elapsed if elapsed else 0.0
+        left    = len(items) - finished
+        eta     = f"{left / rate / 60:.0f} min" if rate else "?"
+        logger.info("📈 %d/%d finished (%.1f%%) | failed %d | %.1f/min | ETA %s",
+                    finished_before + finished, len(rows),
+                    100 * (finished_before + finished) / max(len(rows), 1), failed, rate * 60, eta)
+
+    results = _pipeline(items, load_rates())
+    try:
+        while (item := results.get()) is not _DONE:
+            if item.get("retry"):
+                checkpoint.append(("pending", item["attempt"], item["next_attempt"], item["error"], run_id, item["id"]))
+            else:
+                finished += 1
+                _write(item, run_id, observed, changed, pages, checkpoint)
+                if "error" in item:
+                    failed += 1
+                elif item.get("unchanged") and item["new_price"] == item["price"]:
+                    unchanged += 1
+                elif item["new_price"] != item["price"]:
+                    updated += 1
+
+            now = time.monotonic()
+            if len(checkpoint) >= WRITE_BATCH or now - last_flush >= CHECKPOINT_EVERY:
+                flush()
+            if now - last_progress >= PROGRESS_EVERY:
+                progress()
+                last_progress = now
+    finally:
+        flush()  # also on Ctrl+C / SIGTERM: what was finished stays finished
+    if archive:
+        archive.prune()
+    finish_update_run(run_id)
+    downsample_price_history()
+    write_catalog_snapshot()
+    logger.info("🏁 Run %d done. Updated: %d | Unchanged pages: %d | Failed: %d | Total: %d",
+                run_id, updated, unchanged, failed, len(rows))
 
-        time.sleep(random.randint(*SLEEP_RANGE))
 
-    logger.info("🏁 Done. Updated: %d | Failed: %d | Total: %d", updated, failed, len(rows))
+def _write(item: dict, run_id: int, observed: list, changed: list, pages: list, checkpoint: list) -> None:
+    """Queue what one finished item writes: its final state, page, price sample and price change."""
+    name, old_price = item["name"], item["price"]
+    state = "failed" if "error" in item else "done"
+    checkpoint.append((state, item.get("attempt", 0), 0, item.get("error"), run_id, item["id"]))
+
+    if item.get("unchanged") and item.get("new_price") == old_price:
+        return  # same page, same price: nothing else to write
+    if "hash" in item:  # archived even when extraction failed, for --reextract
+        pages.append((item["url"], item["hash"], int(time.time()),
+                      item.get("amount"), item.get("currency"), item.get("body")))
+    if "error" in item:
+        logger.warning("  ⚠️ Could not fetch price for %s: %s", name, item["error"])
+        return
+
+    new_price = item["new_price"]
+    observed.append((item["id"], new_price))
+    if new_price == old_price:
+        logger.info("  %s: price unchanged ($%d)", name, old_price)
+    else:
+        logger.info("  💰 %s: $%s → $%d", name, old_price, new_price)
+        changed.append((item["id"], new_price))
+
+
+def print_status() -> None:
+    run = update_run_status()
+    if run is None:
+        print("No price update has run yet.")
+        return
+    total = run["pending"] + run["done"] + run["failed"]
+    state = (f"finished {time.strftime('%Y-%m-%d %H:%M', time.localtime(run['finished_at']))}"
+             if run["finished_at"] else "in progress")
+    print(f"Run {run['id']} (started {time.strftime('%Y-%m-%d %H:%M', time.localtime(run['started_at']))}, {state}): "
+          f"{run['done']} done, {run['failed']} failed, {run['pending']} pending of {total}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Offline re-extraction
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _reextract_page(page: tuple[str, int, bytes]) -> tuple[str, int, Optional[Price]]:
+    url, fetched_at, body = page
+    try:
+        return url, fetched_at, extractor_for(url)(decompress(body), url)
+    except Exception as e:
+        logger.warning("  ⚠️ %s: %s: %s", url, type(e).__name__, e)
+        return url, fetched_at, None
+
+
+def reextract_prices(workers: Optional[int] = None, chunk: int = 256) -> None:
+    """
+    Run the current extractors over every archived page in a process pool and
+    write the prices that differ from the catalog, as samples at the time the
+    page was fetched. Uses stored exchange rates only; nothing is downloaded.
+    """
+    logger.info("♻️ Re-extracting prices from the page archive…")
+    archive    = PageArchive()
+    rates      = load_rates(max_age=float("inf"))
+    components = {url: (component_id, name, price) for component_id, name, price, url in components_with_urls()}
+
+    extracted: list[tuple] = []
+    observed:  list[tuple[int, int, int]] = []
+    changed:   list[tuple[int, int]] = []
+    failed = 0
+    pages  = archive.pages()
+    with ProcessPoolExecutor(workers) as pool:
+        # A slice at a time: map() would otherwise submit (and hold) every page at once.
+        while batch := list(itertools.islice(pages, chunk)):
+            for url, fetched_at, found in pool.map(_reextract_page, batch, chunksize=16):
+                amount, currency = found or (None, None)
+                extracted.append((amount, currency, url))
+                if found is None:
+                    failed += 1
+                    continue
+                component = components.get(url)
+                new_price = rates.to_usd(amount, currency)
+                if component is None or new_price is None or new_price == component[2]:
+                    continue
+                logger.info("  💰 %s: $%s → $%d", component[1], component[2], new_price)
+                observed.append((component[0], new_price, fetched_at))
+                changed.append((component[0], new_price))
+
+    archive.set_extracted(extracted)
+    if observed:
+        record_prices(observed, changed)
+        write_catalog_snapshot()
+    logger.info("🏁 Re-extracted %d pages. Updated: %d | No price: %d", len(extracted), len(changed), failed)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update catalog prices from the stores' product pages.")
+    parser.add_argument("--reextract", action="store_true",
+                        help="re-run the extractors over the page archive instead of downloading")
+    parser.add_argument("--workers", type=int, help="processes for --reextract (default: one per CPU)")
+    parser.add_argument("--status", action="store_true", help="show the progress of the current or last run")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
-    update_prices()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))  # unwind, so the last checkpoint is written
+    init_database()
+    if args.status:
+        print_status()
+    elif args.reextract:
+        reextract_prices(args.workers)
+    else:
+        update_prices()
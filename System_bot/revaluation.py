@@ -0,0 +1,156 @@
+"""
+revaluation.py  —  keep saved builds priced at current catalog prices.
+
+Builds store the price captured when a component was selected. parsing.py
+runs in its own process and only writes components_price / price_history,
+so the bot process (which owns the user cache) polls price_history for new
+samples and rewrites the builds that hold a different price:
+
+  • build_components (component → user, computer, stored price) names the
+    stale builds directly — computers_data is only decoded for those users;
+  • affected users are rewritten REVALUE_BATCH at a time, one transaction each;
+  • users already in the cache are updated in place, so their next auto_save
+    does not write the old prices back. Each is repriced under its lock
+    (db.user_lock, also taken by every handler), held for that user only;
+  • users not in the cache are read and repriced without a lock, and only
+    the batch save takes their locks. One a handler loaded into the cache
+    meanwhile is repriced there instead, so its change is never overwritten.
+    The locks of a batch are held together only for its save transaction;
+  • the rewrites leave users.last_update alone: a repricing is not user
+    activity (export --since and the warm-up order go by it);
+  • shard workers sharing one database (SHARD_DB_TEMPLATE="") each revalue
+    only the users they own, with their own watermark — another worker's
+    copy of a cached user would otherwise write the old prices back.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from config import logger, REVALUE_INTERVAL, REVALUE_BATCH
+from db import (
+    cached_user_data,
+    load_user_from_db,
+    save_users_to_db,
+    user_lock,
+    user_locks,
+    refresh_catalog_prices,
+    get_component,
+    stale_builds,
+    price_samples_since,
+    price_history_watermark,
+    rebuild_build_index,
+    get_meta,
+    set_meta,
+)
+from sharding import shard_of
+from utils import COMPONENT_CONFIG, count_total_price
+
+_WATERMARK_KEY = "revaluation_rowid"
+_INDEX_KEY     = "build_index_version"
+_INDEX_VERSION = 1
+
+
+def _revalue_user(user_data: dict, computer_ids: set[int], names: dict[str, int]) -> bool:
+    """Apply the new prices to the given builds of one user. True if anything changed."""
+    changed = False
+    for computer in user_data["computers"]:
+        if computer["id"] not in computer_ids:
+            continue
+        repriced = False
+        for cfg in COMPONENT_CONFIG.values():
+            price = names.get(computer.get(cfg["key"]))
+            if price is not None and computer.get(cfg["price_key"]) != price:
+                computer[cfg["price_key"]] = price
+                repriced = True
+        if repriced:
+            count_total_price(computer)
+            changed = True
+    return changed
+
+
+def revalue(prices: dict[int, int], batch: int = REVALUE_BATCH, shard: Optional[tuple[int, int]] = None) -> int:
+    """
+    Reprice every saved build holding a component of {component_id: price}
+    (only of the users of shard (index, shards), if given). Returns users rewritten.
+    """
+    refresh_catalog_prices(prices)
+    stale = stale_builds(prices)
+    if shard is not None:
+        stale = {user_id: ids for user_id, ids in stale.items() if shard_of(user_id, shard[1]) == shard[0]}
+    if not stale:
+        return 0
+
+    names = {}
+    for component_id, price in prices.items():
+        component = get_component(component_id)
+        if component:
+            names[component["name"]] = price
+
+    rewritten = 0
+    user_ids  = list(stale)
+    for start in range(0, len(user_ids), batch):
+        pending, loaded = {}, {}
+        for user_id in user_ids[start:start + batch]:
+            with user_lock(user_id):
+                user_data = cached_user_data(user_id)
+                if user_data is not None:
+                    if _revalue_user(user_data, stale[user_id], names):
+                        pending[user_id] = user_data
+                    continue
+            user_data = load_user_from_db(user_id)
+            if user_data and _revalue_user(user_data, stale[user_id], names):
+                loaded[user_id] = user_data
+
+        # Locks again for the save only (no handler edit is encoded half-done)
+        with user_locks([*pending, *loaded]):
+            for user_id, user_data in loaded.items():
+                cached = cached_user_data(user_id)
+                if cached is None:
+                    pending[user_id] = user_data
+                elif _revalue_user(cached, stale[user_id], names):
+                    pending[user_id] = cached
+            if pending and save_users_to_db(pending, touch=False):
+                rewritten += len(pending)
+        time.sleep(0)  # let handler threads in between batches
+
+    logger.info("💱 Revalued builds of %d users (%d components changed)", rewritten, len(prices))
+    return rewritten
+
+
+def run_once(shard: Optional[tuple[int, int]] = None) -> int:
+    """
+    Process price samples written since the last run; returns users rewritten.
+    shard=(index, shards): one of several workers sharing this database.
+    """
+    if get_meta(_INDEX_KEY) != _INDEX_VERSION and (shard is None or shard[0] == 0):
+        rebuild_build_index()
+        set_meta(_INDEX_KEY, _INDEX_VERSION)
+
+    key = _WATERMARK_KEY if shard is None else f"{_WATERMARK_KEY}.{shard[0]}"
+    watermark = get_meta(key)
+    if watermark is None:  # first start: only react to prices scraped from now on
+        set_meta(key, price_history_watermark())
+        return 0
+
+    prices, new_watermark = price_samples_since(watermark)
+    rewritten = revalue(prices, shard=shard) if prices else 0
+    if new_watermark != watermark:
+        set_meta(key, new_watermark)
+    return rewritten
+
+
+def _loop(interval: float, shard: Optional[tuple[int, int]]) -> None:
+    while True:
+        try:
+            run_once(shard)
+        except Exception as e:
+            logger.error("❌ Revaluation failed: %s", e)
+        time.sleep(interval)
+
+
+def start(interval: float = REVALUE_INTERVAL, shard: Optional[tuple[int, int]] = None) -> None:
+    """Run revaluation in a daemon thread every `interval` seconds (shard: see run_once)."""
+    if interval <= 0:
+        return
+    threading.Thread(target=_loop, args=(interval, shard), name="revaluation", daemon=True).start()
@@ -0,0 +1,85 @@
+"""
+router.py  —  indexed dispatch of inline-button callbacks.
+
+telebot tries every @bot.callback_query_handler filter in order, so each
+callback pays for all the lambdas registered before its own. CallbackRouter
+is registered with telebot once and looks the handler up directly:
+
+  • exact callback_data  → dict lookup;
+  • prefixed callback_data ('tab2', 'comp_7', …) → longest-prefix match in a
+    character trie, so the cost depends on the length of the data, not on the
+    number of registered flows.
+
+Prefix handlers receive the part after the prefix as a second argument, so
+the data is parsed once here instead of again in every handler.
+"""
+
+from typing import Callable, Optional
+
+from tracing import span
+
+_HANDLER = object()  # trie key under which a node stores its handler
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._exact: dict[str, Callable] = {}
+        self._trie:  dict = {}
+
+    # ── Registration ──────────────────────────────────────────────────────────
+
+    def on(self, *values: str):
+        """Decorator: handle callbacks whose data equals one of values. Called as handler(call)."""
+        def register(handler: Callable) -> Callable:
+            for value in values:
+                if value in self._exact:
+                    raise ValueError(f"callback_data {value!r} is already routed")
+                self._exact[value] = handler
+            return handler
+        return register
+
+    def on_prefix(self, *prefixes: str):
+        """Decorator: handle callbacks starting with one of prefixes. Called as handler(call, rest)."""
+        def register(handler: Callable) -> Callable:
+            for prefix in prefixes:
+                node = self._trie
+                for ch in prefix:
+                    node = node.setdefault(ch, {})
+                if _HANDLER in node:
+                    raise ValueError(f"callback prefix {prefix!r} is already routed")
+                node[_HANDLER] = (handler, len(prefix))
+            return handler
+        return register
+
+    # ── Lookup ────────────────────────────────────────────────────────────────
+
+    def resolve(self, data: str) -> Optional[tuple[Callable, Optional[str]]]:
+        """(handler, rest) for data, where rest is None for exact routes; None if unrouted."""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler, None
+
+        found = None
+        node  = self._trie
+        for ch in data:
+            node = node.get(ch)
+            if node is None:
+                break
+            found = node.get(_HANDLER, found)
+        if found is None:
+            return None
+        handler, length = found
+        return handler, data[length:]
+
+    def dispatch(self, call) -> bool:
+        """Run the handler for call.data. Returns False if nothing is routed for it."""
+        route = self.resolve(call.data or "")
+        if route is None:
+            return False
+        handler, rest = route
+        with span(handler.__name__):
+            if rest is None:
+                handler(call)
+            else:
+                handler(call, rest)
+        return True
@@ -0,0 +1,269 @@
+"""
+serialization.py  —  encoding of users.computers_data.
+
+Two codecs share one entry point:
+
+  • "json"  — the original format: a JSON array of build dicts stored as TEXT.
+              Rows written before this module existed are always JSON.
+  • "sbin"  — compact binary layout stored as a BLOB:
+
+        header   "<2sBB"  magic b"SB", format version, codec id
+        counts   "<III"   builds, component slots, strings
+        strings  uint32 byte lengths[strings] + concatenated UTF-8
+        ints     int64 array, one fixed-width row per build:
+                 id, name, created_at, total_price, extra,
+                 then (component name, component price) per slot
+
+    Strings (component keys, build names, dates, component names) are stored once
+    per row and referenced by index. String 0 is reserved for "no value"; the
+    next `component slots` strings are the component keys of the writer's
+    COMPONENT_CONFIG, so rows stay readable after component types are added
+    or reordered.
+
+decode_computers() recognises the format itself, so existing JSON rows are
+read transparently and rewritten in the configured codec on their next save.
+"""
+
+import json
+import struct
+from array import array
+from datetime import datetime
+from typing import Any, Union
+
+from config import USER_STATE_FORMAT
+from utils import COMPONENT_CONFIG
+
+Raw = Union[str, bytes, None]
+
+_MAGIC   = b"SB"
+_VERSION = 1
+_CODEC_SBIN = 1
+
+_HEADER = struct.Struct("<2sBB")
+_COUNTS = struct.Struct("<III")
+
+_NONE  = -(2 ** 63)  # "no value" marker in the int64 rows
+_FIXED = 5           # ints per build before the component pairs
+
+
+class SerializationError(ValueError):
+    pass
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# JSON codec
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _json_encode(computers: list) -> str:
+    return json.dumps([_as_dict(c) for c in computers], default=str)
+
+
+def _json_decode(raw: Union[str, bytes], parse_dates: bool) -> list[dict]:
+    computers = json.loads(raw)
+    if parse_dates:
+        for c in computers:
+            if isinstance(c.get("created_at"), str):
+                try:
+                    c["created_at"] = datetime.fromisoformat(c["created_at"])
+                except ValueError:
+                    pass
+    return computers
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Binary codec
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _as_dict(computer) -> dict:
+    return computer.to_dict() if hasattr(computer, "to_dict") else computer
+
+
+def _int_or_none(value: Any) -> int:
+    if value is None:
+        return _NONE
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SerializationError(f"expected integer, got {type(value).__name__}")
+    if not -(2 ** 63) < value < 2 ** 63:
+        raise SerializationError(f"integer out of range: {value}")
+    return value
+
+
+def _fields(computer, keys: list[str], price_keys: list[str], known: set[str]) -> tuple:
+    """(id, name, created_at, total_price, extra, [(component, price), …]) of a dict or BuildRecord."""
+    if hasattr(computer, "components"):  # BuildRecord: read slots directly, no dict round-trip
+        return (computer.id, computer.name, computer.created_at, computer.total_price,
+                computer.extra, computer.components())
+    extra = {k: v for k, v in computer.items() if k not in known}
+    return (computer.get("id"), computer.get("name"), computer.get("created_at"), computer.get("total_price"),
+            extra, [(computer.get(k), computer.get(p)) for k, p in zip(keys, price_keys)])
+
+
+def _sbin_encode(computers: list) -> bytes:
+    keys = [cfg["key"] for cfg in COMPONENT_CONFIG.values()]
+    price_keys = [cfg["price_key"] for cfg in COMPONENT_CONFIG.values()]
+    known = {"id", "name", "created_at", "total_price", *keys, *price_keys}
+
+    strings: list[str] = ["", *keys]
+    index:   dict[str, int] = {s: i for i, s in enumerate(keys, 1)}
+
+    def ref(value: Any) -> int:
+        if value is None:
+            return 0
+        if not isinstance(value, str):
+            raise SerializationError(f"expected text, got {type(value).__name__}")
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(strings)
+            strings.append(value)
+        return i
+
+    ints = array("q")
+    try:
+        for computer in computers:
+            computer_id, name, created, total, extra, components = _fields(computer, keys, price_keys, known)
+            ints.extend((
+                _int_or_none(computer_id),
+                ref(name),
+                ref(created if created is None or isinstance(created, str) else str(created)),
+                _int_or_none(total),
+                ref(json.dumps(extra, default=str)) if extra else 0,
+            ))
+            for comp_name, price in components:
+                ints.append(ref(comp_name))
+                ints.append(_int_or_none(price))
+    except TypeError as e:  # e.g. non-serializable extra values
+        raise SerializationError(str(e)) from e
+
+    encoded = [s.encode("utf-8") for s in strings]
+    lengths = array("I", (len(b) for b in encoded))
+    return b"".join((
+        _HEADER.pack(_MAGIC, _VERSION, _CODEC_SBIN),
+        _COUNTS.pack(len(computers), len(keys), len(strings)),
+        lengths.tobytes(),
+        b"".join(encoded),
+        ints.tobytes(),
+    ))
+
+
+def _sbin_parse(raw: bytes) -> tuple[int, int, list[str], array]:
+    """Split an sbin blob into (builds, component slots, strings, int64 rows)."""
+    _, version, codec = _HEADER.unpack_from(raw)
+    if version != _VERSION or codec != _CODEC_SBIN:
+        raise SerializationError(f"unsupported computers_data format v{version}/codec {codec}")
+
+    n_builds, n_slots, n_strings = _COUNTS.unpack_from(raw, _HEADER.size)
+    pos = _HEADER.size + _COUNTS.size
+
+    lengths = array("I")
+    lengths.frombytes(raw[pos:pos + 4 * n_strings])
+    pos += 4 * n_strings
+
+    strings = []
+    for n in lengths:
+        strings.append(raw[pos:pos + n].decode("utf-8"))
+        pos += n
+
+    ints = array("q")
+    if len(raw) - pos != ints.itemsize * n_builds * (_FIXED + 2 * n_slots):
+        raise SerializationError("truncated sbin row")
+    ints.frombytes(raw[pos:])
+    return n_builds, n_slots, strings, ints
+
+
+def _sbin_rows(raw: bytes) -> tuple[list[str], list, list[list[int]]]:
+    """(component keys, strings with [0] = None, one int list per build) of an sbin blob."""
+    n_builds, n_slots, strings, ints = _sbin_parse(raw)
+    strings[0] = None
+    width = _FIXED + 2 * n_slots
+    values = ints.tolist()
+    return strings[1:1 + n_slots], strings, [values[i:i + width] for i in range(0, len(values), width)]
+
+
+def _parse_date(text: str) -> Any:
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _sbin_decode(raw: bytes, parse_dates: bool) -> list[dict]:
+    keys, strings, rows = _sbin_rows(raw)
+    slots = [
+        (key, COMPONENT_CONFIG[key]["price_key"] if key in COMPONENT_CONFIG else f"{key}_price", _FIXED + 2 * s)
+        for s, key in enumerate(keys)
+    ]
+
+    computers = []
+    for row in rows:
+        # Same key order as utils.create_computer_dict / BuildRecord.to_dict
+        c = {"id": None if row[0] == _NONE else row[0], "name": strings[row[1]]}
+        for key, price_key, i in slots:
+            c[key]       = strings[row[i]]
+            c[price_key] = None if row[i + 1] == _NONE else row[i + 1]
+        c["total_price"] = None if row[3] == _NONE else row[3]
+        created = strings[row[2]]  # same text json.dumps(default=str) writes
+        c["created_at"] = _parse_date(created) if parse_dates and created else created
+        if row[4]:
+            c.update(json.loads(strings[row[4]]))
+        computers.append(c)
+    return computers
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Public API
+# ══════════════════════════════════════════════════════════════════════════════
+
+def is_legacy(raw: Raw) -> bool:
+    """True for rows still stored as JSON text."""
+    return raw is not None and not (isinstance(raw, (bytes, bytearray)) and raw[:2] == _MAGIC)
+
+
+def encode_computers(computers: list, fmt: str = USER_STATE_FORMAT) -> Union[str, bytes]:
+    """Encode a user's builds (dicts or BuildRecords) in the configured codec."""
+    if fmt == "sbin":
+        try:
+            return _sbin_encode(computers)
+        except SerializationError:
+            pass  # a value the binary layout cannot hold → keep this row as JSON
+    return _json_encode(computers)
+
+
+def decode_computers(raw: Raw, parse_dates: bool = True) -> list[dict]:
+    """
+    Decode a computers_data value of any supported format into build dicts.
+    With parse_dates=False, created_at stays text exactly as in JSON rows.
+    """
+    if not raw:
+        return []
+    if isinstance(raw, (bytes, bytearray)) and raw[:2] == _MAGIC:
+        return _sbin_decode(bytes(raw), parse_dates)
+    return _json_decode(raw, parse_dates)
+
+
+def decode_records(raw: Raw) -> list:
+    """
+    Decode straight into BuildRecord objects (what the bot's cache holds).
+    sbin rows written with the current component layout skip the dict stage.
+    """
+    from models import BuildRecord  # local import to avoid circular
+
+    if not (isinstance(raw, (bytes, bytearray)) and raw[:2] == _MAGIC):
+        return [BuildRecord.from_dict(c) for c in decode_computers(raw)]
+
+    raw = bytes(raw)
+    keys, strings, rows = _sbin_rows(raw)
+    if keys != [cfg["key"] for cfg in COMPONENT_CONFIG.values()]:
+        return [BuildRecord.from_dict(c) for c in _sbin_decode(raw, True)]
+
+    width = len(rows[0]) if rows else 0
+    return [
+        BuildRecord.from_components(
+            None if row[0] == _NONE else row[0],
+            strings[row[1]],
+            _parse_date(strings[row[2]]) if row[2] else None,
+            None if row[3] == _NONE else row[3],
+            [(strings[row[i]], None if row[i + 1] == _NONE else row[i + 1]) for i in range(_FIXED, width, 2)],
+            json.loads(strings[row[4]]) if row[4] else None,
+        )
+        for row in rows
+    ]
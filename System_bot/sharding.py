@@ -0,0 +1,346 @@
+"""
+sharding.py  —  optional multi-process mode (SHARDS > 1).
+
+One front process long-polls Telegram and routes every update by the user
+who sent it to one of SHARDS worker processes:
+
+  • a user always lands on the same shard (shard_of), so each worker owns its
+    users' cache entries outright and gets a user's updates in the order
+    Telegram sent them. Threaded workers (the default) run them on a pool, so
+    two updates of one user are serialised (db.user_lock) but may run in
+    either order; threaded=False keeps the order at the cost of parallelism;
+  • each worker keeps user state in its own SQLite file (SHARD_DB_TEMPLATE),
+    so saves on different shards never wait on one database lock. Users are
+    moved into (and between) shard files by `python sharding.py migrate`;
+    the bot refuses to start while any user sits in the wrong file
+    (check_layout). With SHARD_DB_TEMPLATE="" all shards share DB_PATH and
+    each worker only revalues the users it owns;
+  • the read-mostly catalog, price history and watches stay in the shared
+    CATALOG_DB_PATH, and each worker holds its own in-memory catalog index;
+  • every worker gets TG_GLOBAL_RATE / SHARDS of the bot-wide send budget.
+
+Workers are started with the "spawn" method so none of them inherits the
+front's HTTP session or sqlite connections. Updates travel as the raw JSON
+dicts getUpdates returns and are parsed in the worker.
+"""
+
+import multiprocessing as mp
+import os
+import signal
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import Optional
+
+from telebot import apihelper, types
+
+from config import (
+    logger,
+    BOT_TOKEN,
+    SHARDS,
+    SHARD_DB_TEMPLATE,
+    TG_GLOBAL_RATE,
+    TRACE_FILE,
+    WARMUP_USERS,
+)
+
+_UPDATE_KINDS = ("message", "edited_message", "callback_query", "inline_query", "chosen_inline_result")
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Stable shard index of a user (Fibonacci hashing, so sequential ids still spread evenly)."""
+    return ((user_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) * shards >> 64
+
+
+def update_user_id(update: dict) -> Optional[int]:
+    """The sending user of a raw update dict, if it has one."""
+    for kind in _UPDATE_KINDS:
+        payload = update.get(kind)
+        if payload and "from" in payload:
+            return payload["from"]["id"]
+    return None
+
+
+def shard_db_path(index: int) -> Optional[str]:
+    return SHARD_DB_TEMPLATE.format(index) if SHARD_DB_TEMPLATE else None
+
+
+def user_db_paths() -> list[str]:
+    """Every database holding users rows (one per shard, or just DB_PATH)."""
+    from db import DB_PATH
+    if SHARDS > 1 and SHARD_DB_TEMPLATE:
+        return [shard_db_path(i) for i in range(SHARDS)]
+    return [DB_PATH]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Layout check and migration
+# ══════════════════════════════════════════════════════════════════════════════
+#
+# Shard files are stamped with meta shard_count, so a file written under
+# another SHARDS value is recognised even when it still holds users.
+#
+
+_LAYOUT_KEY = "shard_count"
+# Meta keys of per-database derived data, dropped when users move so the next
+# start rebuilds build_components (revaluation.py) and the stats (maintenance.py)
+_DERIVED_KEYS = "('build_index_version', 'stats_rebuilt_at')"
+
+
+def _target_paths(shards: int) -> list[str]:
+    """Databases that hold users rows under `shards` shards."""
+    from db import DB_PATH
+    if shards > 1 and SHARD_DB_TEMPLATE:
+        return [shard_db_path(i) for i in range(shards)]
+    return [DB_PATH]
+
+
+def _user_paths() -> list[str]:
+    """Every existing database that may hold users rows: DB_PATH and the shard files."""
+    from db import DB_PATH
+    paths = [DB_PATH]
+    index = 0
+    while SHARD_DB_TEMPLATE and os.path.exists(shard_db_path(index)):
+        paths.append(shard_db_path(index))
+        index += 1
+    return paths
+
+
+def _scalar(path: str, sql: str, *args) -> Optional[int]:
+    """First value of a query on path, or None if the table does not exist yet."""
+    with closing(sqlite3.connect(path)) as conn:
+        try:
+            row = conn.execute(sql, args).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return row[0] if row else None
+
+
+def _path_of(user_id: int, shards: int) -> str:
+    return _target_paths(shards)[shard_of(user_id, shards) if shards > 1 and SHARD_DB_TEMPLATE else 0]
+
+
+def misplaced(shards: int = SHARDS) -> list[str]:
+    """Databases holding users rows that do not belong there under `shards` shards."""
+    targets = _target_paths(shards)
+    sharded = shards > 1 and bool(SHARD_DB_TEMPLATE)
+    wrong = []
+    for path in _user_paths():
+        if not _scalar(path, "SELECT EXISTS (SELECT 1 FROM users)"):
+            continue
+        if path not in targets or (sharded and _scalar(
+                path, "SELECT value FROM meta WHERE key = ?", _LAYOUT_KEY) != shards):
+            wrong.append(path)
+    return wrong
+
+
+def check_layout(shards: int = SHARDS) -> None:
+    """Refuse to start while users sit in the wrong database; stamp the shard files otherwise."""
+    wrong = misplaced(shards)
+    if wrong:
+        raise SystemExit(f"Users stored for another shard layout in {', '.join(wrong)}; "
+                         f"stop the bot and run `python sharding.py migrate` (SHARDS={shards}).")
+    if shards > 1 and SHARD_DB_TEMPLATE:
+        for path in _target_paths(shards):
+            _stamp(path, shards)
+
+
+def _stamp(path: str, shards: int) -> None:
+    import db
+    default, db.DB_PATH = db.DB_PATH, path
+    try:
+        db.init_database()
+        db.set_meta(_LAYOUT_KEY, shards)
+    finally:
+        db.DB_PATH = default
+
+
+def migrate(shards: int = SHARDS, page: int = 1000) -> int:
+    """
+    Move every users row into the database it belongs to under `shards`
+    shards (from DB_PATH into shard files, between shard files after SHARDS
+    changed, or back into DB_PATH). Run with the bot stopped. The build
+    index and stats of every database that changed are rebuilt on the next
+    start. Returns the number of users moved.
+    """
+    for path in _target_paths(shards):
+        _stamp(path, shards)
+
+    moved = 0
+    for source in _user_paths():
+        changed = False
+        cursor  = -1
+        with closing(sqlite3.connect(source)) as conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT user_id, current_computer, computers_data, last_update FROM users "
+                    "WHERE user_id > ? ORDER BY user_id LIMIT ?", (cursor, page),
+                ).fetchall()
+                if not rows:
+                    break
+                cursor = rows[-1][0]
+                by_target: dict[str, list[tuple]] = {}
+                for row in rows:
+                    target = _path_of(row[0], shards)
+                    if target != source:
+                        by_target.setdefault(target, []).append(row)
+                for target, batch in by_target.items():
+                    # Copy first, then delete: an interrupted migration only leaves copies to redo
+                    with closing(sqlite3.connect(target)) as dst:
+                        dst.executemany("INSERT OR REPLACE INTO users (user_id, current_computer, computers_data, "
+                                        "last_update) VALUES (?, ?, ?, ?)", batch)
+                        dst.execute(f"DELETE FROM meta WHERE key IN {_DERIVED_KEYS}")
+                        dst.commit()
+                    user_ids = [(row[0],) for row in batch]
+                    conn.executemany("DELETE FROM users WHERE user_id = ?", user_ids)
+                    conn.executemany("DELETE FROM build_components WHERE user_id = ?", user_ids)
+                    conn.commit()
+                    moved  += len(batch)
+                    changed = True
+            if changed:
+                conn.execute(f"DELETE FROM meta WHERE key IN {_DERIVED_KEYS}")
+                conn.commit()
+        if changed:
+            logger.info("🚚 Users moved out of %s", source)
+    logger.info("🚚 Migration to %d shard(s) done: %d users moved", shards, moved)
+    return moved
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Worker process
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _worker(index: int, shards: int, updates: "mp.JoinableQueue", threaded: bool) -> None:
+    import db
+    path = shard_db_path(index)
+    if path:
+        db.DB_PATH = path
+
+    import alerts
+    import handlers  # noqa: F401  registers the bot handlers in this process
+    import hotreload
+    import maintenance
+    import revaluation
+    import similar
+    import tracing
+    from config import bot
+    from outbound import outbound
+
+    bot.threaded = threaded
+    outbound.set_global_rate(TG_GLOBAL_RATE / shards)
+
+    db.init_database()
+    db.load_catalog()
+    hotreload.install()
+    if WARMUP_USERS:
+        db.warm_cache(WARMUP_USERS // shards)
+    similar.start()  # this shard's builds only
+    revaluation.start(shard=None if path else (index, shards))  # shared DB: own users only
+    alerts.start(shard=index)
+    if TRACE_FILE:
+        stem, ext = os.path.splitext(TRACE_FILE)
+        tracing.install(f"{stem}.shard{index}{ext}")
+    if path:
+        maintenance.start(paths=[path])
+    logger.info("🧩 Shard %d/%d ready (%s)", index, shards, db.DB_PATH)
+
+    while True:
+        batch = updates.get()
+        try:
+            if batch is None:
+                break
+            bot.process_new_updates([types.Update.de_json(u) for u in batch])
+        except Exception as e:
+            logger.error("❌ Shard %d failed on a batch: %s", index, e)
+        finally:
+            updates.task_done()
+    outbound.flush()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Front
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ShardPool:
+    """The worker processes and their queues; dispatch() routes raw updates to them."""
+
+    def __init__(self, shards: int = SHARDS, threaded: bool = True):
+        ctx = mp.get_context("spawn")
+        self.shards = shards
+        self.queues = [ctx.JoinableQueue() for _ in range(shards)]
+        self.processes = [
+            ctx.Process(target=_worker, args=(i, shards, q, threaded), name=f"shard-{i}", daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+
+    def start(self) -> "ShardPool":
+        for p in self.processes:
+            p.start()
+        return self
+
+    def dispatch(self, updates: list[dict]) -> None:
+        """Send each update to its user's shard (updates without a user go to shard 0)."""
+        batches: list[list[dict]] = [[] for _ in range(self.shards)]
+        for update in updates:
+            user_id = update_user_id(update)
+            batches[0 if user_id is None else shard_of(user_id, self.shards)].append(update)
+        for queue, batch in zip(self.queues, batches):
+            if batch:
+                queue.put(batch)
+
+    def reload(self) -> None:
+        """Ask every worker for a hot reload (see hotreload.py)."""
+        for p in self.processes:
+            if p.pid is not None:
+                os.kill(p.pid, signal.SIGHUP)
+
+    def join(self) -> None:
+        """Block until every dispatched batch has been processed."""
+        for queue in self.queues:
+            queue.join()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Drain the queues, let each worker save its users and exit."""
+        for queue in self.queues:
+            queue.put(None)
+        for p in self.processes:
+            p.join(timeout)
+
+
+def run(shards: int = SHARDS, poll_timeout: int = 20) -> None:
+    """Long-poll Telegram in this process and serve the updates from `shards` workers."""
+    import maintenance
+    from db import CATALOG_DB_PATH
+
+    pool = ShardPool(shards).start()
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: pool.reload())
+    maintenance.start(paths=[CATALOG_DB_PATH], stats=False)  # stats are per shard
+    logger.info("🧩 Sharded mode: %d workers", shards)
+
+    offset = None
+    try:
+        while True:
+            try:
+                updates = apihelper.get_updates(
+                    BOT_TOKEN, offset=offset, limit=100, timeout=poll_timeout, long_polling_timeout=poll_timeout,
+                )
+            except Exception as e:
+                logger.error("❌ getUpdates failed: %s", e)
+                time.sleep(3)
+                continue
+            if updates:
+                offset = updates[-1]["update_id"] + 1
+                pool.dispatch(updates)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    # python sharding.py migrate [shards]  — move users to the layout of SHARDS (or [shards])
+    if sys.argv[1:2] != ["migrate"]:
+        sys.exit("usage: python sharding.py migrate [shards]")
+    migrate(int(sys.argv[2]) if len(sys.argv) > 2 else SHARDS)
@@ -0,0 +1,212 @@
+"""
+similar.py  —  "builds like mine": what similar saved builds went on to use.
+
+Every complete saved build (a catalog component for every type) is indexed
+by MinHash-LSH over its features: its catalog component ids plus its price
+tier (db.build_tier). A build's signature is BANDS × ROWS hash minima;
+builds agreeing on all ROWS minima of a band share that band's bucket and
+become candidates for each other. With 8 bands of 2 rows, builds sharing
+half their features meet in some bucket ~90 % of the time, while a query
+only touches BANDS buckets.
+
+suggest_components(computer) takes a partial build, ranks the candidates
+from its buckets by exact Jaccard similarity and returns, for each
+component type the build still lacks, the components most used by its
+NEAREST closest builds (votes weighted by similarity).
+
+The index lives in memory, one per process (a shard worker indexes its own
+shard): start() fills it from the users table in a background thread and
+db's save hook keeps it current — each save replaces that user's builds.
+Builds are stored column-wise (a few dozen bytes each) and the slots of
+replaced builds are reused.
+"""
+
+import random
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Optional, Union
+
+import db
+from config import logger
+from utils import COMPONENT_CONFIG
+
+BANDS, ROWS    = 8, 2
+NEAREST        = 50    # closest builds that vote on the suggestions
+MAX_CANDIDATES = 500   # candidates scored exactly, by number of shared buckets
+MAX_BUCKET_SCAN = 2000 # most recent slots read per bucket (popular combos get huge)
+
+_PRIME  = (1 << 61) - 1
+_rng    = random.Random(0x5EED)
+_HASHES = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(BANDS * ROWS)]
+_FREE   = 0  # tier feature of a free slot (real tier features are negative)
+
+
+def _tier_feature(tier: str) -> int:
+    """Tier as a feature id that cannot collide with a component id."""
+    return -1 - zlib.crc32(tier.encode("utf-8"))
+
+
+def features(computer) -> tuple[dict[str, int], int]:
+    """({component type: catalog component id}, tier feature) of a build."""
+    parts = db.catalog_parts(computer)
+    return {comp_type: component["id"] for comp_type, component, _ in parts}, _tier_feature(db.build_tier(parts))
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_hashes(feature: int) -> tuple[int, ...]:
+    return tuple((a * feature + b) % _PRIME for a, b in _HASHES)
+
+
+def _bucket_keys(feats: set[int]) -> list[int]:
+    """One bucket key per band: the hash of the band's rows of the MinHash signature."""
+    signature = list(map(min, *map(_feature_hashes, feats)))
+    return [hash((band, *signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class BuildIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._types = list(COMPONENT_CONFIG)
+        # slot → component id per type, and tier feature (_FREE once the build is replaced)
+        self._columns = [array("i") for _ in self._types]
+        self._tiers   = array("q")
+        self._free: list[int] = []
+        self._by_user: dict[int, list[int]] = {}
+        # bucket key → its slot, or array of slots once shared (most buckets hold one build)
+        self._buckets: dict[int, Union[int, array]] = {}
+        # Users saved while load() runs: their stored row may be older than the index
+        self._touched: Optional[set[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._tiers) - len(self._free)
+
+    def _features(self, slot: int) -> set[int]:
+        return {*(column[slot] for column in self._columns), self._tiers[slot]}
+
+    def _add(self, ids: list[int], tier: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+            for column, cid in zip(self._columns, ids):
+                column[slot] = cid
+            self._tiers[slot] = tier
+        else:
+            slot = len(self._tiers)
+            for column, cid in zip(self._columns, ids):
+                column.append(cid)
+            self._tiers.append(tier)
+        for key in _bucket_keys({*ids, tier}):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = slot
+            elif isinstance(bucket, int):
+                self._buckets[key] = array("I", (bucket, slot))
+            else:
+                bucket.append(slot)
+        return slot
+
+    def _remove(self, slot: int) -> None:
+        for key in _bucket_keys(self._features(slot)):
+            bucket = self._buckets[key]
+            if isinstance(bucket, int):
+                del self._buckets[key]
+            else:
+                bucket.remove(slot)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket[0]
+        self._tiers[slot] = _FREE
+        self._free.append(slot)
+
+    def update_user(self, user_id: int, computers: list, saved: bool = True) -> None:
+        """Replace user_id's builds in the index (saved=False: from load(), skipped if a save won)."""
+        entries = []
+        for computer in computers:
+            picked, tier = features(computer)
+            if len(picked) == len(self._types):
+                entries.append(([picked[t] for t in self._types], tier))
+        with self._lock:
+            if self._touched is not None:
+                if not saved and user_id in self._touched:
+                    return
+                if saved:
+                    self._touched.add(user_id)
+            for slot in self._by_user.pop(user_id, ()):
+                self._remove(slot)
+            slots = [self._add(ids, tier) for ids, tier in entries]
+            if slots:
+                self._by_user[user_id] = slots
+
+    def load(self, page: int = 1000) -> int:
+        """Index every stored user (saves during the load win over what it reads). Returns the builds indexed."""
+        with self._lock:
+            self._touched = set()
+        try:
+            for user_id, computers in db.iter_user_builds(page):
+                self.update_user(user_id, computers, saved=False)
+        finally:
+            with self._lock:
+                self._touched = None
+        return len(self)
+
+    def suggest(self, computer, limit: int = 3) -> dict[str, list[tuple[int, float]]]:
+        """
+        {missing component type: [(component id, weighted votes)]} from the
+        complete builds nearest to computer; empty when it has no catalog
+        component yet or nothing similar is indexed.
+        """
+        picked, tier = features(computer)
+        missing = [i for i, t in enumerate(self._types) if t not in picked]
+        if not picked or not missing:
+            return {}
+        feats = {*picked.values(), tier}
+
+        with self._lock:
+            hits = Counter()
+            for key in _bucket_keys(feats):
+                bucket = self._buckets.get(key)
+                if isinstance(bucket, int):
+                    hits[bucket] += 1
+                elif bucket is not None:
+                    hits.update(bucket[-MAX_BUCKET_SCAN:])
+            scored = []
+            for slot, _ in hits.most_common(MAX_CANDIDATES):
+                slot_tier = self._tiers[slot]
+                shared = (slot_tier == tier) + sum(column[slot] in feats for column in self._columns)
+                scored.append((shared / (len(feats) + len(self._types) + 1 - shared), slot))
+            scored.sort(reverse=True)
+            votes = {i: Counter() for i in missing}
+            for similarity, slot in scored[:NEAREST]:
+                for i in missing:
+                    votes[i][self._columns[i][slot]] += similarity
+
+        return {self._types[i]: [(cid, round(weight, 2)) for cid, weight in counter.most_common(limit)]
+                for i, counter in votes.items() if counter}
+
+
+index = BuildIndex()
+
+
+def suggest_components(computer, limit: int = 3) -> dict[str, list[tuple[int, float]]]:
+    return index.suggest(computer, limit)
+
+
+@db.on_user_saved
+def _index_saved(user_id: int, computers: list) -> None:
+    index.update_user(user_id, computers)
+
+
+def start() -> None:
+    """Fill the index from the users table in a background thread (saves are indexed meanwhile)."""
+    def run() -> None:
+        started = time.monotonic()
+        try:
+            builds = index.load()
+        except Exception as e:
+            logger.error("❌ Build index load failed: %s", e)
+            return
+        logger.info("🧭 Build index ready: %d complete builds in %.1fs", builds, time.monotonic() - started)
+
+    threading.Thread(target=run, name="build-index", daemon=True).start()
@@ -0,0 +1,328 @@
+"""
+snapshot.py  —  immutable, memory-mapped snapshot of the component catalog.
+
+Every bot, shard and dashboard process used to read all of components_price
+into its own dicts at startup. The snapshot is written once per catalog
+change (after a CSV import or a price update run) and opened with mmap, so
+the processes share one copy in the page cache and opening it is O(1):
+
+  header    magic, version, counts and section offsets
+  meta      JSON: component types, row count and max id of the source table
+  strings   UTF-8 names, categories and URLs, back to back
+  records   one fixed-width _RECORD per component
+  ids       u32 per id 0..max_id → record index + 1 (0 = no such id)
+  names     open-addressing hash table, crc32(name) → record index + 1
+  grams     open-addressing hash table, crc32(trigram) → postings slice
+  postings  u32 record indices, ascending, per trigram
+
+Lookups by id and by name are O(1). Searches match like the SQL LIKE
+'%word%' they replace: the trigram postings of every query word narrow the
+candidates, and the names of those are then checked for the word itself.
+Like SQLite's LIKE, matching folds case for ASCII letters only ('Łódź'
+does not match 'łódź'); unlike it, % and _ in a word are plain characters.
+
+Components become dicts only when asked for, and only the LOADED_MAX most
+recently used stay decoded, so a process never rebuilds the whole catalog
+as dicts. Prices changed after the snapshot was written are kept apart
+(set_price) and survive eviction.
+
+Snapshots are written to a temporary file and renamed into place, so a
+process holding the previous one keeps reading it undisturbed.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, Protocol
+
+_MAGIC   = b"CCAT"
+_VERSION = 2
+# magic, version, records, max id, name slots, gram slots, then the section offsets
+# meta, strings, records, ids, names, grams, postings (+ meta length)
+_HEADER = struct.Struct("<4sIIIIIQQQQQQQI")
+_RECORD = struct.Struct("<IiIIIIIIB3x")  # id, price, name/category/url (offset, length), type index
+_GRAM   = struct.Struct("<III")          # trigram crc, first posting, postings (0 = empty slot)
+_NO_PRICE = -2**31
+LOADED_MAX = 4096  # decoded component dicts kept per snapshot (least recently used go first)
+
+# (id, component_type, component_name, average_price_dollar, category, component_url)
+CatalogRow = tuple[int, str, str, Optional[int], Optional[str], Optional[str]]
+
+
+# SQLite's LIKE is case-insensitive for ASCII letters only
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold(text: str) -> str:
+    """text with A-Z lowercased and everything else as is, as LIKE compares it."""
+    return text.translate(_ASCII_LOWER)
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _slots(n: int) -> int:
+    """Power of two hash-table size keeping the load factor at or below 1/2."""
+    size = 1
+    while size < 2 * n:
+        size *= 2
+    return size
+
+
+def _align(buf: bytearray, to: int = 8) -> int:
+    buf.extend(b"\0" * (-len(buf) % to))
+    return len(buf)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Writing
+# ══════════════════════════════════════════════════════════════════════════════
+
+def write_snapshot(path: str, rows: Iterable[CatalogRow], **meta) -> int:
+    """
+    Write a snapshot of the catalog rows to path (atomically); meta is stored
+    alongside (e.g. the price_history position it reflects). Returns the
+    number of components.
+    """
+    rows  = sorted(rows)
+    types = sorted({row[1] for row in rows})
+    type_index = {t: i for i, t in enumerate(types)}
+    max_id = rows[-1][0] if rows else 0
+
+    strings = bytearray()
+
+    def ref(text: Optional[str]) -> tuple[int, int]:
+        data = (text or "").encode("utf-8")
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    records = bytearray()
+    ids     = [0] * (max_id + 1)
+    grams: dict[int, list[int]] = {}
+    name_slots = _slots(len(rows))
+    names = [0] * name_slots
+    for index, (cid, comp_type, name, price, category, url) in enumerate(rows):
+        name_ref = ref(name)
+        records += _RECORD.pack(cid, _NO_PRICE if price is None else price,
+                                *name_ref, *ref(category), *ref(url), type_index[comp_type])
+        ids[cid] = index + 1
+        slot = zlib.crc32(name.encode("utf-8")) & (name_slots - 1)
+        while names[slot]:
+            slot = (slot + 1) & (name_slots - 1)
+        names[slot] = index + 1
+        for gram in trigrams(fold(name)):
+            grams.setdefault(zlib.crc32(gram.encode("utf-8")), []).append(index)
+
+    gram_slots = _slots(len(grams))
+    gram_table = [(0, 0, 0)] * gram_slots
+    postings: list[int] = []
+    for key, indices in grams.items():
+        slot = key & (gram_slots - 1)
+        while gram_table[slot][2]:
+            slot = (slot + 1) & (gram_slots - 1)
+        gram_table[slot] = (key, len(postings), len(indices))
+        postings.extend(indices)  # ascending: rows are visited in order
+
+    meta = json.dumps({**meta, "types": types, "rows": len(rows), "max_id": max_id,
+                       "created": int(time.time())}).encode()
+
+    body = bytearray(b"\0" * _HEADER.size)
+    meta_off     = _align(body); body += meta
+    strings_off  = _align(body); body += strings
+    records_off  = _align(body); body += records
+    ids_off      = _align(body); body += struct.pack(f"<{len(ids)}I", *ids)
+    names_off    = _align(body); body += struct.pack(f"<{name_slots}I", *names)
+    grams_off    = _align(body)
+    for entry in gram_table:
+        body += _GRAM.pack(*entry)
+    postings_off = _align(body); body += struct.pack(f"<{len(postings)}I", *postings)
+    _HEADER.pack_into(body, 0, _MAGIC, _VERSION, len(rows), max_id, name_slots, gram_slots,
+                      meta_off, strings_off, records_off, ids_off, names_off, grams_off, postings_off, len(meta))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(rows)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Reading
+# ══════════════════════════════════════════════════════════════════════════════
+
+class CatalogLookup(Protocol):
+    """What the catalog index offers by id or by name: a plain dict or a snapshot _View."""
+
+    def get(self, key, default=None) -> Optional[dict]: ...
+
+    def __contains__(self, key) -> bool: ...
+
+    def __len__(self) -> int: ...
+
+
+class _View:
+    """Read-only mapping over a snapshot: .get(key) → component dict."""
+
+    def __init__(self, snapshot: "CatalogSnapshot", locate):
+        self._snapshot = snapshot
+        self._locate   = locate
+
+    def get(self, key, default=None) -> Optional[dict]:
+        index = self._locate(key)
+        return default if index is None else self._snapshot.component(index)
+
+    def __contains__(self, key) -> bool:
+        return self._locate(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+
+class CatalogSnapshot:
+    def __init__(self, path: str, loaded_max: int = LOADED_MAX):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._count, self._max_id, self._name_slots, self._gram_slots, meta_off,
+         self._strings, self._records, ids_off, names_off, self._grams, postings_off, meta_len) = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path}: not a catalog snapshot v{_VERSION}")
+        self.meta  = json.loads(self._mm[meta_off:meta_off + meta_len])
+        self.types = self.meta["types"]
+
+        view = memoryview(self._mm)
+        self._ids      = view[ids_off:ids_off + 4 * (self._max_id + 1)].cast("I")
+        self._names    = view[names_off:names_off + 4 * self._name_slots].cast("I")
+        self._postings = view[postings_off:postings_off + 4 * ((len(self._mm) - postings_off) // 4)].cast("I")
+        # Recently handed out components and prices set since the snapshot was
+        # written, by record index (prices are kept apart so they outlive eviction)
+        self._loaded: OrderedDict[int, dict] = OrderedDict()
+        self._loaded_max = loaded_max
+        self._prices: dict[int, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+        self.by_id   = _View(self, self.index_of_id)
+        self.by_name = _View(self, self.index_of_name)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        start = self._strings + offset
+        return self._mm[start:start + length].decode("utf-8") if length else None
+
+    def _record(self, index: int) -> tuple:
+        return _RECORD.unpack_from(self._mm, self._records + index * _RECORD.size)
+
+    def component(self, index: int) -> dict:
+        with self._lock:
+            component = self._loaded.get(index)
+            if component is not None:
+                self._loaded.move_to_end(index)
+                return component
+        cid, price, name_off, name_len, cat_off, cat_len, url_off, url_len, type_index = self._record(index)
+        component = {
+            "id":       cid,
+            "type":     self.types[type_index],
+            "name":     self._string(name_off, name_len) or "",
+            "price":    None if price == _NO_PRICE else price,
+            "category": self._string(cat_off, cat_len),
+            "url":      self._string(url_off, url_len),
+        }
+        with self._lock:
+            component["price"] = self._prices.get(index, component["price"])
+            component = self._loaded.setdefault(index, component)
+            while len(self._loaded) > self._loaded_max:
+                self._loaded.popitem(last=False)
+        return component
+
+    def set_price(self, component_id: int, price: Optional[int]) -> None:
+        """Current price of a component, if it differs from the one written in the snapshot."""
+        index = self.index_of_id(component_id)
+        if index is None:
+            return
+        stored = self._record(index)[1]
+        with self._lock:
+            if price == (None if stored == _NO_PRICE else stored):
+                self._prices.pop(index, None)
+            else:
+                self._prices[index] = price
+            component = self._loaded.get(index)
+            if component is not None:
+                component["price"] = price
+
+    def index_of_id(self, component_id: int) -> Optional[int]:
+        if not 0 <= component_id <= self._max_id:
+            return None
+        slot = self._ids[component_id]
+        return slot - 1 if slot else None
+
+    def index_of_name(self, name: str) -> Optional[int]:
+        data = name.encode("utf-8")
+        mask = self._name_slots - 1
+        slot = zlib.crc32(data) & mask
+        while True:
+            entry = self._names[slot]
+            if not entry:
+                return None
+            _, _, name_off, name_len = self._record(entry - 1)[:4]
+            start = self._strings + name_off
+            if name_len == len(data) and self._mm[start:start + name_len] == data:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def _postings_of(self, gram: str) -> memoryview:
+        key  = zlib.crc32(gram.encode("utf-8"))
+        mask = self._gram_slots - 1
+        slot = key & mask
+        while True:
+            gram_key, first, count = _GRAM.unpack_from(self._mm, self._grams + slot * _GRAM.size)
+            if not count:
+                return self._postings[0:0]
+            if gram_key == key:
+                return self._postings[first:first + count]
+            slot = (slot + 1) & mask
+
+    def _candidates(self, word: str) -> Iterator[int]:
+        """Record indices holding every trigram of word (a superset of the names containing it)."""
+        lists = sorted((self._postings_of(g) for g in trigrams(word)), key=len)
+        if not lists:
+            return iter(range(self._count))
+        first, rest = lists[0], lists[1:]
+        return (i for i in first if all(_contains(other, i) for other in rest))
+
+    def search(self, words: list[str], component_type: Optional[str] = None, match_all: bool = True) -> list[dict]:
+        """Components whose name contains all (or any) of the words, ASCII case folded (see fold)."""
+        words = sorted(map(fold, words), key=len, reverse=True)  # longest word → fewest candidates
+        if match_all:
+            candidates = self._candidates(words[0])
+        else:
+            candidates = sorted(set().union(*(self._candidates(w) for w in words)))
+        found = []
+        for index in candidates:
+            component = self.component(index)
+            if component_type is not None and component["type"] != component_type:
+                continue
+            name = fold(component["name"])
+            if (all if match_all else any)(w in name for w in words):
+                found.append(component)
+        return found
+
+    def close(self) -> None:
+        for view in (self._ids, self._names, self._postings):
+            view.release()
+        self._mm.close()
+
+
+def _contains(postings: memoryview, index: int) -> bool:
+    i = bisect.bisect_left(postings, index)
+    return i < len(postings) and postings[i] == index
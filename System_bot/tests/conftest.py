@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bot's modules are top-level (run from System_bot/), not a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
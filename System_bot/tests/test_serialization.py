@@ -0,0 +1,109 @@
+"""users.computers_data codecs: sbin round trip, legacy JSON rows, rejected blobs."""
+
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import db
+from models import BuildRecord
+from serialization import (
+    SerializationError,
+    _HEADER,
+    _MAGIC,
+    decode_computers,
+    decode_records,
+    encode_computers,
+    is_legacy,
+)
+from utils import create_computer_dict
+
+
+def _builds() -> list[dict]:
+    full = create_computer_dict(1, "Gaming rig")
+    full.update(cpu="AMD Ryzen 7 7800X3D", cpu_price=449, gpu="RTX 4070 — łódź edition", gpu_price=599,
+                ram="32GB DDR5", ram_price=0, storage="2TB NVMe", storage_price=129,
+                motherboard="B650 TOMAHAWK", motherboard_price=219, total_price=1396,
+                created_at=datetime(2025, 3, 1, 12, 30, 15), note={"budget": 1500})
+    empty = create_computer_dict(2, "")
+    empty["created_at"] = datetime(2025, 3, 2)
+    return [full, empty]
+
+
+def test_sbin_round_trip():
+    builds = _builds()
+    raw = encode_computers(builds, "sbin")
+    assert isinstance(raw, bytes) and raw[:2] == _MAGIC
+    assert not is_legacy(raw)
+    assert decode_computers(raw) == builds
+
+
+def test_sbin_round_trip_through_records():
+    builds  = _builds()
+    records = decode_records(encode_computers(builds, "sbin"))
+    assert all(isinstance(r, BuildRecord) for r in records)
+    assert [r.to_dict() for r in records] == builds
+    assert decode_computers(encode_computers(records, "sbin")) == builds
+
+
+def test_sbin_falls_back_to_json_for_unencodable_values():
+    builds = _builds()
+    builds[0]["cpu_price"] = 12.5  # not an integer
+    raw = encode_computers(builds, "sbin")
+    assert is_legacy(raw)
+    assert decode_computers(raw)[0]["cpu_price"] == 12.5
+
+
+def test_legacy_json_row_is_read_and_decoded():
+    builds = _builds()
+    raw = json.dumps(builds, default=str)
+    assert is_legacy(raw)
+    assert decode_computers(raw) == builds
+    assert decode_computers(raw, parse_dates=False)[0]["created_at"] == "2025-03-01 12:30:15"
+    assert [r.to_dict() for r in decode_records(raw)] == builds
+
+
+def test_legacy_json_row_is_rewritten_on_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "computers.db"))
+    monkeypatch.setattr(db, "CATALOG_DB_PATH", str(tmp_path / "computers.db"))
+    monkeypatch.setattr(db, "USER_STATE_FORMAT", "sbin")
+    db.init_database()
+    builds = _builds()
+    with sqlite3.connect(db.DB_PATH) as conn:
+        conn.execute("INSERT INTO users (user_id, current_computer, computers_data, last_update) "
+                     "VALUES (?, ?, ?, '2025-01-01 00:00:00')", (7, 1, json.dumps(builds, default=str)))
+
+    user = db.load_user_from_db(7)
+    assert [r.to_dict() for r in user["computers"]] == builds
+
+    with sqlite3.connect(db.DB_PATH) as conn:
+        raw, last_update = conn.execute(
+            "SELECT computers_data, last_update FROM users WHERE user_id = 7").fetchone()
+    assert not is_legacy(raw)
+    assert last_update == "2025-01-01 00:00:00"  # a migration is not user activity
+    assert decode_computers(raw) == builds
+
+
+@pytest.mark.parametrize("version, codec", [(2, 1), (1, 9)])
+def test_unknown_version_or_codec_is_rejected(version, codec):
+    raw = bytearray(encode_computers(_builds(), "sbin"))
+    _HEADER.pack_into(raw, 0, _MAGIC, version, codec)
+    with pytest.raises(SerializationError):
+        decode_computers(bytes(raw))
+    with pytest.raises(SerializationError):
+        decode_records(bytes(raw))
+
+
+def test_truncated_row_is_rejected():
+    raw = encode_computers(_builds(), "sbin")
+    with pytest.raises(SerializationError):
+        decode_computers(raw[:-3])
+
+
+def test_blob_without_magic_is_not_taken_for_sbin():
+    raw = b"XB" + encode_computers(_builds(), "sbin")[2:]
+    assert is_legacy(raw)
+    with pytest.raises(ValueError):
+        decode_computers(raw)
@@ -0,0 +1,305 @@
+"""
+tracing.py  —  per-update trace spans and an on-demand sampling profiler.
+
+Tracing
+  Handlers that receive updates are wrapped in traced_update(); while one
+  runs, span() records what it spends its time on (callback route,
+  get_user_data, SQLite statements, search scoring, AI and Bot API calls,
+  outbound rate-limit waits). Recording a span is two perf_counter() calls
+  and a list append; outside a traced update span() does nothing.
+
+  When the update finishes it is kept if it was slower than TRACE_SLOW_MS or
+  falls into the TRACE_SAMPLE share, and dropped otherwise — so the slow
+  outliers are always there, however low the sample rate. Kept updates are
+  formatted and appended to TRACE_FILE by a background thread in Chrome's
+  JSON trace format (ui.perfetto.dev, chrome://tracing).
+
+Profiling
+  profile(seconds) samples the stacks of every thread with
+  sys._current_frames() and writes them in the collapsed format that
+  flamegraph.pl, speedscope and inferno read. The bot runs it for admins
+  on /profile N.
+"""
+
+import collections
+import functools
+import json
+import os
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from telebot import apihelper
+
+from config import (
+    logger,
+    TRACE_FILE,
+    TRACE_SAMPLE,
+    TRACE_SLOW_MS,
+    TRACE_MAX_BYTES,
+    PROFILE_DIR,
+)
+
+# perf_counter() → Unix time in microseconds, for trace timestamps
+_EPOCH = time.time() - time.perf_counter()
+_PID   = os.getpid()
+
+_local = threading.local()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Spans
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _Span:
+    __slots__ = ("name", "args", "events", "start")
+
+    def __init__(self, name: str, args: Optional[dict]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.events = getattr(_local, "events", None)
+        if self.events is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.events is not None:
+            self.events.append((self.name, self.start, time.perf_counter(), self.args))
+
+
+def span(name: str, **args) -> _Span:
+    """Context manager timing a block as a child of the current update's trace (no-op outside one)."""
+    return _Span(name, args or None)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run every call of the function inside span(name or its __name__)."""
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(label, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_update(kind: str) -> Callable:
+    """
+    Decorator for telebot handlers: the handler's run is the root span of a
+    trace, and the trace is handed to the writer if it is sampled or slow.
+    """
+    def decorate(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(update, *args, **kwargs):
+            if _writer is None or getattr(_local, "events", None) is not None:
+                return handler(update, *args, **kwargs)
+            events = _local.events = []
+            start  = time.perf_counter()
+            try:
+                return handler(update, *args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                _local.events = None
+                if (end - start) * 1000 >= TRACE_SLOW_MS or random.random() < TRACE_SAMPLE:
+                    user = getattr(update, "from_user", None)
+                    root = {"handler": handler.__name__, "user_id": user.id if user else None}
+                    if getattr(update, "data", None) is not None:  # callback query
+                        root["data"] = update.data
+                    events.append((kind, start, end, root))
+                    _writer.put((threading.get_native_id(), threading.current_thread().name, events))
+        return wrapper
+    return decorate
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Instrumented transports
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements show up as 'sql' spans (pass as factory=)."""
+
+    def execute(self, sql, *args):
+        with _Span("sql", {"sql": sql}):
+            return super().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        with _Span("sql", {"sql": sql, "many": True}):
+            return super().executemany(sql, *args)
+
+    def executescript(self, script):
+        with _Span("sql", {"sql": script}):
+            return super().executescript(script)
+
+
+def install(path: str = TRACE_FILE) -> None:
+    """Trace Bot API requests (on the shared session from config.py) and start writing traces to path."""
+    session = apihelper.session
+    if session is not None and not hasattr(session.request, "__wrapped__"):
+        request = session.request
+
+        @functools.wraps(request)
+        def traced_request(method, url, *args, **kwargs):
+            with _Span("telegram." + url.rsplit("/", 1)[-1], None):
+                return request(method, url, *args, **kwargs)
+        session.request = traced_request
+
+    if path:
+        start_writer(path)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Trace writer
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _us(perf: float) -> int:
+    return int((perf + _EPOCH) * 1_000_000)
+
+
+def _event(name: str, start: float, end: float, args: Optional[dict], tid: int) -> dict:
+    event = {"name": name, "ph": "X", "ts": _us(start), "dur": _us(end) - _us(start), "pid": _PID, "tid": tid}
+    if args:
+        if "sql" in args:
+            args = dict(args, sql=" ".join(args["sql"].split())[:200])
+        event["args"] = args
+    return event
+
+
+class TraceWriter:
+    """
+    Appends kept traces to a Chrome JSON-array trace file from its own thread.
+
+    The closing ']' of the array is optional in that format, so the file is
+    valid to load at any moment and can simply be appended to across restarts.
+    """
+
+    def __init__(self, path: str, max_bytes: int = TRACE_MAX_BYTES):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self.dropped   = 0
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=10_000)
+        self._threads: set[int] = set()
+        self._thread  = threading.Thread(target=self._loop, name="trace-writer", daemon=True)
+
+    def start(self) -> "TraceWriter":
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def put(self, trace: tuple) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:  # never make a handler wait for the trace file
+            self.dropped += 1
+
+    def _open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        f = open(self.path, "a", encoding="utf-8")
+        if f.tell() == 0:
+            f.write("[\n")
+        self._threads.clear()
+        return f
+
+    def _loop(self) -> None:
+        f = self._open()
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty() and len(batch) < 100:
+                batch.append(self._queue.get_nowait())
+            try:
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    f = self._open()
+                lines = []
+                for tid, thread_name, events in batch:
+                    if tid not in self._threads:
+                        self._threads.add(tid)
+                        lines.append(json.dumps({"name": "thread_name", "ph": "M", "pid": _PID, "tid": tid,
+                                                 "args": {"name": thread_name}}))
+                    lines.extend(json.dumps(_event(*e, tid), ensure_ascii=False, default=str) for e in events)
+                f.write(",\n".join(lines) + ",\n")
+                f.flush()
+            except Exception as e:
+                logger.error("❌ Trace write failed: %s", e)
+
+
+_writer: Optional[TraceWriter] = None
+
+
+def start_writer(path: str) -> TraceWriter:
+    """Start keeping traces in path (one writer per process; a shard worker passes its own file)."""
+    global _writer
+    if _writer is None:
+        _writer = TraceWriter(path).start()
+        logger.info("🔎 Tracing %.1f%% of updates and every update over %.0f ms to %s",
+                    TRACE_SAMPLE * 100, TRACE_SLOW_MS, path)
+    return _writer
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Sampling profiler
+# ══════════════════════════════════════════════════════════════════════════════
+
+_profiling = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def profile(seconds: float, interval: float = 0.005, directory: str = PROFILE_DIR) -> Optional[dict]:
+    """
+    Sample every thread's stack each `interval` seconds for `seconds` and write
+    the collapsed stacks ('thread;outer;…;inner count' per line) to directory.
+
+    Returns {"path", "samples", "top": [(leaf frame, samples), …]}, or None if
+    another profile is already running.
+    """
+    if not _profiling.acquire(blocking=False):
+        return None
+    try:
+        own    = threading.get_ident()
+        stacks: collections.Counter = collections.Counter()
+        leaves: collections.Counter = collections.Counter()
+        labels: dict = {}  # code object → label, so each frame is formatted once
+        samples  = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code  = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stack.reverse()
+                stacks[";".join(stack)] += 1
+                leaves[stack[-1]] += 1
+            samples += 1
+            time.sleep(interval)
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return {"path": path, "samples": samples, "top": leaves.most_common(10)}
+    finally:
+        _profiling.release()
@@ -5,8 +5,15 @@ COMPONENT_CONFIG is the single source of truth for all component metadata.
 Adding a new component type only requires adding one entry here.
 """
 
+import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from config import client, logger
+from typing import Iterator, NamedTuple, Optional
+
+import config
+from config import logger, AI_CACHE_SIZE
+from tracing import span
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -19,6 +26,7 @@ from config import client, logger
 #   emoji      – button/message emoji
 #   label      – human-readable name
 #   select_cb  – prefix for inline button callback_data when picking from list
+#                (kept short: Telegram allows only 64 bytes of callback_data)
 #   manual_cb  – callback_data for "Enter manually" button
 #
 COMPONENT_CONFIG: dict[str, dict] = {
@@ -27,7 +35,7 @@ COMPONENT_CONFIG: dict[str, dict] = {
         "price_key": "cpu_price",
         "emoji":     "🔧",
         "label":     "CPU",
-        "select_cb": "select_cpu",
+        "select_cb": "#c",
         "manual_cb": "enter_price_cpu",
     },
     "ram": {
@@ -35,7 +43,7 @@ COMPONENT_CONFIG: dict[str, dict] = {
         "price_key": "ram_price",
         "emoji":     "💾",
         "label":     "RAM",
-        "select_cb": "select_ram",
+        "select_cb": "#r",
         "manual_cb": "enter_price_ram",
     },
     "gpu": {
@@ -43,7 +51,7 @@ COMPONENT_CONFIG: dict[str, dict] = {
         "price_key": "gpu_price",
         "emoji":     "🖳",
         "label":     "GPU",
-        "select_cb": "select_gpu",
+        "select_cb": "#g",
         "manual_cb": "enter_price_gpu",
     },
     "storage": {
@@ -51,7 +59,7 @@ COMPONENT_CONFIG: dict[str, dict] = {
         "price_key": "storage_price",
         "emoji":     "📦",
         "label":     "Storage",
-        "select_cb": "select_stor",
+        "select_cb": "#s",
         "manual_cb": "enter_price_stor",
     },
     "motherboard": {
@@ -59,7 +67,7 @@ COMPONENT_CONFIG: dict[str, dict] = {
         "price_key": "motherboard_price",
         "emoji":     "📁",
         "label":     "Motherboard",
-        "select_cb": "select_mam",
+        "select_cb": "#m",
         "manual_cb": "enter_price_mam",
     },
 }
@@ -78,13 +86,97 @@ STATE_TO_COMP: dict[str, str] = {
     "change_mam":   "motherboard",
 }
 
-# ── select_* callback prefix → component type ─────────────────────────────
+# ── select_cb callback prefix → component type ────────────────────────────
 SELECT_CB_TO_COMP: dict[str, str] = {
     cfg["select_cb"]: comp_type
     for comp_type, cfg in COMPONENT_CONFIG.items()
 }
 
 
+# ── Live maps (hot-reloadable, see hotreload.py) ──────────────────────────
+#
+# The constants above are the boot-time defaults, and what is stored in
+# builds and callback_data (key, price_key, select_cb, manual_cb) never
+# changes while the bot runs. Handlers read the display fields through
+# component_maps(), which a reload replaces as a whole with one assignment:
+# an update sees either the old maps or the new ones, never a mix.
+
+_RELOADABLE_FIELDS = {"emoji", "label"}
+
+
+class ComponentMaps(NamedTuple):
+    config:            dict[str, dict]  # like COMPONENT_CONFIG
+    state_to_comp:     dict[str, str]   # like STATE_TO_COMP
+    select_cb_to_comp: dict[str, str]   # like SELECT_CB_TO_COMP
+
+
+_maps = ComponentMaps(COMPONENT_CONFIG, STATE_TO_COMP, SELECT_CB_TO_COMP)
+
+
+def component_maps() -> ComponentMaps:
+    return _maps
+
+
+def load_component_maps(path: Optional[str]) -> ComponentMaps:
+    """
+    New maps: COMPONENT_CONFIG with the overrides of the JSON file at path,
+    e.g. {"gpu": {"label": "Graphics card", "emoji": "🎮"}}. No file → defaults.
+    Raises ValueError for unknown component types or non-display fields.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (FileNotFoundError, TypeError):
+        overrides = {}
+
+    config = {comp_type: dict(cfg) for comp_type, cfg in COMPONENT_CONFIG.items()}
+    for comp_type, fields in overrides.items():
+        if comp_type not in config:
+            raise ValueError(f"unknown component type {comp_type!r}")
+        fixed = fields.keys() - _RELOADABLE_FIELDS
+        if fixed:
+            raise ValueError(f"{comp_type}: only {', '.join(sorted(_RELOADABLE_FIELDS))} can be overridden, "
+                             f"not {', '.join(sorted(fixed))}")
+        config[comp_type].update(fields)
+    return ComponentMaps(config, dict(STATE_TO_COMP), {cfg["select_cb"]: t for t, cfg in config.items()})
+
+
+def set_component_maps(maps: ComponentMaps) -> None:
+    global _maps
+    _maps = maps
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# Selection tokens  (callback_data for "pick this component" buttons)
+# ══════════════════════════════════════════════════════════════════════════════
+#
+# A token is the component type's select_cb followed by the catalog id in
+# base 36, e.g. '#g2s' → GPU with id 100. Name and price are looked up
+# server-side, so names never have to fit in (or be parsed out of) the
+# 64-byte callback_data, and a client cannot choose its own price.
+#
+
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def encode_selection(comp_type: str, component_id: int) -> str:
+    digits = ""
+    while True:
+        component_id, rem = divmod(component_id, 36)
+        digits = _BASE36[rem] + digits
+        if not component_id:
+            break
+    return COMPONENT_CONFIG[comp_type]["select_cb"] + digits
+
+
+def decode_selection_id(token_rest: str) -> int | None:
+    """Catalog id from the part of a token after its select_cb prefix (None if malformed)."""
+    try:
+        return int(token_rest, 36)
+    except ValueError:
+        return None
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # Build helpers
 # ══════════════════════════════════════════════════════════════════════════════
@@ -109,17 +201,25 @@ def create_computer_dict(computer_id: int, name: str) -> dict:
 
 
 def is_build_complete(computer: dict) -> bool:
+    if hasattr(computer, "is_complete"):  # BuildRecord keeps this up to date
+        return computer.is_complete()
     return all(computer.get(cfg["key"]) for cfg in COMPONENT_CONFIG.values())
 
 
 def get_build_progress(computer: dict) -> str:
-    filled = sum(1 for cfg in COMPONENT_CONFIG.values() if computer.get(cfg["key"]))
+    if hasattr(computer, "filled"):
+        filled = computer.filled
+    else:
+        filled = sum(1 for cfg in COMPONENT_CONFIG.values() if computer.get(cfg["key"]))
     total  = len(COMPONENT_CONFIG)
     return f"🚧 Build progress: {filled}/{total} components"
 
 
 def count_total_price(computer: dict) -> None:
     """Recalculate and store total_price in the computer dict (mutates in place)."""
+    if hasattr(computer, "price_sum"):
+        computer["total_price"] = computer.price_sum
+        return
     computer["total_price"] = sum(
         int(computer[cfg["price_key"]])
         for cfg in COMPONENT_CONFIG.values()
@@ -128,12 +228,13 @@ def count_total_price(computer: dict) -> None:
 
 
 def get_current_computer(user_id: int) -> dict | None:
-    from db import get_user_data  # local import to avoid circular
+    from db import get_user_data, mark_dirty  # local import to avoid circular
     ud = get_user_data(user_id)
     current_id = ud["current_computer"]
 
     if current_id is None and ud["computers"]:
         ud["current_computer"] = ud["computers"][0]["id"]
+        mark_dirty(user_id)
         return ud["computers"][0]
 
     for computer in ud["computers"]:
@@ -144,6 +245,7 @@ def get_current_computer(user_id: int) -> dict | None:
 
 def create_new_computer(user_id: int, computer_name: str | None = None) -> None:
     from db import get_user_data, auto_save  # local import
+    from models import BuildRecord
     ud = get_user_data(user_id)
 
     # FIX: use max(existing ids) + 1 instead of len() so IDs stay unique
@@ -154,7 +256,7 @@ def create_new_computer(user_id: int, computer_name: str | None = None) -> None:
     if not computer_name:
         computer_name = f"My computer #{computer_id}"
 
-    ud["computers"].append(create_computer_dict(computer_id, computer_name))
+    ud["computers"].append(BuildRecord.from_dict(create_computer_dict(computer_id, computer_name)))
     ud["current_computer"] = computer_id
     auto_save(user_id)
 
@@ -181,21 +283,143 @@ def score_relevance(search_words: list[str], component_name: str) -> int:
 # AI
 # ══════════════════════════════════════════════════════════════════════════════
 
-def analyze_build_with_ai(computer: dict) -> str:
-    prompt = (
-        "You are an expert in assembling computers. Evaluate the build below: "
-        "check component compatibility, give 5 improvement tips, and rate it 1–10.\n\n"
+AI_MODEL = "gemini-flash-latest"
+AI_FAILURE_TEXT = "Failed to analyse the build. Please try again later."
+
+_AI_TASK = "check component compatibility, give 5 improvement tips, and rate it 1–10"
+_PLAIN_TEXT_NOTE = "Write plain text without any Markdown symbols (* _ ` #) so Telegram displays it correctly."
+
+# ── Analysis cache: build fingerprint → AI text ───────────────────────────
+# Filled by single checks and by batched comparisons, so a build that was
+# already analysed (alone or as part of a comparison) costs no extra AI call.
+# Least recently used entries go once it holds AI_CACHE_SIZE analyses.
+_ai_cache: OrderedDict[tuple, str] = OrderedDict()
+_ai_cache_lock = threading.Lock()
+
+
+def _cache_analysis(computer: dict, text: str) -> None:
+    with _ai_cache_lock:
+        key = _build_fingerprint(computer)
+        _ai_cache[key] = text
+        _ai_cache.move_to_end(key)
+        while len(_ai_cache) > AI_CACHE_SIZE:
+            _ai_cache.popitem(last=False)
+
+
+def _build_fingerprint(computer: dict) -> tuple:
+    return tuple(computer.get(cfg["key"]) for cfg in COMPONENT_CONFIG.values()) + (computer.get("total_price"),)
+
+
+def get_cached_analysis(computer: dict) -> str | None:
+    key = _build_fingerprint(computer)
+    with _ai_cache_lock:
+        text = _ai_cache.get(key)
+        if text is not None:
+            _ai_cache.move_to_end(key)
+    return text
+
+
+def _build_specs(computer: dict) -> str:
+    return (
         f"CPU:         {computer['cpu']}\n"
         f"RAM:         {computer['ram']}\n"
         f"GPU:         {computer['gpu']}\n"
         f"Storage:     {computer['storage']}\n"
         f"Motherboard: {computer['motherboard']}\n"
-        f"Total price: ${computer['total_price']}\n\n"
-        "Write plain text without any Markdown symbols (* _ ` #) so Telegram displays it correctly."
+        f"Total price: ${computer['total_price']}\n"
     )
+
+
+def _build_prompt(computer: dict) -> str:
+    return (
+        f"You are an expert in assembling computers. Evaluate the build below: {_AI_TASK}.\n\n"
+        f"{_build_specs(computer)}\n"
+        f"{_PLAIN_TEXT_NOTE}"
+    )
+
+
+def analyze_build_with_ai(computer: dict) -> str:
+    cached = get_cached_analysis(computer)
+    if cached:
+        return cached
     try:
-        response = client.models.generate_content(model="gemini-flash-latest", contents=prompt)
+        with span("ai.generate_content", model=AI_MODEL):
+            response = config.client.models.generate_content(model=AI_MODEL, contents=_build_prompt(computer))
+        _cache_analysis(computer, response.text)
         return response.text
     except Exception as e:
         logger.error("AI error: %s", e)
-        return "Failed to analyse the build. Please try again later."
+        return AI_FAILURE_TEXT
+
+
+def stream_build_analysis(computer: dict) -> Iterator[str]:
+    """
+    Same analysis as analyze_build_with_ai(), but yields text chunks as soon as
+    the model produces them so the caller can show progress.
+    """
+    cached = get_cached_analysis(computer)
+    if cached:
+        yield cached
+        return
+
+    parts = []
+    try:
+        stream = config.client.models.generate_content_stream(model=AI_MODEL, contents=_build_prompt(computer))
+        while True:
+            # Only the wait for each chunk is the AI's time; what the caller does
+            # with a chunk between two next() calls shows up in its own spans.
+            with span("ai.stream_chunk", model=AI_MODEL, chunk=len(parts)):
+                chunk = next(stream, None)
+            if chunk is None:
+                break
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        logger.error("AI stream error: %s", e)
+        yield AI_FAILURE_TEXT
+        return
+    _cache_analysis(computer, "".join(parts))
+
+
+def compare_builds_with_ai(computers: list[dict]) -> tuple[dict[int, str], str]:
+    """
+    Analyse several builds in one AI round trip.
+
+    Returns ({computer id: analysis}, overall verdict). Every per-build analysis
+    is cached, so a later single-build check of the same build is free.
+    """
+    specs = "\n".join(f"Build id {c['id']} ({c['name']}):\n{_build_specs(c)}" for c in computers)
+    prompt = (
+        f"You are an expert in assembling computers. For EACH build below: {_AI_TASK}. "
+        "Then compare the builds and say which one is the best value and why.\n\n"
+        f"{specs}\n"
+        'Answer with JSON only: {"builds": [{"id": <build id>, "analysis": "<text>"}], '
+        '"verdict": "<comparison text>"}. '
+        f"{_PLAIN_TEXT_NOTE}"
+    )
+    try:
+        with span("ai.generate_content", model=AI_MODEL, builds=len(computers)):
+            response = config.client.models.generate_content(
+                model=AI_MODEL,
+                contents=prompt,
+                config={"response_mime_type": "application/json"},
+            )
+        data = json.loads(response.text)
+    except Exception as e:
+        logger.error("AI compare error: %s", e)
+        return {}, AI_FAILURE_TEXT
+
+    by_id = {c["id"]: c for c in computers}
+    results: dict[int, str] = {}
+    for item in data.get("builds", []):
+        try:
+            computer_id = int(item["id"])
+            analysis    = str(item["analysis"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if computer_id in by_id and analysis:
+            results[computer_id] = analysis
+            _cache_analysis(by_id[computer_id], analysis)
+
+    return results, str(data.get("verdict", "")).strip()